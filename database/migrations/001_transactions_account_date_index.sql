@@ -0,0 +1,4 @@
+-- 001: Per-account listing and keyset paging ordered by (date, id).
+-- Serves WHERE account_id=? ORDER BY date, id without a filesort, and any
+-- per-account date range. It can also back the account_id foreign key.
+CREATE INDEX idx_transactions_account_date ON transactions (account_id, date, id) ALGORITHM=INPLACE LOCK=NONE;
@@ -0,0 +1,4 @@
+-- 002: Covering index for balance reporting.
+-- SUM(amount) per account and type, optionally up to a date, can be answered
+-- from this index alone without touching the table rows.
+CREATE INDEX idx_transactions_balance ON transactions (account_id, date, type, amount) ALGORITHM=INPLACE LOCK=NONE;
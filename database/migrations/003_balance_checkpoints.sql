@@ -0,0 +1,23 @@
+-- 003: Monthly balance checkpoints.
+-- Each row holds an account's balance at the end of a month, i.e. the sum of
+-- all its transactions dated on or before the last day of that month. There
+-- is a row for every month in which the account has transactions; the write
+-- paths keep the rows current (see checkpoints.py).
+CREATE TABLE IF NOT EXISTS balance_checkpoints (
+    account_id INT NOT NULL,
+    month DATE NOT NULL,
+    balance DECIMAL(10,2) NOT NULL,
+    PRIMARY KEY (account_id, month),
+    FOREIGN KEY (account_id) REFERENCES accounts(id)
+);
+
+-- Backfill from existing history: running total of each month's net change
+INSERT INTO balance_checkpoints (account_id, month, balance)
+SELECT account_id, month, SUM(net) OVER (PARTITION BY account_id ORDER BY month)
+FROM (
+    SELECT account_id,
+           DATE_FORMAT(date, '%Y-%m-01') AS month,
+           SUM(CASE WHEN type = 'Deposit' THEN amount ELSE -amount END) AS net
+    FROM transactions
+    GROUP BY account_id, DATE_FORMAT(date, '%Y-%m-01')
+) AS monthly;
@@ -0,0 +1,6 @@
+-- 004: Per-account change version.
+-- Every write path that changes an account or its transactions bumps
+-- accounts.version in the same transaction (it already locks that row), so
+-- a cache can tell with one primary-key lookup whether anything it holds
+-- for the account is out of date (see cache.py).
+ALTER TABLE accounts ADD COLUMN version BIGINT NOT NULL DEFAULT 0;
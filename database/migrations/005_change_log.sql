@@ -0,0 +1,39 @@
+-- 005: Change log.
+-- Triggers append one row per changed transaction or account, in the same
+-- transaction as the change, so every client of the database (including
+-- other app instances and scripts) can follow writes by tailing this table
+-- by id instead of reloading (see changes.py). Balance-only updates of an
+-- account are not logged: they always come with a logged transaction change.
+-- Each trigger is dropped before it is created, so a run that failed partway
+-- can be rerun.
+CREATE TABLE IF NOT EXISTS change_log (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    account_id INT NOT NULL,
+    tx_id INT NULL,
+    action ENUM('insert', 'update', 'delete') NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP TRIGGER IF EXISTS transactions_log_insert;
+CREATE TRIGGER transactions_log_insert AFTER INSERT ON transactions FOR EACH ROW
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (NEW.account_id, NEW.id, 'insert');
+
+DROP TRIGGER IF EXISTS transactions_log_update;
+CREATE TRIGGER transactions_log_update AFTER UPDATE ON transactions FOR EACH ROW
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (NEW.account_id, NEW.id, 'update');
+
+DROP TRIGGER IF EXISTS transactions_log_delete;
+CREATE TRIGGER transactions_log_delete AFTER DELETE ON transactions FOR EACH ROW
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (OLD.account_id, OLD.id, 'delete');
+
+DROP TRIGGER IF EXISTS accounts_log_insert;
+CREATE TRIGGER accounts_log_insert AFTER INSERT ON accounts FOR EACH ROW
+    INSERT INTO change_log (account_id, action) VALUES (NEW.id, 'insert');
+
+DROP TRIGGER IF EXISTS accounts_log_update;
+CREATE TRIGGER accounts_log_update AFTER UPDATE ON accounts FOR EACH ROW
+    INSERT INTO change_log (account_id, action) SELECT NEW.id, 'update' FROM DUAL WHERE NEW.name <> OLD.name;
+
+DROP TRIGGER IF EXISTS accounts_log_delete;
+CREATE TRIGGER accounts_log_delete AFTER DELETE ON accounts FOR EACH ROW
+    INSERT INTO change_log (account_id, action) VALUES (OLD.id, 'delete');
@@ -0,0 +1,5 @@
+-- 006: Full-text index on transaction notes.
+-- Lets note search (search.py) find words among millions of transactions
+-- without scanning the table. Adding the first FULLTEXT index to an InnoDB
+-- table rebuilds it once, so this migration takes a while on large tables.
+ALTER TABLE transactions ADD FULLTEXT INDEX ft_transactions_note (note);
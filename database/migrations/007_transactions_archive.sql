@@ -0,0 +1,22 @@
+-- 007: Transaction archive.
+-- archive.py moves transactions dated before a cutoff here and leaves one
+-- summary transaction per account in `transactions`, so the table every
+-- screen reads stays small. Rows keep their ids. The table is partitioned
+-- by year (archive.py adds the partitions it needs), so a year can be
+-- exported or dropped as a unit; partitioning needs the date in the primary
+-- key and rules out foreign keys, so deleting an account deletes its
+-- archived rows explicitly.
+CREATE TABLE IF NOT EXISTS transactions_archive (
+    id INT NOT NULL,
+    account_id INT NOT NULL,
+    type ENUM('Deposit','Withdrawal') NOT NULL,
+    amount DECIMAL(10,2) NOT NULL,
+    date DATE NOT NULL,
+    note VARCHAR(255),
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, date),
+    KEY idx_transactions_archive_account_date (account_id, date)
+)
+PARTITION BY RANGE (YEAR(date)) (
+    PARTITION p_future VALUES LESS THAN MAXVALUE
+);
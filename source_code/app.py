@@ -1,45 +1,263 @@
+import json
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import mysql.connector
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from concurrent.futures import Future
 from datetime import datetime
+from decimal import Decimal
+import checkpoints
+from changes import ChangeFeed
+from coalescer import WriteCoalescer
+from db import ConnectionManager, local_path
+from ledger import LedgerService, OverdraftError
+from money import check_amount, parse_amount, to_cents
+from reports import format_row
+from rowstore import SORT_COLUMNS, TransactionStore
+from worker import QueryExecutor
 
-# === Database Connection ===
-# Update host/user/password/database if needed
-try:
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",       # default XAMPP root has no password
-        database="cccs105"
-    )
-    cursor = conn.cursor(buffered=True)
-except mysql.connector.Error as err:
-    print("Error: Could not connect to database. Check MySQL status and credentials.")
-    raise err
+# === Ledger Service ===
+# The GUI is a client of LedgerService (ledger.py), which holds all the
+# database logic; server.py serves the same service over HTTP. Connection
+# settings are read from config.env (see db.py). Connections are pooled and
+# opened on first use, so importing this module opens nothing and several
+# windows and background jobs can query at the same time. Not even the
+# MySQL driver is imported until the first query, which runs on a worker
+# thread once the window is up (see Startup Snapshot).
+db = ConnectionManager()
+# With DB_REPLICA_PATH set the GUI works on a local SQLite copy that syncs in the background (replica.py)
+replicated = bool(db.config["DB_REPLICA_PATH"])
+if replicated:
+    from replica import open_service
+    service = open_service(db)
+else:
+    service = LedgerService(db)
+coalescer = None   # a WriteCoalescer when group commit is enabled (DB_GROUP_COMMIT_MS in config.env)
+feed = ChangeFeed()  # follows change_log so other clients' writes show up in open windows
+stats = db.stats     # sampled query, fetch and Treeview timings (instrument.py), see DiagnosticsWindow
+
+# === Transaction Paging ===
+# The transactions window never loads a whole account at once. Rows are read
+# in keyset pages ordered by (date, id) and only MAX_PAGES pages of rows are
+# kept, in a column store (rowstore.py) and the Treeview; pages are fetched
+# ahead of the viewport as the user scrolls.
+PAGE_SIZE = 200          # rows per keyset page
+MAX_PAGES = 5            # pages of rows kept at any time
+PREFETCH_MARGIN = 0.25   # fetch a new page when the view is this close to an edge
+
+# === Treeview Sync ===
+class TreeSync:
+    """Map database row ids to Treeview items so a view can be patched in place.
+
+    Rows are tuples with the database id first. Only rows that actually
+    changed touch the widget, so one write costs O(1) UI work instead of a
+    delete-all/reinsert of the whole table. Bulk updates are timed into
+    `stats` under `name`.
+    """
+    def __init__(self, tree, format_row, name="view"):
+        self.tree = tree
+        self.format_row = format_row
+        self.name = name
+        self.iids = {}   # row id -> Treeview iid
+        self.rows = {}   # row id -> row as currently shown
+
+    def upsert(self, row, index="end"):
+        """Insert `row` at `index`, or update it in place if it is already shown."""
+        row_id = row[0]
+        iid = self.iids.get(row_id)
+        if iid is None:
+            self.iids[row_id] = self.tree.insert("", index, values=self.format_row(row))
+        elif self.rows[row_id] != row:
+            self.tree.item(iid, values=self.format_row(row))
+        self.rows[row_id] = row
+
+    def remove(self, *row_ids):
+        iids = []
+        for row_id in row_ids:
+            if row_id in self.iids:
+                iids.append(self.iids.pop(row_id))
+                del self.rows[row_id]
+        if iids:
+            self.tree.delete(*iids)
+
+    def reconcile(self, rows):
+        """Make the Treeview show exactly `rows`, touching only the ones that differ."""
+        with stats.timer("ui", f"{self.name}: reconcile", len(rows)):
+            seen = set()
+            for row in rows:
+                self.upsert(row)
+                seen.add(row[0])
+            self.remove(*[row_id for row_id in self.iids if row_id not in seen])
+
+    def clear(self):
+        self.remove(*list(self.iids))
+
+    def tag(self, row_id, *tags):
+        if row_id in self.iids:
+            self.tree.item(self.iids[row_id], tags=tags)
+
+def format_account(acct):
+    acct_id, name, balance = acct
+    return (name, f"{balance:.2f}", acct_id)
+
+# === Background Jobs ===
+class StatusLabel(tk.Label):
+    """Shows which background work a window is currently waiting on."""
+    def __init__(self, master):
+        super().__init__(master, anchor=tk.W, fg="gray")
+        self.jobs = []
+
+    def start(self, message):
+        self.jobs.append(message)
+        self.config(text=message)
+
+    def stop(self, message):
+        self.jobs.remove(message)
+        self.config(text=self.jobs[-1] if self.jobs else "")
+
+def run_in_background(status, message, fn, *args, on_done=None, on_error=None,
+                      error_title="Database Error", error_prefix=None):
+    """Run fn(*args) on the database worker, showing `message` in `status` until it finishes.
+
+    `fn` may also be a Future for work queued elsewhere (a group-commit
+    write), which is then followed the same way. Errors are reported with
+    a message box; `on_error` is then called so the caller can undo any
+    "busy" state it set up.
+    """
+    status.start(message)
+
+    def finish():
+        if status.winfo_exists():
+            status.stop(message)
+
+    def done(result):
+        finish()
+        if on_done:
+            on_done(result)
+
+    def failed(e):
+        finish()
+        if isinstance(e, OverdraftError):
+            messagebox.showerror("Overdraft", str(e))
+        else:
+            messagebox.showerror(error_title, f"{error_prefix}\n{e}" if error_prefix else str(e))
+        if on_error:
+            on_error(e)
+
+    if isinstance(fn, Future):
+        return executor.watch(fn, on_done=done, on_error=failed)
+    return executor.submit(fn, *args, on_done=done, on_error=failed)
 
 # === Helper Functions ===
+def check_schema():
+    """Apply any pending schema migrations, then load the accounts."""
+    run_in_background(status, "Checking database schema...", service.migrate,
+                      on_done=lambda applied: refresh_accounts(), on_error=lambda e: refresh_accounts(),
+                      error_title="Database Upgrade Failed")
+
+def watch_changes(interval):
+    """Poll the change log and patch the open views with the rows that changed.
+
+    Runs every `interval` ms; polling stays quiet on errors (the database
+    may just be restarting) and tries again later.
+    """
+    def changed(result):
+        accounts, transactions = result
+        for acct_id, acct in accounts.items():
+            if acct is None:
+                accounts_sync.remove(acct_id)
+            else:
+                accounts_sync.upsert(acct)
+        if transactions:
+            for window in root.winfo_children():
+                if isinstance(window, TransactionsWindow):
+                    window.apply_changes({tx_id: tx for tx_id, (acct_id, tx) in transactions.items()
+                                          if acct_id == window.account_id})
+        show_sync_status()
+        root.after(interval, watch_changes, interval)
+
+    def failed(e):
+        show_sync_status()
+        root.after(interval * 5, watch_changes, interval)
+
+    executor.submit(service.poll_changes, feed, on_done=changed, on_error=failed)
+
+def show_sync_status():
+    if replicated:
+        sync_status.config(text=service.sync_status())
+
 def refresh_accounts():
     """Load accounts from DB into the Treeview."""
-    for row in accounts_tree.get_children():
-        accounts_tree.delete(row)
+    run_in_background(status, "Loading accounts...", load_accounts, on_done=show_accounts)
+
+# === Startup Snapshot ===
+# With DB_SNAPSHOT_PATH set in config.env, the account list as last loaded
+# is kept in a small JSON file next to this script, so the main window
+# shows it, grayed out, the moment it opens, while the database driver is
+# imported and the first queries run in the background. The fresh rows
+# replace it as they arrive. A snapshot of another server or database is
+# ignored. It is off by default, since the file holds every account name
+# and balance in plain text.
+snapshot_path = local_path(db.config["DB_SNAPSHOT_PATH"]) if db.config["DB_SNAPSHOT_PATH"] else None
+snapshot_message = None   # status text while the snapshot is shown
+
+def snapshot_source():
+    return f"{db.config['DB_USER']}@{db.config['DB_HOST']}/{db.config['DB_NAME']}"
+
+def load_snapshot(path):
+    """The saved account rows and when they were saved, or ([], None)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data["source"] != snapshot_source():
+            return [], None
+        return [(acct_id, name, Decimal(balance)) for acct_id, name, balance in data["accounts"]], data["saved"]
+    except (OSError, ValueError, KeyError, TypeError, ArithmeticError):
+        return [], None   # no snapshot yet, or one that cannot be read
+
+def save_snapshot(path, accounts):
+    """Write the account rows to `path`, through a temporary file so a crash never leaves half of one."""
+    data = {"source": snapshot_source(), "saved": datetime.now().isoformat(sep=" ", timespec="minutes"),
+            "accounts": [[acct_id, name, str(balance)] for acct_id, name, balance in accounts]}
     try:
-        cursor.execute("SELECT id, name, balance FROM accounts")
-        for acct in cursor.fetchall():
-            name = acct[1]
-            balance = f"{acct[2]:.2f}"
-            accounts_tree.insert("", "end", values=(name, balance, acct[0]))
-    except Exception as e:
-        messagebox.showerror("Database Error", str(e))
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        pass   # only a head start for the next launch
+
+def show_snapshot():
+    global snapshot_message
+    accounts, saved = load_snapshot(snapshot_path) if snapshot_path else ([], None)
+    if not accounts:
+        return
+    accounts_tree.tag_configure("snapshot", foreground="gray")
+    accounts_sync.reconcile(accounts)
+    for acct_id, _, _ in accounts:
+        accounts_sync.tag(acct_id, "snapshot")
+    snapshot_message = f"Showing accounts as of {saved}; connecting..."
+    status.start(snapshot_message)
+
+def load_accounts():
+    """service.accounts, saved as the next launch's snapshot (on the worker thread)."""
+    accounts = service.accounts()
+    if snapshot_path:
+        save_snapshot(snapshot_path, accounts)
+    return accounts
+
+def show_accounts(accounts):
+    global snapshot_message
+    accounts_sync.reconcile(accounts)
+    if snapshot_message is not None:
+        for acct_id in accounts_sync.iids:
+            accounts_sync.tag(acct_id)
+        status.stop(snapshot_message)
+        snapshot_message = None
 
 def add_account():
     name = simpledialog.askstring("Add Account", "Enter new account name:")
     if name:
-        try:
-            cursor.execute("INSERT INTO accounts (name, balance) VALUES (%s, %s)", (name, 0.0))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not add account:\n{e}")
+        run_in_background(status, "Adding account...", service.add_account, name,
+                          on_done=accounts_sync.upsert, error_title="Error", error_prefix="Could not add account:")
 
 def edit_account():
     selected = accounts_tree.focus()
@@ -51,12 +269,8 @@ def edit_account():
     old_name = item['values'][0]
     new_name = simpledialog.askstring("Edit Account", f"New name for '{old_name}':", initialvalue=old_name)
     if new_name:
-        try:
-            cursor.execute("UPDATE accounts SET name=%s WHERE id=%s", (new_name, acct_id))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not rename account:\n{e}")
+        run_in_background(status, "Saving account...", service.rename_account, acct_id, new_name,
+                          on_done=accounts_sync.upsert, error_title="Error", error_prefix="Could not rename account:")
 
 def delete_account():
     selected = accounts_tree.focus()
@@ -66,14 +280,66 @@ def delete_account():
     item = accounts_tree.item(selected)
     acct_id = item['values'][2]
     acct_name = item['values'][0]
-    if messagebox.askyesno("Confirm Delete", f"Delete account '{acct_name}' and all its transactions?"):
-        try:
-            cursor.execute("DELETE FROM transactions WHERE account_id=%s", (acct_id,))
-            cursor.execute("DELETE FROM accounts WHERE id=%s", (acct_id,))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not delete account:\n{e}")
+    if not messagebox.askyesno("Confirm Delete", f"Delete account '{acct_name}' and all its transactions?"):
+        return
+
+    def progress(deleted, total):
+        # Called on the worker thread between chunks; hop to Tk before touching the label
+        executor.post(lambda: status.config(text=f"Deleting '{acct_name}': {deleted} of {total} transactions..."))
+
+    # Chunks deleted before a failure stay deleted, so reload the balances then
+    run_in_background(status, "Deleting account...", service.delete_account, acct_id, progress,
+                      on_done=lambda _: accounts_sync.remove(acct_id), on_error=lambda e: refresh_accounts(),
+                      error_title="Error", error_prefix="Could not delete account:")
+
+def import_statement_file():
+    selected = accounts_tree.focus()
+    if not selected:
+        messagebox.showwarning("No selection", "Select the account to import into.")
+        return
+    item = accounts_tree.item(selected)
+    acct_id = item['values'][2]
+    acct_name = item['values'][0]
+    path = filedialog.askopenfilename(
+        title=f"Import statement into '{acct_name}'",
+        filetypes=[("Bank statements", "*.csv *.ofx *.qfx"), ("All files", "*.*")])
+    if not path:
+        return
+
+    def progress(imported, rejected):
+        # Called on the worker thread; hop to Tk before touching the label
+        executor.post(lambda: status.config(text=f"Importing: {imported} rows, {rejected} rejected..."))
+
+    def imported(result):
+        count, errors = result
+        message = f"Imported {count} transactions into '{acct_name}'."
+        if errors:
+            message += f"\n\nSkipped {len(errors)} invalid rows:\n" + "\n".join(errors[:10])
+            if len(errors) > 10:
+                message += "\n..."
+        messagebox.showinfo("Import Complete", message)
+        after_import()
+
+    def after_import(*_):
+        # Batches committed before a failure stay in, so refresh either way
+        refresh_accounts()
+        for window in root.winfo_children():
+            if isinstance(window, TransactionsWindow) and window.account_id == acct_id:
+                window.refresh_transactions()
+
+    run_in_background(status, "Importing...", service.import_statement, path, acct_id, progress,
+                      on_done=imported, on_error=after_import, error_title="Import Failed")
+
+def account_names():
+    """{account id: name} for the accounts shown in the main window."""
+    names = {}
+    for row_id in accounts_tree.get_children():
+        name, _, acct_id = accounts_tree.item(row_id)['values']
+        names[int(acct_id)] = name
+    return names
+
+def search_all_accounts(text):
+    SearchWindow(root, text)
 
 def open_transactions():
     selected = accounts_tree.focus()
@@ -91,81 +357,385 @@ class TransactionsWindow(tk.Toplevel):
         super().__init__(master)
         self.title(f"Transactions - {account_name}")
         self.account_id = account_id
-        self.geometry("600x400")
+        self.account_name = account_name
+        self.geometry("720x400")
 
         # Transactions Table
-        columns = ("Type", "Amount", "Date", "Note", "ID")
+        columns = ("Type", "Amount", "Date", "Note", "Balance", "ID")
         self.trans_tree = ttk.Treeview(self, columns=columns, show='headings')
-        self.trans_tree.heading("Type", text="Type")
-        self.trans_tree.heading("Amount", text="Amount")
-        self.trans_tree.heading("Date", text="Date")
-        self.trans_tree.heading("Note", text="Note")
+        for column in SORT_COLUMNS:
+            self.trans_tree.heading(column, text=column, command=lambda c=column: self.sort_by(c))
         self.trans_tree.heading("ID", text="ID")
         self.trans_tree.column("ID", width=0, stretch=False)  # hide ID column
-        self.trans_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.trans_tree.tag_configure("pending", foreground="gray")  # queued, not committed yet
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.trans_tree.yview)
+        self.trans_tree.configure(yscrollcommand=self.on_tree_scroll)
 
-        # Buttons
+        # Buttons (packed before the table so they keep their space when the window shrinks)
         btn_frame = tk.Frame(self)
         btn_frame.pack(fill=tk.X, pady=5)
         tk.Button(btn_frame, text="Add Transaction", command=self.add_transaction).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Edit Transaction", command=self.edit_transaction).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Delete Transaction", command=self.delete_transaction).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        tk.Button(btn_frame, text="Balance On Date", command=self.show_balance_on_date).pack(side=tk.RIGHT, padx=5)
+        search_bar(self, lambda text: SearchWindow(self, text, self.account_id, self.account_name))
+        self.status = StatusLabel(self)
+        self.status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+        self.trans_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
+        # Loaded rows live in a TransactionStore (rowstore.py) in (date, id)
+        # order, with running balances in cents accumulated as pages arrive;
+        # `opening` is the balance just before the first loaded row. Treeview
+        # items are named by transaction id and show the rows in the same
+        # order, unless they are sorted by another column (see sort_by).
+        self.store = TransactionStore()
+        self.opening = 0
+        self.sort_column = None     # None: (date, id) order
+        self.sort_reverse = False
+        self.more_before = False
+        self.more_after = False
+        self.fetch_pending = False
+        self.generation = 0         # bumped on reload so late page results are ignored
+        # Group commit: ids of rows whose write is queued but not committed.
+        # Queued new rows get temporary negative ids until their batch commits.
+        self.pending = set()
+        self.next_temp_id = -1
         self.refresh_transactions()
 
     def refresh_transactions(self):
-        for row in self.trans_tree.get_children():
-            self.trans_tree.delete(row)
-        try:
-            cursor.execute("SELECT id, type, amount, date, note FROM transactions WHERE account_id=%s", (self.account_id,))
-            for tx in cursor.fetchall():
-                tx_id, tx_type, amount, date, note = tx
-                self.trans_tree.insert("", "end", values=(tx_type, f"{amount:.2f}", date, note, tx_id))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        """Reload the view from the first page."""
+        self.generation += 1
+        self.trans_tree.delete(*self.trans_tree.get_children())
+        self.store = TransactionStore()
+        self.opening = 0   # the first page starts at the first transaction
+        self.more_before = False
+        self.more_after = True
+        self.load_next_page()
+
+    def on_tree_scroll(self, first, last):
+        """Keep the scrollbar in sync and prefetch pages near the viewport edges."""
+        self.scrollbar.set(first, last)
+        if self.fetch_pending or self.sort_column is not None:
+            return
+        if float(last) >= 1 - PREFETCH_MARGIN and self.more_after:
+            self.load_next_page()
+        elif float(first) <= PREFETCH_MARGIN and self.more_before:
+            self.load_previous_page()
+
+    # --- Showing rows ---
+    def show_rows(self, start, stop):
+        """Insert rows start..stop of the store into the Treeview."""
+        for i in range(start, stop):
+            index = i if self.sort_column is None else "end"
+            self.trans_tree.insert("", index, iid=str(self.store.ids[i]), values=self.store.format(i))
+
+    def show_row(self, i):
+        self.trans_tree.item(str(self.store.ids[i]), values=self.store.format(i))
+
+    def drop_rows(self, start, stop):
+        if start == 0:
+            self.opening = self.store.balances[stop - 1]
+        self.trans_tree.delete(*[str(tx_id) for tx_id in self.store.ids[start:stop]])
+        self.store.delete(start, stop)
+
+    def sort_by(self, column):
+        """Order the loaded rows by a column heading (again: descending).
+
+        Sorting works on the rows in the store and never queries; paging
+        needs (date, id) order, so it pauses until Date is clicked.
+        """
+        if column == "Date":
+            self.sort_column, self.sort_reverse = None, False
+        elif column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        for name in SORT_COLUMNS:
+            arrow = (" \u25bc" if self.sort_reverse else " \u25b2") if name == (self.sort_column or "Date") else ""
+            self.trans_tree.heading(name, text=name + arrow)
+        self.arrange()
+
+    def arrange(self):
+        """Move the Treeview items into the current sort order."""
+        with stats.timer("ui", "transactions: sort", len(self.store)):
+            if self.sort_column is None:
+                order = range(len(self.store))
+            else:
+                order = self.store.order(self.sort_column, self.sort_reverse)
+            for position, i in enumerate(order):
+                self.trans_tree.move(str(self.store.ids[i]), "", position)
+
+    def keep_sorted(self):
+        if self.sort_column is not None:
+            self.arrange()
+
+    # --- Paging ---
+    def insert_page(self, rows, top=False):
+        """Add a page of rows below (or with top=True, above) the loaded ones."""
+        with stats.timer("ui", "transactions: insert page", len(rows)):
+            if top:
+                # Walk back from the balance before the old first row
+                self.opening -= sum(checkpoints.signed(row[1], to_cents(row[2])) for row in rows)
+                start, opening = 0, self.opening
+            else:
+                start = len(self.store)
+                opening = self.store.balances[-1] if start else self.opening
+            self.store.insert(start, rows, opening)
+            self.show_rows(start, start + len(rows))
+            self.keep_sorted()
+
+    def fetch_page(self, on_rows, after=None, before=None):
+        """Fetch a page in the background and pass it to on_rows unless the view was reloaded meanwhile."""
+        self.fetch_pending = True
+        generation = self.generation
+
+        def loaded(rows):
+            if generation != self.generation or not self.winfo_exists():
+                return
+            self.fetch_pending = False
+            on_rows(rows)
+
+        def failed(e):
+            self.fetch_pending = False
+
+        run_in_background(self.status, "Loading transactions...", service.transactions,
+                          self.account_id, after, before, PAGE_SIZE, on_done=loaded, on_error=failed, error_title="Error")
+
+    def load_next_page(self):
+        self.fetch_page(self.next_page_loaded, after=self.store.key(-1) if len(self.store) else None)
+
+    def next_page_loaded(self, rows):
+        self.more_after = len(rows) == PAGE_SIZE
+        if not rows:
+            return
+        self.insert_page(rows)
+        excess = len(self.store) - MAX_PAGES * PAGE_SIZE
+        if excess > 0:
+            # Drop the rows furthest above the viewport; Treeview keeps its top
+            # index, so scroll back by the removed rows to stay in place.
+            self.drop_rows(0, excess)
+            self.trans_tree.yview_scroll(-excess, "units")
+            self.more_before = True
+
+    def load_previous_page(self):
+        if len(self.store):
+            self.fetch_page(self.previous_page_loaded, before=self.store.key(0))
+
+    def previous_page_loaded(self, rows):
+        self.more_before = len(rows) == PAGE_SIZE
+        if not rows:
+            return
+        self.insert_page(rows, top=True)
+        self.trans_tree.yview_scroll(len(rows), "units")
+        excess = len(self.store) - MAX_PAGES * PAGE_SIZE
+        if excess > 0:
+            self.drop_rows(len(self.store) - excess, len(self.store))
+            self.more_after = True
+
+    # --- Patching rows in place ---
+    def locate(self, key):
+        """Index where `key` belongs among the loaded rows, or None if it
+        falls outside them."""
+        if (key < self.store.key(0) and self.more_before) or (key > self.store.key(-1) and self.more_after):
+            return None
+        return self.store.position(key)
+
+    def balance_before(self, key):
+        """Running balance of the loaded row just before `key`, in cents."""
+        i = self.store.position(key)
+        return self.store.balances[i - 1] if i else self.opening
+
+    def recompute_running(self, after=None, balance=None):
+        """Recompute running balances of the loaded rows after key `after`
+        (all rows if None), starting from `balance`.
+
+        Rows before the change are untouched, and the walk stops at the first
+        row whose balance is already right, since every row after it is too.
+        """
+        start = 0 if after is None else self.store.position(after, after=True)
+        for i in self.store.rebalance(start, self.opening if balance is None else balance):
+            self.show_row(i)
+
+    def refresh_opening(self):
+        """Re-read the balance before the first loaded row after a change above the loaded range."""
+        first = self.store.key(0)
+        generation = self.generation
+
+        def loaded(opening):
+            if (generation == self.generation and self.winfo_exists() and len(self.store)
+                    and self.store.key(0) == first):
+                self.opening = to_cents(opening)
+                self.recompute_running()
+                self.keep_sorted()
+
+        run_in_background(self.status, "Updating balances...", service.balance_before,
+                          self.account_id, first, on_done=loaded, error_title="Error")
+
+    def transaction_saved(self, tx):
+        """Show an added or edited row without reloading the loaded pages."""
+        tx_id, date = tx[0], tx[3]
+        key = (date, tx_id)
+        i = self.store.find(tx_id)
+        if i is not None:
+            if self.store.key(i) == key:
+                # Same (date, id) key, so same position; later balances shift by the difference
+                balance = self.balance_before(key) + checkpoints.signed(tx[1], to_cents(tx[2]))
+                self.store.update(i, tx, balance)
+                self.show_row(i)
+                self.recompute_running(key, balance)
+                self.keep_sorted()
+                return
+            self.transaction_removed(tx_id)
+        if not len(self.store):
+            if not (self.more_before or self.more_after):
+                self.insert_page([tx])
+            return
+        i = self.locate(key)
+        if i is not None:
+            balance = self.store.insert(i, [tx], self.balance_before(key))
+            self.show_rows(i, i + 1)
+            self.recompute_running(key, balance)
+            self.keep_sorted()
+        elif key < self.store.key(0):
+            self.refresh_opening()
+
+    def transaction_removed(self, tx_id):
+        i = self.store.find(tx_id)
+        if i is None:
+            return
+        key = self.store.key(i)
+        self.store.delete(i, i + 1)
+        self.trans_tree.delete(str(tx_id))
+        if len(self.store):
+            self.recompute_running(key, self.balance_before(key))
+            self.keep_sorted()
+
+    def set_pending(self, tx_id, pending=True):
+        if pending:
+            self.pending.add(tx_id)
+        else:
+            self.pending.discard(tx_id)
+        if self.store.find(tx_id) is not None:
+            self.trans_tree.item(str(tx_id), tags=("pending",) if pending else ())
+
+    def transaction_queued(self, tx, future):
+        """Show a queued add or edit as pending until its batch commits."""
+        tx_id = tx[0]
+        if tx_id is None:
+            tx_id = self.next_temp_id
+            self.next_temp_id -= 1
+            tx = (tx_id,) + tx[1:]
+        self.transaction_saved(tx)
+        self.set_pending(tx_id)
+
+        def committed(result):
+            saved, acct = result
+            accounts_sync.upsert(acct)
+            if not self.winfo_exists():
+                return
+            self.set_pending(tx_id, False)
+            if tx_id < 0:
+                self.transaction_removed(tx_id)
+            self.transaction_saved(saved)
+
+        def failed(e):
+            if self.winfo_exists():
+                self.pending.discard(tx_id)
+                self.refresh_transactions()   # drop the optimistic row
+
+        run_in_background(self.status, "Saving...", future, on_done=committed, on_error=failed,
+                          error_title="Error", error_prefix="Could not save transaction:")
+
+    def still_saving(self, tx_id):
+        if tx_id in self.pending or tx_id < 0:
+            messagebox.showwarning("Still saving", "This transaction is still being saved; try again in a moment.")
+            return True
+        return False
+
+    def apply_changes(self, changed):
+        """Apply {tx id: row or None if deleted} from the change feed to the loaded rows."""
+        unseen = False
+        with stats.timer("ui", "transactions: apply changes", len(changed)):
+            for tx_id, tx in changed.items():
+                if tx_id in self.pending:
+                    continue  # our own queued write; its commit callback updates the row
+                if self.store.find(tx_id) is None:
+                    # It may have been above the loaded range before the change, so
+                    # the opening balance is re-read once all changes are applied
+                    unseen = True
+                    if tx is None or (self.more_before and len(self.store) and (tx[3], tx_id) < self.store.key(0)):
+                        continue
+                if tx is not None:
+                    self.transaction_saved(tx)
+                else:
+                    self.transaction_removed(tx_id)
+        if unseen and self.more_before and len(self.store):
+            self.refresh_opening()
 
     def add_transaction(self):
-        TransactionDialog(self, self.account_id, None, self.refresh_transactions)
+        TransactionDialog(self, self.account_id, None, self.transaction_saved, self.transaction_queued)
 
     def edit_transaction(self):
         selected = self.trans_tree.focus()
         if not selected:
             messagebox.showwarning("No selection", "Select a transaction to edit.")
             return
-        tx_id = self.trans_tree.item(selected)['values'][4]
-        TransactionDialog(self, self.account_id, tx_id, self.refresh_transactions)
+        tx_id = self.trans_tree.item(selected)['values'][5]
+        if self.still_saving(tx_id):
+            return
+        TransactionDialog(self, self.account_id, tx_id, self.transaction_saved, self.transaction_queued)
 
     def delete_transaction(self):
         selected = self.trans_tree.focus()
         if not selected:
             messagebox.showwarning("No selection", "Select a transaction to delete.")
             return
-        values = self.trans_tree.item(selected)['values']
-        tx_id = values[4]
-        tx_type = values[0]
-        tx_amount = float(values[1])
+        tx_id = self.trans_tree.item(selected)['values'][5]
+        if self.still_saving(tx_id):
+            return
         if messagebox.askyesno("Confirm Delete", "Delete this transaction?"):
-            try:
-                # Reverse the effect on balance
-                if tx_type == "Deposit":
-                    cursor.execute("UPDATE accounts SET balance = balance - %s WHERE id=%s", (tx_amount, self.account_id))
-                else:
-                    cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id=%s", (tx_amount, self.account_id))
-                cursor.execute("DELETE FROM transactions WHERE id=%s", (tx_id,))
-                conn.commit()
-                self.refresh_transactions()
-                refresh_accounts()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not delete transaction:\n{e}")
+            def deleted(acct):
+                accounts_sync.upsert(acct)
+                if self.winfo_exists():
+                    self.pending.discard(tx_id)
+                    self.transaction_removed(tx_id)
+
+            def failed(e):
+                if self.winfo_exists():
+                    self.set_pending(tx_id, False)
+
+            if coalescer is not None:
+                job = (coalescer.delete_transaction(self.account_id, tx_id),)
+                self.set_pending(tx_id)
+            else:
+                job = (service.delete_transaction, self.account_id, tx_id)
+            run_in_background(self.status, "Deleting transaction...", *job, on_done=deleted, on_error=failed,
+                              error_title="Error", error_prefix="Could not delete transaction:")
+
+    def show_balance_on_date(self):
+        date_str = simpledialog.askstring("Balance On Date", "Date (YYYY-MM-DD):", parent=self)
+        if not date_str:
+            return
+        try:
+            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            messagebox.showerror("Invalid Date", "Date must be YYYY-MM-DD.", parent=self)
+            return
+        run_in_background(self.status, "Calculating balance...", service.balance_at,
+                          self.account_id, date_obj, error_title="Error",
+                          on_done=lambda balance: messagebox.showinfo(
+                              "Balance On Date", f"Balance at end of {date_obj}: {balance:.2f}"))
 
 # === Add/Edit Transaction Dialog ===
 class TransactionDialog(tk.Toplevel):
-    def __init__(self, master, account_id, transaction_id, refresh_callback):
+    def __init__(self, master, account_id, transaction_id, on_saved, on_queued=None):
         super().__init__(master)
         self.account_id = account_id
         self.transaction_id = transaction_id
-        self.refresh_callback = refresh_callback
+        self.on_saved = on_saved  # called with the saved (id, type, amount, date, note) row
+        self.on_queued = on_queued  # group commit: called with the unsaved row and its Future
         self.title("Add Transaction" if transaction_id is None else "Edit Transaction")
         self.geometry("350x250")
 
@@ -193,18 +763,32 @@ class TransactionDialog(tk.Toplevel):
         # Buttons
         btn_frame = tk.Frame(self)
         btn_frame.grid(row=4, columnspan=2, pady=10)
-        tk.Button(btn_frame, text="Save", command=self.save_transaction).pack(side=tk.LEFT, padx=5)
+        self.save_button = tk.Button(btn_frame, text="Save", command=self.save_transaction)
+        self.save_button.pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        self.status = StatusLabel(self)
+        self.status.grid(row=5, columnspan=2, sticky=tk.W, padx=5)
 
         # If editing, load existing values
         if self.transaction_id:
-            cursor.execute("SELECT type, amount, date, note FROM transactions WHERE id=%s", (self.transaction_id,))
-            tx = cursor.fetchone()
-            if tx:
-                self.type_var.set(tx[0])
-                self.amount_entry.insert(0, f"{tx[1]:.2f}")
-                self.date_entry.insert(0, tx[2].isoformat())
-                self.note_entry.insert(0, tx[3])
+            self.save_button.config(state=tk.DISABLED)
+            run_in_background(self.status, "Loading...", service.transaction, self.transaction_id,
+                              on_done=self.fill_fields, on_error=self.enable_save)
+
+    def fill_fields(self, tx):
+        if not self.winfo_exists():
+            return
+        if tx:
+            _, tx_type, amount, date, note = tx
+            self.type_var.set(tx_type)
+            self.amount_entry.insert(0, f"{amount:.2f}")
+            self.date_entry.insert(0, date.isoformat())
+            self.note_entry.insert(0, note)
+        self.enable_save()
+
+    def enable_save(self, *_):
+        if self.winfo_exists():
+            self.save_button.config(state=tk.NORMAL)
 
     def save_transaction(self):
         tx_type = self.type_var.get()
@@ -217,10 +801,8 @@ class TransactionDialog(tk.Toplevel):
             messagebox.showwarning("Missing data", "Type, amount, and date are required.")
             return
         try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError("Amount must be positive.")
-        except Exception as e:
+            amount = check_amount(amount_str)
+        except ValueError as e:
             messagebox.showerror("Invalid Amount", str(e))
             return
         try:
@@ -229,388 +811,358 @@ class TransactionDialog(tk.Toplevel):
             messagebox.showerror("Invalid Date", "Date must be YYYY-MM-DD.")
             return
 
-        # Get current balance
-        cursor.execute("SELECT balance FROM accounts WHERE id=%s", (self.account_id,))
-        current_balance = cursor.fetchone()[0]
-
+        if coalescer is not None and self.on_queued:
+            self.queue_save(tx_type, amount, date_obj, note)
+            return
+        self.save_button.config(state=tk.DISABLED)
         if self.transaction_id is None:
-            # Add new transaction
-            if tx_type == "Withdrawal" and amount > current_balance:
-                messagebox.showerror("Overdraft", "Withdrawal exceeds current balance.")
-                return
-            try:
-                if tx_type == "Deposit":
-                    cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id=%s", (amount, self.account_id))
-                else:
-                    cursor.execute("UPDATE accounts SET balance = balance - %s WHERE id=%s", (amount, self.account_id))
-                cursor.execute(
-                    "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
-                    (self.account_id, tx_type, amount, date_obj, note)
-                )
-                conn.commit()
-                self.refresh_callback()
-                refresh_accounts()
-                self.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not add transaction:\n{e}")
+            job = (service.add_transaction, self.account_id, tx_type, amount, date_obj, note)
+            error_prefix = "Could not add transaction:"
         else:
-            # Edit existing transaction
-            try:
-                cursor.execute("SELECT type, amount FROM transactions WHERE id=%s", (self.transaction_id,))
-                original_type, original_amount = cursor.fetchone()
-                # Revert original effect
-                if original_type == "Deposit":
-                    new_balance = current_balance - original_amount
-                else:
-                    new_balance = current_balance + original_amount
-                # Apply new effect
-                if tx_type == "Deposit":
-                    new_balance += amount
-                else:
-                    new_balance -= amount
-                if new_balance < 0:
-                    messagebox.showerror("Overdraft", "Change would make balance negative.")
-                    return
-                cursor.execute("UPDATE accounts SET balance = %s WHERE id=%s", (new_balance, self.account_id))
-                cursor.execute(
-                    "UPDATE transactions SET type=%s, amount=%s, date=%s, note=%s WHERE id=%s",
-                    (tx_type, amount, date_obj, note, self.transaction_id)
-                )
-                conn.commit()
-                self.refresh_callback()
-                refresh_accounts()
-                self.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not update transaction:\n{e}")
-
-# === Main Window ===
-root = tk.Tk()
-root.title("Savings Ledger")
-root.geometry("400x300")
-
-# Accounts table
-accounts_tree = ttk.Treeview(root, columns=("Name", "Balance", "ID"), show='headings')
-accounts_tree.heading("Name", text="Account")
-accounts_tree.heading("Balance", text="Balance")
-accounts_tree.heading("ID", text="ID")
-accounts_tree.column("ID", width=0, stretch=False)  # hide ID
-accounts_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-# Buttons
-btns = tk.Frame(root)
-btns.pack(fill=tk.X, pady=5)
-tk.Button(btns, text="Add Account", command=add_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="Edit Account", command=edit_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="Delete Account", command=delete_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="View Transactions", command=open_transactions).pack(side=tk.RIGHT, padx=5)
-
-refresh_accounts()
-root.mainloop()
-import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import mysql.connector
-from datetime import datetime
-
-# === Database Connection ===
-# Update host/user/password/database if needed
-try:
-    conn = mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="",       # default XAMPP root has no password
-        database="cccs105"
-    )
-    cursor = conn.cursor(buffered=True)
-except mysql.connector.Error as err:
-    print("Error: Could not connect to database. Check MySQL status and credentials.")
-    raise err
+            job = (service.update_transaction, self.account_id, self.transaction_id, tx_type, amount, date_obj, note)
+            error_prefix = "Could not update transaction:"
+        run_in_background(self.status, "Saving...", *job, on_done=self.saved,
+                          on_error=self.enable_save, error_title="Error", error_prefix=error_prefix)
 
-# === Helper Functions ===
-def refresh_accounts():
-    """Load accounts from DB into the Treeview."""
-    for row in accounts_tree.get_children():
-        accounts_tree.delete(row)
-    try:
-        cursor.execute("SELECT id, name, balance FROM accounts")
-        for acct in cursor.fetchall():
-            name = acct[1]
-            balance = f"{acct[2]:.2f}"
-            accounts_tree.insert("", "end", values=(name, balance, acct[0]))
-    except Exception as e:
-        messagebox.showerror("Database Error", str(e))
-
-def add_account():
-    name = simpledialog.askstring("Add Account", "Enter new account name:")
-    if name:
+    def queue_save(self, tx_type, amount, date_obj, note):
+        """Group commit: hand the write to the queue and close right away."""
         try:
-            cursor.execute("INSERT INTO accounts (name, balance) VALUES (%s, %s)", (name, 0.0))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not add account:\n{e}")
+            if self.transaction_id is None:
+                future = coalescer.add_transaction(self.account_id, tx_type, amount, date_obj, note)
+            else:
+                future = coalescer.update_transaction(
+                    self.account_id, self.transaction_id, tx_type, amount, date_obj, note)
+        except ValueError as e:
+            messagebox.showerror("Invalid Transaction", str(e))
+            return
+        self.on_queued((self.transaction_id, tx_type, amount, date_obj, note), future)
+        self.destroy()
 
-def edit_account():
-    selected = accounts_tree.focus()
-    if not selected:
-        messagebox.showwarning("No selection", "Select an account to edit.")
-        return
-    item = accounts_tree.item(selected)
-    acct_id = item['values'][2]
-    old_name = item['values'][0]
-    new_name = simpledialog.askstring("Edit Account", f"New name for '{old_name}':", initialvalue=old_name)
-    if new_name:
-        try:
-            cursor.execute("UPDATE accounts SET name=%s WHERE id=%s", (new_name, acct_id))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not rename account:\n{e}")
+    def saved(self, result):
+        tx, acct = result
+        accounts_sync.upsert(acct)
+        if self.winfo_exists():
+            self.on_saved(tx)
+            self.destroy()
 
-def delete_account():
-    selected = accounts_tree.focus()
-    if not selected:
-        messagebox.showwarning("No selection", "Select an account to delete.")
-        return
-    item = accounts_tree.item(selected)
-    acct_id = item['values'][2]
-    acct_name = item['values'][0]
-    if messagebox.askyesno("Confirm Delete", f"Delete account '{acct_name}' and all its transactions?"):
-        try:
-            cursor.execute("DELETE FROM transactions WHERE account_id=%s", (acct_id,))
-            cursor.execute("DELETE FROM accounts WHERE id=%s", (acct_id,))
-            conn.commit()
-            refresh_accounts()
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not delete account:\n{e}")
+# === Search Window ===
+def search_bar(master, on_search):
+    """A "Search notes" entry with a button; on_search(text) runs on Enter or click."""
+    bar = tk.Frame(master)
+    bar.pack(fill=tk.X, padx=5, pady=(5, 0))
+    tk.Label(bar, text="Search notes").pack(side=tk.LEFT)
+    entry = tk.Entry(bar)
+    entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+    entry.bind("<Return>", lambda e: on_search(entry.get()))
+    tk.Button(bar, text="Search", command=lambda: on_search(entry.get())).pack(side=tk.LEFT)
+    return entry
 
-def open_transactions():
-    selected = accounts_tree.focus()
-    if not selected:
-        messagebox.showwarning("No selection", "Select an account to view transactions.")
-        return
-    item = accounts_tree.item(selected)
-    acct_id = item['values'][2]
-    acct_name = item['values'][0]
-    TransactionsWindow(root, acct_id, acct_name)
+def format_search_result(tx, names=None):
+    tx_id, acct_id, tx_type, amount, date, note = tx
+    return ((names or {}).get(acct_id, acct_id), tx_type, f"{amount:.2f}", date, note, tx_id)
 
-# === Transactions Window ===
-class TransactionsWindow(tk.Toplevel):
-    def __init__(self, master, account_id, account_name):
+class SearchWindow(tk.Toplevel):
+    """Transactions whose notes contain all the search words, newest first.
+
+    Searches one account, or all of them when account_id is None. Amount
+    and date filters narrow the results; pages load as the list is scrolled.
+    """
+    def __init__(self, master, text="", account_id=None, account_name=None):
         super().__init__(master)
-        self.title(f"Transactions - {account_name}")
+        self.title(f"Search - {account_name}" if account_id is not None else "Search All Accounts")
         self.account_id = account_id
-        self.geometry("600x400")
+        self.geometry("760x400")
 
-        # Transactions Table
-        columns = ("Type", "Amount", "Date", "Note", "ID")
-        self.trans_tree = ttk.Treeview(self, columns=columns, show='headings')
-        self.trans_tree.heading("Type", text="Type")
-        self.trans_tree.heading("Amount", text="Amount")
-        self.trans_tree.heading("Date", text="Date")
-        self.trans_tree.heading("Note", text="Note")
-        self.trans_tree.heading("ID", text="ID")
-        self.trans_tree.column("ID", width=0, stretch=False)  # hide ID column
-        self.trans_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        # Search fields
+        fields = tk.Frame(self)
+        fields.pack(fill=tk.X, padx=5, pady=5)
+        self.entries = {}
+        for label, width in (("Words", 20), ("Min amount", 8), ("Max amount", 8), ("From", 10), ("To", 10)):
+            tk.Label(fields, text=label).pack(side=tk.LEFT)
+            self.entries[label] = tk.Entry(fields, width=width)
+            self.entries[label].pack(side=tk.LEFT, padx=(2, 8))
+            self.entries[label].bind("<Return>", lambda e: self.run_search())
+        self.entries["Words"].insert(0, text)
+        tk.Button(fields, text="Search", command=self.run_search).pack(side=tk.RIGHT)
 
-        # Buttons
-        btn_frame = tk.Frame(self)
-        btn_frame.pack(fill=tk.X, pady=5)
-        tk.Button(btn_frame, text="Add Transaction", command=self.add_transaction).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Edit Transaction", command=self.edit_transaction).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Delete Transaction", command=self.delete_transaction).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+        # Results table
+        columns = ("Account", "Type", "Amount", "Date", "Note", "ID")
+        self.results_tree = ttk.Treeview(self, columns=columns, show='headings')
+        for column in columns:
+            self.results_tree.heading(column, text=column)
+        self.results_tree.column("ID", width=0, stretch=False)  # hide ID column
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.status = StatusLabel(self)
+        self.status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+        self.results_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        self.refresh_transactions()
+        self.names = account_names()
+        self.sync = TreeSync(self.results_tree, lambda tx: format_search_result(tx, self.names), "search")
+        self.criteria = None        # (text, min, max, from, to) of the current search
+        self.last_key = None        # (date, id) of the last row shown
+        self.more = False
+        self.fetch_pending = False
+        self.generation = 0         # bumped per search so late pages of an old one are ignored
+        if text.strip():
+            self.run_search()
 
-    def refresh_transactions(self):
-        for row in self.trans_tree.get_children():
-            self.trans_tree.delete(row)
+    def read_criteria(self):
+        """The search fields as (text, min amount, max amount, from date, to date), or None if invalid."""
+        values = {label: entry.get().strip() for label, entry in self.entries.items()}
         try:
-            cursor.execute("SELECT id, type, amount, date, note FROM transactions WHERE account_id=%s", (self.account_id,))
-            for tx in cursor.fetchall():
-                tx_id, tx_type, amount, date, note = tx
-                self.trans_tree.insert("", "end", values=(tx_type, f"{amount:.2f}", date, note, tx_id))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-
-    def add_transaction(self):
-        TransactionDialog(self, self.account_id, None, self.refresh_transactions)
+            amounts = [parse_amount(values[k]) if values[k] else None for k in ("Min amount", "Max amount")]
+        except ValueError:
+            messagebox.showerror("Invalid Amount", "Amounts must be numbers.", parent=self)
+            return None
+        try:
+            dates = [datetime.strptime(values[k], "%Y-%m-%d").date() if values[k] else None for k in ("From", "To")]
+        except ValueError:
+            messagebox.showerror("Invalid Date", "Dates must be YYYY-MM-DD.", parent=self)
+            return None
+        return (values["Words"], *amounts, *dates)
 
-    def edit_transaction(self):
-        selected = self.trans_tree.focus()
-        if not selected:
-            messagebox.showwarning("No selection", "Select a transaction to edit.")
+    def run_search(self):
+        criteria = self.read_criteria()
+        if criteria is None:
             return
-        tx_id = self.trans_tree.item(selected)['values'][4]
-        TransactionDialog(self, self.account_id, tx_id, self.refresh_transactions)
+        self.criteria = criteria
+        self.generation += 1
+        self.sync.clear()
+        self.last_key = None
+        self.fetch_page()
 
-    def delete_transaction(self):
-        selected = self.trans_tree.focus()
-        if not selected:
-            messagebox.showwarning("No selection", "Select a transaction to delete.")
-            return
-        values = self.trans_tree.item(selected)['values']
-        tx_id = values[4]
-        tx_type = values[0]
-        tx_amount = float(values[1])
-        if messagebox.askyesno("Confirm Delete", "Delete this transaction?"):
-            try:
-                # Reverse the effect on balance
-                if tx_type == "Deposit":
-                    cursor.execute("UPDATE accounts SET balance = balance - %s WHERE id=%s", (tx_amount, self.account_id))
-                else:
-                    cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id=%s", (tx_amount, self.account_id))
-                cursor.execute("DELETE FROM transactions WHERE id=%s", (tx_id,))
-                conn.commit()
-                self.refresh_transactions()
-                refresh_accounts()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not delete transaction:\n{e}")
+    def on_tree_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.more and not self.fetch_pending and float(last) >= 1 - PREFETCH_MARGIN:
+            self.fetch_page()
 
-# === Add/Edit Transaction Dialog ===
-class TransactionDialog(tk.Toplevel):
-    def __init__(self, master, account_id, transaction_id, refresh_callback):
+    def fetch_page(self):
+        self.fetch_pending = True
+        generation = self.generation
+
+        def loaded(rows):
+            if generation != self.generation or not self.winfo_exists():
+                return
+            self.fetch_pending = False
+            self.more = len(rows) == PAGE_SIZE
+            with stats.timer("ui", "search: insert page", len(rows)):
+                for row in rows:
+                    self.sync.upsert(row)
+            if rows:
+                self.last_key = (rows[-1][4], rows[-1][0])
+            elif self.last_key is None:
+                self.status.config(text="No matching transactions.")
+
+        def failed(e):
+            self.fetch_pending = False
+
+        text, min_amount, max_amount, start, end = self.criteria
+        run_in_background(self.status, "Searching...", service.search, text, self.account_id,
+                          min_amount, max_amount, start, end, self.last_key, PAGE_SIZE,
+                          on_done=loaded, on_error=failed, error_title="Search Failed")
+
+# === Reports Tab ===
+ALL_ACCOUNTS = "All accounts"
+REPORT_GROUPS = {"Month": "month", "Year": "year", "Note keyword": "keyword"}
+
+class ReportsTab(tk.Frame):
+    """Deposit and withdrawal totals per month, year or note keyword (see reports.py)."""
+    def __init__(self, master):
         super().__init__(master)
-        self.account_id = account_id
-        self.transaction_id = transaction_id
-        self.refresh_callback = refresh_callback
-        self.title("Add Transaction" if transaction_id is None else "Edit Transaction")
-        self.geometry("350x250")
+        controls = tk.Frame(self)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        tk.Label(controls, text="Group by").pack(side=tk.LEFT)
+        self.group_combo = ttk.Combobox(controls, values=list(REPORT_GROUPS), state="readonly", width=12)
+        self.group_combo.set("Month")
+        self.group_combo.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Account").pack(side=tk.LEFT)
+        self.account_combo = ttk.Combobox(controls, state="readonly", width=16, postcommand=self.list_accounts)
+        self.account_combo.set(ALL_ACCOUNTS)
+        self.account_combo.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls, text="Year").pack(side=tk.LEFT)
+        self.year_entry = tk.Entry(controls, width=6)
+        self.year_entry.pack(side=tk.LEFT, padx=5)
+        self.run_button = tk.Button(controls, text="Run Report", command=self.run_report)
+        self.run_button.pack(side=tk.RIGHT)
 
-        # Type
-        tk.Label(self, text="Type:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
-        self.type_var = tk.StringVar()
-        self.type_combo = ttk.Combobox(self, textvariable=self.type_var, values=["Deposit", "Withdrawal"], state="readonly")
-        self.type_combo.grid(row=0, column=1, padx=5, pady=5)
+        columns = ("Group", "Account", "Deposits", "Withdrawals", "Net", "Count")
+        self.report_tree = ttk.Treeview(self, columns=columns, show='headings')
+        for column in columns:
+            self.report_tree.heading(column, text=column)
+            self.report_tree.column(column, width=80)
+        self.report_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.accounts = {}   # combobox label -> account id
 
-        # Amount
-        tk.Label(self, text="Amount:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
-        self.amount_entry = tk.Entry(self)
-        self.amount_entry.grid(row=1, column=1, padx=5, pady=5)
+    def list_accounts(self):
+        """Offer the accounts currently shown in the Accounts tab."""
+        self.accounts = {f"{name} ({acct_id})": acct_id for acct_id, name in account_names().items()}
+        self.account_combo.config(values=[ALL_ACCOUNTS] + list(self.accounts))
 
-        # Date
-        tk.Label(self, text="Date (YYYY-MM-DD):").grid(row=2, column=0, sticky=tk.W, padx=5, pady=5)
-        self.date_entry = tk.Entry(self)
-        self.date_entry.grid(row=2, column=1, padx=5, pady=5)
+    def run_report(self):
+        year = self.year_entry.get().strip()
+        if year and not (year.isdigit() and 1 <= int(year) <= 9999):
+            messagebox.showerror("Invalid Year", "Year must be a number such as 2024, or empty for all years.")
+            return
+        group = REPORT_GROUPS[self.group_combo.get()]
+        account_id = self.accounts.get(self.account_combo.get())
+        self.run_button.config(state=tk.DISABLED)
+        run_in_background(status, "Running report...", service.report, group, account_id,
+                          int(year) if year else None, on_done=self.show_report,
+                          on_error=lambda e: self.run_button.config(state=tk.NORMAL),
+                          error_title="Report Failed")
 
-        # Note
-        tk.Label(self, text="Note:").grid(row=3, column=0, sticky=tk.W, padx=5, pady=5)
-        self.note_entry = tk.Entry(self)
-        self.note_entry.grid(row=3, column=1, padx=5, pady=5)
+    def show_report(self, rows):
+        self.run_button.config(state=tk.NORMAL)
+        names = account_names()
+        with stats.timer("ui", "reports: fill", len(rows)):
+            self.report_tree.delete(*self.report_tree.get_children())
+            for row in rows:
+                group, acct_id, *totals = format_row(row)
+                self.report_tree.insert("", "end", values=(group, names.get(acct_id, acct_id), *totals))
 
-        # Buttons
-        btn_frame = tk.Frame(self)
-        btn_frame.grid(row=4, columnspan=2, pady=10)
-        tk.Button(btn_frame, text="Save", command=self.save_transaction).pack(side=tk.LEFT, padx=5)
-        tk.Button(btn_frame, text="Cancel", command=self.destroy).pack(side=tk.RIGHT, padx=5)
+# === Diagnostics ===
+class DiagnosticsWindow(tk.Toplevel):
+    """Live view of `stats`: query, fetch and Treeview timings and the slow query log."""
+    REFRESH_MS = 1000
 
-        # If editing, load existing values
-        if self.transaction_id:
-            cursor.execute("SELECT type, amount, date, note FROM transactions WHERE id=%s", (self.transaction_id,))
-            tx = cursor.fetchone()
-            if tx:
-                self.type_var.set(tx[0])
-                self.amount_entry.insert(0, f"{tx[1]:.2f}")
-                self.date_entry.insert(0, tx[2].isoformat())
-                self.note_entry.insert(0, tx[3])
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Diagnostics")
+        self.geometry("760x440")
+        self.summary = tk.Label(self, anchor=tk.W)
+        self.summary.pack(fill=tk.X, padx=5, pady=(5, 0))
 
-    def save_transaction(self):
-        tx_type = self.type_var.get()
-        amount_str = self.amount_entry.get()
-        date_str = self.date_entry.get()
-        note = self.note_entry.get()
+        btns = tk.Frame(self)
+        btns.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+        tk.Button(btns, text="Dump to File", command=self.dump_to_file).pack(side=tk.LEFT, padx=5)
+        tk.Button(btns, text="Reset", command=self.reset).pack(side=tk.LEFT, padx=5)
+        tk.Button(btns, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=5)
 
-        # Validate fields
-        if not tx_type or not amount_str or not date_str:
-            messagebox.showwarning("Missing data", "Type, amount, and date are required.")
+        columns = ("Kind", "Name", "Calls", "Mean ms", "p95 ms", "Max ms", "Rows")
+        timings_tree = ttk.Treeview(self, columns=columns, show="headings", height=10)
+        for col, width in zip(columns, (50, 400, 55, 60, 60, 60, 60)):
+            timings_tree.heading(col, text=col)
+            timings_tree.column(col, width=width, stretch=col == "Name")
+        timings_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.timings = TreeSync(timings_tree, lambda row: row[1:], "diagnostics")
+
+        tk.Label(self, text="Slow queries", anchor=tk.W).pack(fill=tk.X, padx=5)
+        columns = ("At", "ms", "Rows", "SQL")
+        slow_tree = ttk.Treeview(self, columns=columns, show="headings", height=5)
+        for col, width in zip(columns, (140, 60, 50, 480)):
+            slow_tree.heading(col, text=col)
+            slow_tree.column(col, width=width, stretch=col == "SQL")
+        slow_tree.pack(fill=tk.BOTH, padx=5)
+        self.slow = TreeSync(slow_tree, lambda row: row[1:], "diagnostics")
+        self.refresh()
+
+    def refresh(self):
+        if not self.winfo_exists():
             return
-        try:
-            amount = float(amount_str)
-            if amount <= 0:
-                raise ValueError("Amount must be positive.")
-        except Exception as e:
-            messagebox.showerror("Invalid Amount", str(e))
+        snapshot = stats.snapshot()
+        if stats.enabled:
+            self.summary.config(text=f"Since {snapshot['since']}, recording {snapshot['sample']:.0%} of calls; "
+                                     f"statements over {stats.slow_seconds * 1000:.0f} ms are always logged.")
+        else:
+            self.summary.config(text="Instrumentation is off (DB_STATS_SAMPLE=0 in config.env).")
+
+        def ms(seconds):
+            return f"{seconds * 1000:.2f}"
+        self.timings.reconcile([((t["kind"], t["name"]), t["kind"], t["name"], t["calls"], ms(t["mean"]),
+                                 ms(t["p95"]), ms(t["max"]), t["rows"]) for t in snapshot["timings"]])
+        self.slow.reconcile([((q["at"], q["sql"], q["seconds"]), q["at"], ms(q["seconds"]),
+                              "" if q["rows"] is None else q["rows"], q["sql"])
+                             for q in reversed(snapshot["slow_queries"])])
+        self.after(self.REFRESH_MS, self.refresh)
+
+    def dump_to_file(self):
+        path = filedialog.asksaveasfilename(parent=self, title="Save diagnostics", defaultextension=".json",
+                                            initialfile="ledger-stats.json",
+                                            filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+        if not path:
             return
         try:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d").date()
-        except ValueError:
-            messagebox.showerror("Invalid Date", "Date must be YYYY-MM-DD.")
-            return
+            stats.dump(path)
+        except OSError as e:
+            messagebox.showerror("Save Failed", str(e), parent=self)
 
-        # Get current balance
-        cursor.execute("SELECT balance FROM accounts WHERE id=%s", (self.account_id,))
-        current_balance = cursor.fetchone()[0]
+    def reset(self):
+        stats.reset()
+        self.timings.clear()
+        self.slow.clear()
 
-        if self.transaction_id is None:
-            # Add new transaction
-            if tx_type == "Withdrawal" and amount > current_balance:
-                messagebox.showerror("Overdraft", "Withdrawal exceeds current balance.")
-                return
-            try:
-                if tx_type == "Deposit":
-                    cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id=%s", (amount, self.account_id))
-                else:
-                    cursor.execute("UPDATE accounts SET balance = balance - %s WHERE id=%s", (amount, self.account_id))
-                cursor.execute(
-                    "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
-                    (self.account_id, tx_type, amount, date_obj, note)
-                )
-                conn.commit()
-                self.refresh_callback()
-                refresh_accounts()
-                self.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not add transaction:\n{e}")
-        else:
-            # Edit existing transaction
-            try:
-                cursor.execute("SELECT type, amount FROM transactions WHERE id=%s", (self.transaction_id,))
-                original_type, original_amount = cursor.fetchone()
-                # Revert original effect
-                if original_type == "Deposit":
-                    new_balance = current_balance - original_amount
-                else:
-                    new_balance = current_balance + original_amount
-                # Apply new effect
-                if tx_type == "Deposit":
-                    new_balance += amount
-                else:
-                    new_balance -= amount
-                if new_balance < 0:
-                    messagebox.showerror("Overdraft", "Change would make balance negative.")
-                    return
-                cursor.execute("UPDATE accounts SET balance = %s WHERE id=%s", (new_balance, self.account_id))
-                cursor.execute(
-                    "UPDATE transactions SET type=%s, amount=%s, date=%s, note=%s WHERE id=%s",
-                    (tx_type, amount, date_obj, note, self.transaction_id)
-                )
-                conn.commit()
-                self.refresh_callback()
-                refresh_accounts()
-                self.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not update transaction:\n{e}")
+def open_diagnostics(event=None):
+    for window in root.winfo_children():
+        if isinstance(window, DiagnosticsWindow):
+            window.lift()
+            return
+    DiagnosticsWindow(root)
 
 # === Main Window ===
-root = tk.Tk()
-root.title("Savings Ledger")
-root.geometry("400x300")
-
-# Accounts table
-accounts_tree = ttk.Treeview(root, columns=("Name", "Balance", "ID"), show='headings')
-accounts_tree.heading("Name", text="Account")
-accounts_tree.heading("Balance", text="Balance")
-accounts_tree.heading("ID", text="ID")
-accounts_tree.column("ID", width=0, stretch=False)  # hide ID
-accounts_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-
-# Buttons
-btns = tk.Frame(root)
-btns.pack(fill=tk.X, pady=5)
-tk.Button(btns, text="Add Account", command=add_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="Edit Account", command=edit_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="Delete Account", command=delete_account).pack(side=tk.LEFT, padx=5)
-tk.Button(btns, text="View Transactions", command=open_transactions).pack(side=tk.RIGHT, padx=5)
-
-refresh_accounts()
-root.mainloop()
+def main():
+    global root, accounts_tree, accounts_sync, status, sync_status, executor, coalescer
+    root = tk.Tk()
+    root.title("Savings Ledger")
+    root.geometry("620x340")
+
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill=tk.BOTH, expand=True)
+    accounts_tab = tk.Frame(notebook)
+    notebook.add(accounts_tab, text="Accounts")
+
+    search_bar(accounts_tab, search_all_accounts)
+
+    # Accounts table
+    accounts_tree = ttk.Treeview(accounts_tab, columns=("Name", "Balance", "ID"), show='headings')
+    accounts_tree.heading("Name", text="Account")
+    accounts_tree.heading("Balance", text="Balance")
+    accounts_tree.heading("ID", text="ID")
+    accounts_tree.column("ID", width=0, stretch=False)  # hide ID
+    accounts_tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+    accounts_sync = TreeSync(accounts_tree, format_account, "accounts")
+
+    # Buttons
+    btns = tk.Frame(accounts_tab)
+    btns.pack(fill=tk.X, pady=5)
+    tk.Button(btns, text="Add Account", command=add_account).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="Edit Account", command=edit_account).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="Delete Account", command=delete_account).pack(side=tk.LEFT, padx=5)
+    tk.Button(btns, text="View Transactions", command=open_transactions).pack(side=tk.RIGHT, padx=5)
+    tk.Button(btns, text="Import Statement", command=import_statement_file).pack(side=tk.RIGHT, padx=5)
+
+    notebook.add(ReportsTab(notebook), text="Reports")
+    root.bind("<F12>", open_diagnostics)
+    if replicated:
+        sync_status = tk.Label(root, anchor=tk.E, fg="gray")
+        sync_status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+    status = StatusLabel(root)
+    status.pack(side=tk.BOTTOM, fill=tk.X, padx=5)
+
+    # One worker per pooled connection
+    executor = QueryExecutor(root, max_workers=db.size)
+    if replicated:
+        # A local read: mark the change log before the first sync writes to it
+        service.db.read(feed.poll)
+        service.start_sync(float(db.config["DB_SYNC_SECONDS"]))
+    elif int(db.config["DB_GROUP_COMMIT_MS"]) > 0:
+        coalescer = WriteCoalescer(service, int(db.config["DB_GROUP_COMMIT_WRITES"]),
+                                   int(db.config["DB_GROUP_COMMIT_MS"]) / 1000)
+    show_snapshot()
+    # Queue the first queries once the event loop runs, so the window paints first
+    root.after_idle(check_schema)
+    if int(db.config["DB_CHANGE_POLL_MS"]) > 0:
+        root.after_idle(watch_changes, int(db.config["DB_CHANGE_POLL_MS"]))
+    root.mainloop()
+    if snapshot_path and snapshot_message is None:
+        # Includes the changes applied since the last full load
+        save_snapshot(snapshot_path, sorted(accounts_sync.rows.values()))
+    if coalescer is not None:
+        coalescer.close()   # commit anything still queued
+    if replicated:
+        service.stop_sync()
+    executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    main()
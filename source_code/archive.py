@@ -0,0 +1,238 @@
+import re
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import checkpoints
+
+# === Bulk Deletion and Archival ===
+# Deleting an account with years of history, or moving old history out of
+# `transactions`, touches many rows. One statement for all of them holds
+# its row locks and undo log until the end while other writers wait.
+# Here every chunk of at most CHUNK_SIZE rows is its own db.write, and
+# each commit leaves the ledger consistent (balance, checkpoints and
+# transactions agree), so writers wait for one chunk at most and an
+# interrupted run can simply be started again.
+#
+# Chunks follow the (account_id, date) index, so every one is a bounded
+# range scan. Archival moves the rows dated before a cutoff into
+# transactions_archive (migration 007) and folds them into one summary
+# transaction per account, dated the day before the cutoff: balances,
+# checkpoints and running balances from the cutoff on are unchanged, and
+# the account's earlier checkpoints are dropped with its history.
+CHUNK_SIZE = 1000
+SUMMARY_NOTE = "Archived history before {cutoff}"
+SUMMARY_PATTERN = re.compile(r"^Archived history before \d{4}-\d{2}-\d{2}$")
+
+def net(rows):
+    """Sum of signed amounts of (account_id, type, amount, date, ...) rows."""
+    return sum((checkpoints.signed(tx_type, amount) for _, tx_type, amount, *_ in rows), Decimal("0.00"))
+
+def lock_account(cursor, acct_id):
+    """Lock the account row first, as every write path in ledger.py does; whether it exists."""
+    cursor.execute("SELECT id FROM accounts WHERE id=%s FOR UPDATE", (acct_id,))
+    return bool(cursor.fetchall())
+
+def delete_rows(cursor, rows):
+    placeholders = ", ".join(["%s"] * len(rows))
+    cursor.execute(f"DELETE FROM transactions WHERE id IN ({placeholders})", [row[4] for row in rows])
+
+def move_checkpoints(cursor, acct_id, rows, to_month=None):
+    """Take the rows out of their months' checkpoints (and into `to_month`'s)."""
+    deltas = defaultdict(Decimal)
+    for _, tx_type, amount, date, _ in rows:
+        deltas[checkpoints.month_start(date)] -= checkpoints.signed(tx_type, amount)
+    if to_month is not None:
+        deltas[to_month] += net(rows)
+    for month, delta in sorted(deltas.items()):
+        if delta:
+            checkpoints.apply_delta(cursor, acct_id, month, delta)
+
+# --- Chunked deletion ---
+def count_history(cursor, acct_id):
+    """Transactions plus archived transactions of an account."""
+    cursor.execute("SELECT COUNT(*) FROM transactions WHERE account_id=%s", (acct_id,))
+    live = cursor.fetchone()[0]
+    cursor.execute("SELECT COUNT(*) FROM transactions_archive WHERE account_id=%s", (acct_id,))
+    return live + cursor.fetchone()[0]
+
+def delete_chunk(cursor, acct_id, size=CHUNK_SIZE):
+    """Delete an account's newest `size` transactions and take them off its
+    balance and checkpoints; returns the number deleted.
+
+    Newest first, so what is left is always the start of the history and
+    the checkpoints of emptied months still hold its running balance.
+    """
+    if not lock_account(cursor, acct_id):
+        return 0
+    cursor.execute(
+        "SELECT account_id, type, amount, date, id FROM transactions WHERE account_id=%s "
+        "ORDER BY date DESC, id DESC LIMIT %s FOR UPDATE",
+        (acct_id, size)
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return 0
+    # May leave the balance negative for a while, as deleting a deposit can
+    cursor.execute("UPDATE accounts SET balance = balance - %s, version = version + 1 WHERE id=%s",
+                   (net(rows), acct_id))
+    delete_rows(cursor, rows)
+    move_checkpoints(cursor, acct_id, rows)
+    return len(rows)
+
+def delete_archived_chunk(cursor, acct_id, size=CHUNK_SIZE):
+    cursor.execute("DELETE FROM transactions_archive WHERE account_id=%s LIMIT %s", (acct_id, size))
+    return cursor.rowcount
+
+def delete_history(db, acct_id, chunk_size=CHUNK_SIZE, progress=None):
+    """Delete every transaction and archived transaction of an account, one
+    chunk per commit; returns the number deleted. The account row itself
+    stays: ledger.remove_account takes it and anything added meanwhile.
+
+    progress(deleted, total) is called after every chunk.
+    """
+    total = db.read(count_history, acct_id)
+    deleted = 0
+    for chunk in (delete_chunk, delete_archived_chunk):
+        while True:
+            count = db.write(chunk, acct_id, chunk_size)
+            if not count:
+                break
+            deleted += count
+            if progress:
+                progress(deleted, max(total, deleted))
+    return deleted
+
+# --- Archival ---
+def summary_note(cutoff):
+    return SUMMARY_NOTE.format(cutoff=cutoff.isoformat())
+
+def accounts_to_archive(cursor, cutoff, acct_id=None):
+    """[(account id, transactions before the cutoff)] of accounts that have any."""
+    sql = "SELECT account_id, COUNT(*) FROM transactions WHERE date < %s"
+    params = [cutoff]
+    if acct_id is not None:
+        sql += " AND account_id=%s"
+        params.append(acct_id)
+    cursor.execute(sql + " GROUP BY account_id ORDER BY account_id", params)
+    return cursor.fetchall()
+
+def ensure_partitions(cursor, cutoff):
+    """Add a yearly partition to transactions_archive for every year up to
+    the cutoff's that has none yet (MySQL only; DDL, so run it outside
+    a transaction). Years below the first partition share it."""
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'transactions_archive'"
+    )
+    years = [int(name[1:]) for (name,) in cursor.fetchall() if name and re.fullmatch(r"p\d{4}", name)]
+    if years:
+        first = max(years) + 1
+    else:
+        cursor.execute("SELECT YEAR(MIN(date)) FROM transactions WHERE date < %s", (cutoff,))
+        first = cursor.fetchone()[0] or cutoff.year
+    missing = range(first, cutoff.year + 1)
+    if not missing:
+        return []
+    parts = ", ".join(f"PARTITION p{year} VALUES LESS THAN ({year + 1})" for year in missing)
+    cursor.execute(f"ALTER TABLE transactions_archive REORGANIZE PARTITION p_future INTO "
+                   f"({parts}, PARTITION p_future VALUES LESS THAN MAXVALUE)")
+    return list(missing)
+
+def archive_chunk(cursor, acct_id, cutoff, size=CHUNK_SIZE):
+    """Move an account's oldest `size` transactions dated before `cutoff`
+    into transactions_archive and their net amount into the account's
+    summary transaction; returns the number moved.
+
+    Summary transactions of earlier runs are folded in, not archived, so
+    the archive never counts a period twice. The balance is unchanged.
+    """
+    if not lock_account(cursor, acct_id):
+        return 0
+    note = summary_note(cutoff)
+    day = cutoff - timedelta(days=1)
+    cursor.execute(
+        "SELECT id, type, amount FROM transactions WHERE account_id=%s AND date=%s AND note=%s FOR UPDATE",
+        (acct_id, day, note)
+    )
+    summary = cursor.fetchone()
+    cursor.execute(
+        "SELECT account_id, type, amount, date, id, note FROM transactions "
+        "WHERE account_id=%s AND date < %s AND id <> %s ORDER BY date, id LIMIT %s FOR UPDATE",
+        (acct_id, cutoff, summary[0] if summary else 0, size)
+    )
+    rows = cursor.fetchall()
+    if rows:
+        archived = [(tx_id, account_id, tx_type, amount, date, text)
+                    for account_id, tx_type, amount, date, tx_id, text in rows
+                    if not (text and SUMMARY_PATTERN.match(text))]
+        if archived:
+            cursor.executemany(
+                "INSERT INTO transactions_archive (id, account_id, type, amount, date, note) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                archived
+            )
+        rows = [row[:5] for row in rows]
+        delete_rows(cursor, rows)
+        total = net(rows) + (checkpoints.signed(summary[1], summary[2]) if summary else 0)
+        tx_type, amount = ("Deposit", total) if total >= 0 else ("Withdrawal", -total)
+        if summary:
+            cursor.execute("UPDATE transactions SET type=%s, amount=%s WHERE id=%s", (tx_type, amount, summary[0]))
+        else:
+            cursor.execute(
+                "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
+                (acct_id, tx_type, amount, day, note)
+            )
+        move_checkpoints(cursor, acct_id, rows, checkpoints.month_start(day))
+        cursor.execute("UPDATE accounts SET version = version + 1 WHERE id=%s", (acct_id,))
+    if len(rows) < size:
+        # Every earlier month now holds a zero balance
+        cursor.execute("DELETE FROM balance_checkpoints WHERE account_id=%s AND month < %s",
+                       (acct_id, checkpoints.month_start(day)))
+    return len(rows)
+
+def archive_before(db, cutoff, acct_id=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Archive the transactions dated before `cutoff` of one account or all;
+    returns the number moved. progress(moved, total) is called after every chunk."""
+    accounts = db.read(accounts_to_archive, cutoff, acct_id)
+    if not accounts:
+        return 0
+    db.read(ensure_partitions, cutoff)
+    total = sum(count for _, count in accounts)
+    moved = 0
+    for account_id, _ in accounts:
+        while True:
+            count = db.write(archive_chunk, account_id, cutoff, chunk_size)
+            moved += count
+            if progress and count:
+                progress(moved, max(total, moved))
+            if count < chunk_size:
+                break
+    return moved
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+    from db import ConnectionManager
+    from ledger import LedgerService
+
+    parser = argparse.ArgumentParser(description="Delete accounts or archive old transactions in chunks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    old = sub.add_parser("before", help="move transactions dated before DATE to transactions_archive")
+    old.add_argument("date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+    old.add_argument("--account", type=int, help="only this account")
+    remove = sub.add_parser("delete-account", help="delete an account and all its history")
+    remove.add_argument("account", type=int)
+    for p in (old, remove):
+        p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    def show(done, total):
+        print(f"\r{done} of {total} transactions", end="", flush=True)
+
+    service = LedgerService(ConnectionManager())
+    if args.command == "before":
+        count = service.archive(args.date, args.account, show, args.chunk_size)
+        print(f"\n{count} transactions archived.")
+    else:
+        service.delete_account(args.account, show, args.chunk_size)
+        print(f"\nAccount {args.account} deleted.")
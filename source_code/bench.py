@@ -0,0 +1,330 @@
+import csv
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from cache import LedgerCache
+from exporter import export_transactions
+from importer import import_statement, write_batch
+from ledger import PAGE_SIZE, LedgerService, fetch_transactions_page, insert_account, load_accounts
+
+# === Benchmarks ===
+# A deterministic data generator and timings of the ledger's hot paths, so
+# a change can be measured against the version before it. `generate` fills
+# a database with accounts and transactions that are the same for the same
+# seed; `run` times account list refresh, transaction page loads, single
+# writes with balance maintenance, bulk import and export, and writes the
+# results as JSON; `startup` times a cold import of the app in a fresh
+# interpreter with -X importtime; `compare` lines up two result files.
+#
+# Both work on the MySQL database of config.env or, with --sqlite PATH, on
+# a SQLite file with the replica schema (replica.py), which needs no
+# server. Point them at a scratch database: generated accounts are kept,
+# only the scratch account of `run` is deleted afterwards.
+HERE = os.path.dirname(os.path.abspath(__file__))
+START_DATE = date(2020, 1, 1)
+NOTES = ("groceries", "rent", "salary", "coffee", "fuel", "transfer", "interest",
+         "utilities", "dining out", "insurance", "pharmacy", "bookshop")
+GENERATE_BATCH = 5000
+SLOWER = 0.10   # compare flags results more than 10% slower
+
+# --- Data generator ---
+def generated_rows(account_ids, count, years, rng):
+    """Yield `count` (account_id, type, amount, date, note) rows in date order.
+
+    Low account ids get most of the rows, as in a real ledger where a few
+    accounts are busy. A withdrawal that would overdraw is made a deposit.
+    """
+    balances = dict.fromkeys(account_ids, 0)
+    days = 365 * years
+    for i in range(count):
+        acct_id = account_ids[int(len(account_ids) * rng.random() ** 3)]
+        day = START_DATE + timedelta(days=i * days // count)
+        note = f"{rng.choice(NOTES)} {rng.randint(1, 500)}"
+        amount = rng.randint(100, 50000)
+        if rng.random() < 0.55 or balances[acct_id] < amount:
+            amount = rng.randint(100, 250000)
+            balances[acct_id] += amount
+            yield acct_id, "Deposit", Decimal(amount).scaleb(-2), day, note
+        else:
+            balances[acct_id] -= amount
+            yield acct_id, "Withdrawal", Decimal(amount).scaleb(-2), day, note
+
+def insert_accounts(cursor, names):
+    return [insert_account(cursor, name)[0] for name in names]
+
+def generate(db, accounts=1000, transactions=100000, years=5, seed=1, progress=None):
+    """Add `accounts` accounts and `transactions` transactions; returns the new account ids."""
+    rng = random.Random(seed)
+    account_ids = db.write(insert_accounts, [f"bench {n + 1:05d}" for n in range(accounts)])
+    batch, written = [], 0
+    for row in generated_rows(account_ids, transactions, years, rng):
+        batch.append(row)
+        if len(batch) == GENERATE_BATCH:
+            db.write(write_batch, batch)
+            written += len(batch)
+            batch = []
+            if progress:
+                progress(written)
+    if batch:
+        db.write(write_batch, batch)
+        if progress:
+            progress(written + len(batch))
+    return account_ids
+
+# --- Timings ---
+def timed(fn, repeat):
+    """Seconds taken by each of `repeat` calls of fn()."""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return seconds
+
+def summary(seconds, rows=None):
+    # Nearest-rank p95: the smallest run at or above 95% of all runs, never below the median
+    result = {"runs": len(seconds), "min": min(seconds), "median": statistics.median(seconds),
+              "p95": sorted(seconds)[math.ceil(0.95 * len(seconds)) - 1], "seconds": seconds}
+    if rows is not None:
+        result["rows"] = rows
+    return result
+
+def busiest_account(cursor):
+    cursor.execute("SELECT account_id, COUNT(*) FROM transactions GROUP BY account_id ORDER BY 2 DESC LIMIT 1")
+    return cursor.fetchone()
+
+def load_all_transactions(db, account_id):
+    """Walk every page of an account, as scrolling to the end of its window does."""
+    total, after = 0, None
+    while True:
+        rows = db.read(fetch_transactions_page, account_id, after, None, PAGE_SIZE)
+        total += len(rows)
+        if len(rows) < PAGE_SIZE:
+            return total
+        after = (rows[-1][3], rows[-1][0])
+
+def write_statement(path, rows, seed):
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "type", "amount", "note"])
+        for i in range(rows):
+            writer.writerow([START_DATE + timedelta(days=i % 1800), "Deposit",
+                             f"{rng.randint(100, 99999) / 100:.2f}", f"{rng.choice(NOTES)} import"])
+
+def run(db, repeat=5, ops=200, import_rows=10000, export=True, seed=1, log=print):
+    """Time the hot paths; returns {name: summary}."""
+    uncached = LedgerService(db, LedgerCache(max_bytes=0))
+    results = {}
+
+    def record(name, seconds, rows=None):
+        results[name] = summary(seconds, rows)
+        log(f"{name:<24} median {results[name]['median'] * 1000:10.2f} ms  "
+            f"p95 {results[name]['p95'] * 1000:10.2f} ms  ({len(seconds)} runs)")
+
+    accounts = db.read(load_accounts)
+    record("account_list", timed(lambda: db.read(load_accounts), repeat), len(accounts))
+    cached = LedgerService(db)
+    cached.accounts()
+    record("account_list_cached", timed(cached.accounts, repeat), len(accounts))
+
+    busiest = db.read(busiest_account)
+    if busiest is not None:
+        acct_id, count = busiest
+        record("transactions_first_page",
+               timed(lambda: db.read(fetch_transactions_page, acct_id, None, None, PAGE_SIZE), repeat),
+               min(count, PAGE_SIZE))
+        record("transactions_all_pages", timed(lambda: load_all_transactions(db, acct_id), repeat), count)
+
+    rng = random.Random(seed)
+    scratch = uncached.add_account("bench scratch")[0]
+    tmp = tempfile.mkdtemp(prefix="ledger-bench-")
+    try:
+        tx_ids, adds, edits, deletes = [], [], [], []
+        for _ in range(ops):
+            day = START_DATE + timedelta(days=rng.randint(0, 1800))
+            amount = Decimal(rng.randint(100, 99999)).scaleb(-2)
+            started = time.perf_counter()
+            tx, _ = uncached.add_transaction(scratch, "Deposit", amount, day, "bench")
+            adds.append(time.perf_counter() - started)
+            tx_ids.append(tx[0])
+        for tx_id in tx_ids:
+            day = START_DATE + timedelta(days=rng.randint(0, 1800))
+            started = time.perf_counter()
+            uncached.update_transaction(scratch, tx_id, "Deposit", Decimal("1.00"), day, "bench edit")
+            edits.append(time.perf_counter() - started)
+        for tx_id in reversed(tx_ids):
+            started = time.perf_counter()
+            uncached.delete_transaction(scratch, tx_id)
+            deletes.append(time.perf_counter() - started)
+        if ops:
+            record("add_transaction", adds)
+            record("update_transaction", edits)
+            record("delete_transaction", deletes)
+
+        if import_rows:
+            statement = os.path.join(tmp, "statement.csv")
+            write_statement(statement, import_rows, seed)
+            record("import_statement", timed(lambda: import_statement(db, statement, scratch), 1), import_rows)
+
+        if export:
+            path = os.path.join(tmp, "export.csv")
+            exported = []
+            seconds = timed(lambda: exported.append(export_transactions(db, path)), 1)
+            record("export_csv", seconds, exported[-1])
+    finally:
+        uncached.delete_account(scratch)
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+    return results
+
+# --- Startup ---
+def import_profile(module="app"):
+    """Import `module` in a fresh interpreter with -X importtime.
+
+    Returns the seconds the process took and {module name: (depth, self
+    seconds, cumulative seconds)} from its import time report; depth 0 is
+    `module` itself, 1 its direct imports.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=HERE)
+    seconds = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, total, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            modules[name.strip()] = (depth, int(own) / 1e6, int(total) / 1e6)
+    return seconds, modules
+
+def startup(repeat=10, module="app", top=10, log=print):
+    """Time cold imports of `module`; returns {name: summary}.
+
+    `startup_process` is the whole interpreter run, `startup_import` the
+    import of `module` alone. The slowest direct imports of the last run
+    are logged.
+    """
+    processes, imports = [], []
+    for _ in range(repeat):
+        seconds, modules = import_profile(module)
+        processes.append(seconds)
+        imports.append(modules[module][2])
+    results = {"startup_process": summary(processes), "startup_import": summary(imports)}
+    for name, result in results.items():
+        log(f"{name:<24} median {result['median'] * 1000:10.2f} ms  p95 {result['p95'] * 1000:10.2f} ms  "
+            f"({repeat} runs)")
+    direct = sorted(((total, name) for name, (depth, _, total) in modules.items() if depth == 1), reverse=True)
+    for total, name in direct[:top]:
+        log(f"  {name:<22} {total * 1000:10.2f} ms")
+    return results
+
+def revision():
+    """The git commit of the working tree, if there is one."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=HERE, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(old, new, threshold=SLOWER):
+    """Lines comparing the medians of two result files, and whether any got slower."""
+    lines, slower = [], False
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            lines.append(f"{name:<24} {'-':>12} {result['median'] * 1000:12.2f} ms   new")
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = "SLOWER" if ratio > 1 + threshold else ("faster" if ratio < 1 - threshold else "")
+        slower = slower or flag == "SLOWER"
+        lines.append(f"{name:<24} {before['median'] * 1000:12.2f} {result['median'] * 1000:12.2f} ms "
+                     f"{ratio:6.2f}x {flag}")
+    return lines, slower
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager, load_config
+
+    parser = argparse.ArgumentParser(description="Generate benchmark data and time the ledger's hot paths.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="add deterministic accounts and transactions")
+    gen.add_argument("--accounts", type=int, default=1000)
+    gen.add_argument("--transactions", type=int, default=100000)
+    gen.add_argument("--years", type=int, default=5, help="spread the transactions over this many years")
+    timing = sub.add_parser("run", help="time the hot paths and write the results as JSON")
+    timing.add_argument("--repeat", type=int, default=5, help="runs of each read benchmark")
+    timing.add_argument("--ops", type=int, default=200, help="transactions added, edited and deleted")
+    timing.add_argument("--import-rows", type=int, default=10000, help="statement rows to import (0 skips)")
+    timing.add_argument("--no-export", action="store_true", help="skip the export of every transaction")
+    for p in (gen, timing):
+        p.add_argument("--seed", type=int, default=1)
+        p.add_argument("--sqlite", metavar="PATH", help="use a SQLite file instead of the MySQL server")
+    cold = sub.add_parser("startup", help="time cold imports of the app and write the results as JSON")
+    cold.add_argument("--repeat", type=int, default=10, help="fresh interpreters to time")
+    cold.add_argument("--module", default="app", help="module to import (default app)")
+    for p in (timing, cold):
+        p.add_argument("--out", help="JSON file for the results (default bench-<time>.json)")
+    comparison = sub.add_parser("compare", help="compare two result files")
+    comparison.add_argument("old")
+    comparison.add_argument("new")
+    comparison.add_argument("--threshold", type=float, default=SLOWER, help="slowdown to flag (default 0.10)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print(f"{'benchmark':<24} {old.get('revision') or 'old':>12} {new.get('revision') or 'new':>12}")
+        lines, slower = compare(old, new, args.threshold)
+        print("\n".join(lines))
+        sys.exit(1 if slower else 0)
+
+    if args.command == "startup":
+        results, about = startup(args.repeat, args.module), {"module": args.module}
+    else:
+        config = load_config()
+        if args.sqlite:
+            from replica import LocalDatabase
+            db = LocalDatabase(os.path.abspath(args.sqlite), config)
+        else:
+            db = ConnectionManager(config)
+            LedgerService(db).migrate()
+
+        if args.command == "generate":
+            started = time.perf_counter()
+            ids = generate(db, args.accounts, args.transactions, args.years, args.seed,
+                           progress=lambda n: print(f"\r{n} transactions written", end="", flush=True))
+            print(f"\n{len(ids)} accounts and {args.transactions} transactions in "
+                  f"{time.perf_counter() - started:.1f}s")
+            sys.exit(0)
+
+        results = run(db, args.repeat, args.ops, args.import_rows, not args.no_export, args.seed)
+        about = {"backend": "sqlite" if args.sqlite else "mysql",
+                 "database": os.path.abspath(args.sqlite) if args.sqlite else config["DB_NAME"]}
+    report = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "revision": revision(),
+        **about,
+        "python": platform.python_version(),
+        "results": results,
+    }
+    out = args.out or f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
@@ -0,0 +1,158 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# === Read-Through Cache ===
+# LedgerService keeps recently read account lists and transaction pages in
+# memory, so reopening a window or refreshing an unchanged list costs no
+# round trip. Entries are evicted least recently used first once their
+# estimated size passes the byte budget. The service's own write paths
+# invalidate exactly the entries a write can change. Writes from other
+# processes are caught by an optional check of accounts.version (migration
+# 004), done at most once per `verify_after` seconds per entry.
+ACCOUNTS = ("accounts",)
+
+def estimate_size(rows):
+    """Rough memory footprint of a list of row tuples."""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+def key_after(a, b):
+    """a > b for (date, id) keys, where None means 'before everything'."""
+    return b is None or (a is not None and a > b)
+
+class Entry:
+    __slots__ = ("rows", "size", "token", "checked")
+
+    def __init__(self, rows, token):
+        self.rows = rows
+        self.size = estimate_size(rows)
+        self.token = token
+        self.checked = time.monotonic()
+
+class LedgerCache:
+    """LRU cache of account lists and transaction pages.
+
+    Page keys are ("page", account id, after, before, limit), matching the
+    arguments of ledger.fetch_transactions_page. max_bytes=0 disables
+    caching; verify_after=None trusts invalidation alone, 0 checks the
+    version on every hit.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024, verify_after=None):
+        self.max_bytes = max_bytes
+        self.verify_after = verify_after
+        self.entries = OrderedDict()
+        self.pages = {}          # account id -> set of cached page keys
+        self.generations = {}    # scope -> write count, so a read that raced a write is not stored
+        self.epoch = 0           # bumped by clear()
+        self.size = 0
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        verify = config.get("DB_CACHE_VERIFY_SECONDS", "").strip()
+        return cls(int(float(config.get("DB_CACHE_MB", "32")) * 1024 * 1024),
+                   float(verify) if verify else None)
+
+    # --- Reading ---
+    def read(self, key, scope, load, version=None):
+        """Return the cached rows for `key`, or load() and cache them.
+
+        version() returns the current change token for the entry and is
+        only called when verification is enabled.
+        """
+        if not self.max_bytes:
+            return load()
+        verify = version if self.verify_after is not None else None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            generation = (self.epoch, self.generations.get(scope, 0))
+        if entry is not None:
+            if verify is None or time.monotonic() - entry.checked < self.verify_after:
+                self.hits += 1
+                return entry.rows
+            token = verify()
+            if token == entry.token:
+                entry.checked = time.monotonic()
+                self.hits += 1
+                return entry.rows
+        else:
+            # Read the token before the rows: a write in between then makes
+            # the entry look stale instead of hiding behind a new token
+            token = verify() if verify else None
+        self.misses += 1
+        rows = load()
+        with self.lock:
+            if (self.epoch, self.generations.get(scope, 0)) == generation:
+                self.store(key, scope, Entry(rows, token))
+        return rows
+
+    def store(self, key, scope, entry):
+        self.discard(key)
+        if entry.size > self.max_bytes:
+            return
+        self.entries[key] = entry
+        self.size += entry.size
+        if key[0] == "page":
+            self.pages.setdefault(scope, set()).add(key)
+        while self.size > self.max_bytes:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+            if key[0] == "page":
+                self.pages.get(key[1], set()).discard(key)
+
+    # --- Invalidation ---
+    def accounts_changed(self):
+        with self.lock:
+            self.generations["accounts"] = self.generations.get("accounts", 0) + 1
+            self.discard(ACCOUNTS)
+
+    def transactions_changed(self, account_id, keys=(), tx_ids=(), everything=False):
+        """Drop the pages of an account that a write could have changed.
+
+        `keys` are (date, id) keys the write created or moved rows to, and
+        `tx_ids` the rows it changed or deleted. A page holds exactly the
+        rows between its bounds, so it is stale if it contains one of the
+        ids or its range covers one of the keys. The account list is
+        dropped too, since the balance changed.
+        """
+        tx_ids = set(tx_ids)
+        with self.lock:
+            self.generations[account_id] = self.generations.get(account_id, 0) + 1
+            self.generations["accounts"] = self.generations.get("accounts", 0) + 1
+            self.discard(ACCOUNTS)
+            for key in list(self.pages.get(account_id, ())):
+                if everything or self.page_affected(key, self.entries[key].rows, keys, tx_ids):
+                    self.discard(key)
+
+    @staticmethod
+    def page_affected(page_key, rows, keys, tx_ids):
+        _, _, after, before, limit = page_key
+        if any(row[0] in tx_ids for row in rows):
+            return True
+        full = len(rows) == limit
+        if before is not None:
+            low = (rows[0][3], rows[0][0]) if full else None
+            return any(key_after(k, low) and k < before for k in keys)
+        high = (rows[-1][3], rows[-1][0]) if full else None
+        return any(key_after(k, after) and (high is None or k <= high) for k in keys)
+
+    def account_removed(self, account_id):
+        self.transactions_changed(account_id, everything=True)
+
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+            self.pages.clear()
+            self.size = 0
@@ -0,0 +1,121 @@
+import time
+
+# === Change Feed ===
+# change_log (migration 005) gets a row from a trigger for every inserted,
+# updated or deleted transaction and every added, renamed or deleted
+# account. A ChangeFeed tails it by id, so a client learns which rows other
+# clients (or other windows) changed and reloads only those.
+#
+# Auto-increment ids are handed out before commit, so a row with a lower id
+# can become visible after one with a higher id. The feed remembers the ids
+# it skipped over and looks for them again on later polls, giving up after
+# GAP_TIMEOUT seconds (a rolled-back transaction never fills its gap).
+BATCH_SIZE = 500
+GAP_TIMEOUT = 30.0      # seconds to wait for a skipped id to commit
+MAX_TRACKED_GAP = 1000  # larger jumps in ids are not waited for
+
+def marks(values):
+    return ", ".join(["%s"] * len(values))
+
+class ChangeFeed:
+    """Position in change_log; poll(cursor) returns the entries added since the last poll.
+
+    The first poll only records the current end of the log, so a new feed
+    starts with the changes made after it was opened.
+    """
+    def __init__(self, batch_size=BATCH_SIZE, gap_timeout=GAP_TIMEOUT):
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.high = None     # highest id delivered
+        self.missing = {}    # skipped id -> when it was first missed
+
+    def poll(self, cursor):
+        """Return new (id, account id, tx id, action) entries in id order."""
+        if self.high is None:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_log")
+            self.high = cursor.fetchone()[0]
+            return []
+        now = time.monotonic()
+        found = []
+        if self.missing:
+            ids = sorted(self.missing)
+            cursor.execute(f"SELECT id, account_id, tx_id, action FROM change_log WHERE id IN ({marks(ids)})", ids)
+            found = cursor.fetchall()
+            for row in found:
+                del self.missing[row[0]]
+            for gap, since in list(self.missing.items()):
+                if now - since > self.gap_timeout:
+                    del self.missing[gap]
+        cursor.execute(
+            "SELECT id, account_id, tx_id, action FROM change_log WHERE id > %s ORDER BY id LIMIT %s",
+            (self.high, self.batch_size)
+        )
+        rows = cursor.fetchall()
+        for row in rows:
+            if row[0] - self.high - 1 <= MAX_TRACKED_GAP:
+                for gap in range(self.high + 1, row[0]):
+                    self.missing[gap] = now
+            self.high = row[0]
+        return sorted(found) + rows
+
+def poll_changes(cursor, feed):
+    """Poll `feed` and read back the rows the new entries point at.
+
+    Returns (accounts, transactions): {account id: account row or None if
+    deleted} for every account touched, and {tx id: (account id, row or
+    None if deleted)}.
+    """
+    entries = feed.poll(cursor)
+    if not entries:
+        return {}, {}
+    return load_rows(cursor, {account_id for _, account_id, _, _ in entries},
+                     {tx_id: account_id for _, account_id, tx_id, _ in entries if tx_id is not None})
+
+def load_rows(cursor, account_ids, tx_accounts):
+    """Read the current rows of some accounts and transactions, in poll_changes' format.
+
+    `tx_accounts` maps transaction ids to their account ids.
+    """
+    account_ids = sorted(set(account_ids) | set(tx_accounts.values()))
+    accounts = {}
+    if account_ids:
+        cursor.execute(f"SELECT id, name, balance FROM accounts WHERE id IN ({marks(account_ids)})", account_ids)
+        accounts = dict.fromkeys(account_ids)
+        accounts.update((row[0], row) for row in cursor.fetchall())
+    transactions = {}
+    if tx_accounts:
+        ids = sorted(tx_accounts)
+        cursor.execute(f"SELECT id, type, amount, date, note FROM transactions WHERE id IN ({marks(ids)})", ids)
+        rows = {row[0]: row for row in cursor.fetchall()}
+        transactions = {tx_id: (account_id, rows.get(tx_id)) for tx_id, account_id in tx_accounts.items()}
+    return accounts, transactions
+
+def prune(cursor, hours):
+    """Delete log entries older than `hours`; returns how many were removed."""
+    cursor.execute("DELETE FROM change_log WHERE changed_at < NOW() - INTERVAL %s HOUR", (hours,))
+    return cursor.rowcount
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Follow or prune the ledger change log.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    tail = sub.add_parser("tail", help="print changes as other clients make them")
+    tail.add_argument("--interval", type=float, default=1.0, help="seconds between polls")
+    old = sub.add_parser("prune", help="delete old log entries")
+    old.add_argument("--hours", type=int, default=24, help="keep entries younger than this")
+    args = parser.parse_args()
+    db = ConnectionManager()
+    if args.command == "prune":
+        print(f"Removed {db.write(prune, args.hours)} change log entries.")
+    else:
+        feed = ChangeFeed()
+        try:
+            while True:
+                for change_id, account_id, tx_id, action in db.read(feed.poll):
+                    what = f"transaction {tx_id}" if tx_id is not None else "account"
+                    print(f"{change_id}: {action} {what} (account {account_id})", flush=True)
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,174 @@
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+# === Balance Checkpoints ===
+# balance_checkpoints (migration 003) holds each account's balance at the end
+# of every month that has transactions. The write paths keep it current with
+# apply_delta, so "balance on date X" is one checkpoint row plus the sum of
+# the transactions in X's own month, however long the history is.
+CHECKPOINT_BEFORE = (
+    "SELECT balance FROM balance_checkpoints WHERE account_id=%s AND month < %s "
+    "ORDER BY month DESC LIMIT 1"
+)
+NET_BETWEEN = (
+    "SELECT COALESCE(SUM(CASE WHEN type = 'Deposit' THEN amount ELSE -amount END), 0) "
+    "FROM transactions WHERE account_id=%s AND date >= %s AND date <= %s"
+)
+NET_SAME_DAY_BEFORE = (
+    "SELECT COALESCE(SUM(CASE WHEN type = 'Deposit' THEN amount ELSE -amount END), 0) "
+    "FROM transactions WHERE account_id=%s AND date = %s AND id < %s"
+)
+
+def month_start(date):
+    return date.replace(day=1)
+
+def signed(tx_type, amount):
+    return amount if tx_type == "Deposit" else -amount
+
+def apply_delta(cursor, account_id, date, delta):
+    """Add `delta` to every checkpoint from `date`'s month onwards.
+
+    Call inside the same transaction as the write it belongs to. If the
+    month has no checkpoint yet it has no transactions either, so its
+    balance before this write is the nearest earlier checkpoint.
+    """
+    month = month_start(date)
+    cursor.execute(
+        "INSERT IGNORE INTO balance_checkpoints (account_id, month, balance) "
+        "SELECT %s, %s, COALESCE((SELECT balance FROM balance_checkpoints "
+        "WHERE account_id=%s AND month < %s ORDER BY month DESC LIMIT 1), 0)",
+        (account_id, month, account_id, month)
+    )
+    cursor.execute(
+        "UPDATE balance_checkpoints SET balance = balance + %s WHERE account_id=%s AND month >= %s",
+        (delta, account_id, month)
+    )
+
+def apply_deltas(cursor, rows):
+    """apply_delta for a batch of (account_id, type, amount, date, ...) rows,
+    with one call per account and month."""
+    deltas = defaultdict(Decimal)
+    for account_id, tx_type, amount, date, *_ in rows:
+        deltas[account_id, month_start(date)] += signed(tx_type, amount)
+    for (account_id, month), delta in sorted(deltas.items()):
+        apply_delta(cursor, account_id, month, delta)
+
+def balance_at(cursor, account_id, as_of):
+    """Balance of an account at the end of day `as_of`."""
+    month = month_start(as_of)
+    cursor.execute(CHECKPOINT_BEFORE, (account_id, month))
+    row = cursor.fetchone()
+    # Months between that checkpoint and this one have no transactions
+    cursor.execute(NET_BETWEEN, (account_id, month, as_of))
+    return (row[0] if row else Decimal("0.00")) + Decimal(cursor.fetchone()[0])
+
+def balance_before(cursor, account_id, key):
+    """Balance just before the transaction with (date, id) `key` in (date, id) order."""
+    date, tx_id = key
+    balance = balance_at(cursor, account_id, date - timedelta(days=1))
+    cursor.execute(NET_SAME_DAY_BEFORE, (account_id, date, tx_id))
+    return balance + Decimal(cursor.fetchone()[0])
+
+# === Verification ===
+def running_balances(rows):
+    """{account id: [(month, balance)]} from (account_id, year, month, net, ...)
+    rows in account and month order; months are "YYYY-MM-01" strings."""
+    running = defaultdict(list)  # account -> [(month, balance)] in month order
+    for account_id, year, month, net, *_ in rows:
+        months = running[account_id]
+        total = (months[-1][1] if months else Decimal("0.00")) + Decimal(net)
+        months.append((f"{year:04d}-{month:02d}-01", total))
+    return running
+
+def expected_checkpoints(cursor):
+    """Rebuild every checkpoint from the full transaction history."""
+    cursor.execute(
+        "SELECT account_id, YEAR(date), MONTH(date), "
+        "SUM(CASE WHEN type = 'Deposit' THEN amount ELSE -amount END) "
+        "FROM transactions GROUP BY account_id, YEAR(date), MONTH(date) "
+        "ORDER BY account_id, YEAR(date), MONTH(date)"
+    )
+    return running_balances(cursor.fetchall())
+
+def stored_checkpoints(rows):
+    """{account id: {month: balance}} from (account_id, month, balance) rows."""
+    stored = defaultdict(dict)
+    for account_id, month, balance in rows:
+        stored[account_id][str(month)] = balance
+    return stored
+
+def compare(expected, stored):
+    """Problems found comparing rebuilt checkpoints with stored ones, and the
+    accounts they concern.
+
+    Stored rows for months without transactions are fine as long as they
+    equal the running balance at that month.
+    """
+    problems, broken = [], set()
+    for account_id in sorted(set(expected) | set(stored)):
+        months = expected.get(account_id, [])
+        month_keys = [month for month, _ in months]
+        have_months = stored.get(account_id, {})
+        for month, balance in months:
+            have = have_months.get(month)
+            if have is None:
+                problems.append(f"account {account_id} {month}: missing checkpoint (expected {balance})")
+                broken.add(account_id)
+            elif have != balance:
+                problems.append(f"account {account_id} {month}: stored {have}, expected {balance}")
+                broken.add(account_id)
+        for month, have in have_months.items():
+            pos = bisect_left(month_keys, month)
+            if pos < len(months) and month_keys[pos] == month:
+                continue
+            want = months[pos - 1][1] if pos else Decimal("0.00")
+            if have != want:
+                problems.append(f"account {account_id} {month}: stored {have}, expected {want}")
+                broken.add(account_id)
+    return problems, broken
+
+def replace_checkpoints(cursor, account_id, months):
+    cursor.execute("DELETE FROM balance_checkpoints WHERE account_id=%s", (account_id,))
+    cursor.executemany(
+        "INSERT INTO balance_checkpoints (account_id, month, balance) VALUES (%s, %s, %s)",
+        [(account_id, month, balance) for month, balance in months]
+    )
+
+def verify(cursor, repair=False):
+    """Compare stored checkpoints with a full rebuild; returns a list of problems.
+
+    With repair=True the stored rows for mismatching accounts are replaced
+    by the rebuilt ones. reconcile.py does the same, and checks balances,
+    with several connections at once.
+    """
+    expected = expected_checkpoints(cursor)
+    cursor.execute("SELECT account_id, month, balance FROM balance_checkpoints ORDER BY account_id, month")
+    problems, broken = compare(expected, stored_checkpoints(cursor.fetchall()))
+    if repair:
+        for account_id in broken:
+            replace_checkpoints(cursor, account_id, expected.get(account_id, []))
+    return problems
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Query or verify monthly balance checkpoints.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("verify", help="rebuild checkpoints and compare with the stored ones")
+    check.add_argument("--repair", action="store_true", help="replace wrong checkpoints")
+    at = sub.add_parser("balance", help="balance of an account at the end of a date")
+    at.add_argument("account", type=int)
+    at.add_argument("date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+    args = parser.parse_args()
+    db = ConnectionManager()
+    if args.command == "balance":
+        print(f"{db.read(balance_at, args.account, args.date):.2f}")
+    else:
+        found = db.write(verify, args.repair) if args.repair else db.read(verify)
+        for problem in found:
+            print(problem)
+        print(f"{len(found)} problem(s) found" + (", repaired." if args.repair and found else "."))
@@ -0,0 +1,250 @@
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from decimal import Decimal
+import checkpoints
+from ledger import NotFoundError, OverdraftError, load_account
+
+# === Group Commit ===
+# In group-commit mode transaction writes are queued instead of being
+# committed one by one. A background thread collects them for up to
+# max_delay seconds (or max_writes writes) and applies the whole batch in
+# one database transaction: each write still gets its own row change and
+# overdraft check, but every account gets one balance UPDATE and every
+# month one checkpoint update, and the batch costs a single COMMIT.
+DEFAULT_MAX_WRITES = 50
+DEFAULT_MAX_DELAY = 0.2   # seconds
+
+class QueuedWrite:
+    """One queued insert/update/delete; `future` resolves to what the
+    matching LedgerService method would have returned."""
+    def __init__(self, kind, args):
+        self.kind = kind
+        self.args = args
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+def marks(values):
+    return ", ".join(["%s"] * len(values))
+
+def apply_batch(cursor, writes):
+    """Apply queued writes in order in the current transaction.
+
+    Returns one result per write, or the OverdraftError/NotFoundError that
+    rejected it; a rejected write is skipped and the rest still apply.
+    Rows are locked in the same order as the single-write paths in
+    ledger.py: accounts (in id order), then transaction rows, then
+    checkpoints.
+    """
+    account_ids = sorted({w.args[0] for w in writes})
+    cursor.execute(
+        f"SELECT id, balance FROM accounts WHERE id IN ({marks(account_ids)}) ORDER BY id FOR UPDATE",
+        account_ids
+    )
+    balances = dict(cursor.fetchall())
+    known = {}   # tx id -> (account id, type, amount, date) as of this point in the batch
+    tx_ids = sorted({w.args[1] for w in writes if w.kind != "insert"})
+    if tx_ids:
+        cursor.execute(
+            f"SELECT id, account_id, type, amount, date FROM transactions WHERE id IN ({marks(tx_ids)}) "
+            "ORDER BY id FOR UPDATE",
+            tx_ids
+        )
+        known = {row[0]: row[1:] for row in cursor.fetchall()}
+    opening = dict(balances)
+    month_deltas = defaultdict(Decimal)
+
+    def find(account_id, tx_id):
+        row = known.get(tx_id)
+        if row is None or row[0] != account_id:
+            raise NotFoundError(f"Transaction {tx_id} does not exist in account {account_id}.")
+        return row
+
+    def move(account_id, delta, error):
+        if account_id not in balances:
+            raise NotFoundError(f"Account {account_id} does not exist.")
+        if delta < 0 and balances[account_id] + delta < 0:
+            raise OverdraftError(error)
+        balances[account_id] += delta
+
+    results = []
+    for w in writes:
+        try:
+            if w.kind == "insert":
+                account_id, tx_type, amount, date_obj, note = w.args
+                delta = checkpoints.signed(tx_type, amount)
+                move(account_id, delta, "Withdrawal exceeds current balance.")
+                cursor.execute(
+                    "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
+                    (account_id, tx_type, amount, date_obj, note)
+                )
+                known[cursor.lastrowid] = (account_id, tx_type, amount, date_obj)
+                month_deltas[account_id, checkpoints.month_start(date_obj)] += delta
+                results.append(cursor.lastrowid)
+            elif w.kind == "update":
+                account_id, tx_id, tx_type, amount, date_obj, note = w.args
+                _, old_type, old_amount, old_date = find(account_id, tx_id)
+                old_delta = checkpoints.signed(old_type, old_amount)
+                new_delta = checkpoints.signed(tx_type, amount)
+                move(account_id, new_delta - old_delta, "Change would make balance negative.")
+                cursor.execute(
+                    "UPDATE transactions SET type=%s, amount=%s, date=%s, note=%s WHERE id=%s",
+                    (tx_type, amount, date_obj, note, tx_id)
+                )
+                known[tx_id] = (account_id, tx_type, amount, date_obj)
+                month_deltas[account_id, checkpoints.month_start(old_date)] -= old_delta
+                month_deltas[account_id, checkpoints.month_start(date_obj)] += new_delta
+                results.append(tx_id)
+            else:
+                account_id, tx_id = w.args
+                _, tx_type, amount, date = find(account_id, tx_id)
+                delta = -checkpoints.signed(tx_type, amount)
+                balances[account_id] += delta   # a delete is never refused, as in remove_transaction
+                cursor.execute("DELETE FROM transactions WHERE id=%s", (tx_id,))
+                del known[tx_id]
+                month_deltas[account_id, checkpoints.month_start(date)] += delta
+                results.append(None)
+        except (NotFoundError, OverdraftError) as e:
+            results.append(e)
+
+    for account_id in account_ids:
+        if account_id in balances:
+            delta = balances[account_id] - opening[account_id]
+            cursor.execute("UPDATE accounts SET balance = balance + %s, version = version + 1 WHERE id=%s",
+                           (delta, account_id))
+    # Zero deltas still go through: a month that gained transactions needs its checkpoint row
+    for (account_id, month), delta in sorted(month_deltas.items()):
+        checkpoints.apply_delta(cursor, account_id, month, delta)
+
+    # Read back what each write produced, one query per table
+    accounts = {acct_id: load_account(cursor, acct_id) for acct_id in balances}
+    saved_ids = sorted({r for r in results if isinstance(r, int)})
+    rows = {}
+    if saved_ids:
+        cursor.execute(
+            f"SELECT id, type, amount, date, note FROM transactions WHERE id IN ({marks(saved_ids)})", saved_ids)
+        rows = {row[0]: row for row in cursor.fetchall()}
+    for n, (w, result) in enumerate(zip(writes, results)):
+        if isinstance(result, Exception):
+            continue
+        acct = accounts[w.args[0]]
+        if w.kind == "delete":
+            results[n] = acct
+        elif result in rows:
+            results[n] = (rows[result], acct)
+        else:
+            # A later write of the batch deleted the row, so there is nothing to show for it
+            results[n] = NotFoundError(f"Transaction {result} was deleted in the same batch.")
+    return results
+
+class WriteCoalescer:
+    """Queue transaction writes and commit them in batches.
+
+    The add/update/delete methods validate their arguments like
+    LedgerService and return a Future instead of blocking. All writes of a
+    batch resolve together after its COMMIT, so a GUI can apply a whole
+    batch in one pass. The background thread starts with the first write;
+    close() commits whatever is still queued.
+    """
+    def __init__(self, service, max_writes=DEFAULT_MAX_WRITES, max_delay=DEFAULT_MAX_DELAY):
+        self.service = service
+        self.max_writes = max_writes
+        self.max_delay = max_delay
+        self.queue = []
+        self.cond = threading.Condition()
+        self.flushing = False
+        self.closed = False
+        self.thread = None
+        self.batches = 0
+
+    # --- Queueing (any thread) ---
+    def add_transaction(self, account_id, tx_type, amount, date_obj, note=""):
+        amount = self.service.check_transaction(tx_type, amount)
+        return self.submit("insert", (account_id, tx_type, amount, date_obj, note))
+
+    def update_transaction(self, account_id, tx_id, tx_type, amount, date_obj, note=""):
+        amount = self.service.check_transaction(tx_type, amount)
+        return self.submit("update", (account_id, tx_id, tx_type, amount, date_obj, note))
+
+    def delete_transaction(self, account_id, tx_id):
+        return self.submit("delete", (account_id, tx_id))
+
+    def submit(self, kind, args):
+        write = QueuedWrite(kind, args)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("The write queue is closed.")
+            self.queue.append(write)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="group-commit", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return write.future
+
+    def flush(self):
+        """Commit the queued writes now instead of waiting for the batch window."""
+        with self.cond:
+            self.flushing = True
+            self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    # --- Committing (background thread) ---
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.queue and not self.closed:
+                    self.cond.wait()
+                if not self.queue:
+                    return
+                deadline = self.queue[0].queued_at + self.max_delay
+                while len(self.queue) < self.max_writes and not (self.closed or self.flushing):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = self.queue[:self.max_writes]
+                del self.queue[:len(batch)]
+                self.flushing = self.flushing and bool(self.queue)
+            try:
+                self.commit(batch)
+            except Exception as e:
+                # Never leave a caller waiting, and keep serving the queue
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(e)
+
+    def commit(self, batch):
+        """Apply a batch and resolve every one of its futures."""
+        try:
+            results = self.service.db.write(apply_batch, batch)
+        except Exception as e:
+            results = [e] * len(batch)
+        else:
+            self.batches += 1
+            try:
+                self.invalidate(batch, results)
+            except Exception:
+                self.service.cache.clear()   # the batch is committed; drop what might be stale
+        for write, result in zip(batch, results):
+            if isinstance(result, Exception):
+                write.future.set_exception(result)
+            else:
+                write.future.set_result(result)
+
+    def invalidate(self, batch, results):
+        cache = self.service.cache
+        for write, result in zip(batch, results):
+            if isinstance(result, Exception):
+                continue
+            if write.kind == "delete":
+                cache.transactions_changed(write.args[0], tx_ids=[write.args[1]])
+            else:
+                tx = result[0]
+                cache.transactions_changed(write.args[0], keys=[(tx[3], tx[0])], tx_ids=[tx[0]])
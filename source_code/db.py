@@ -0,0 +1,200 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from instrument import Stats
+
+# === Configuration ===
+HERE = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = os.path.join(HERE, "config.env")
+DEFAULTS = {
+    "DB_HOST": "localhost",
+    "DB_USER": "root",
+    "DB_PASS": "",          # default XAMPP root has no password
+    "DB_NAME": "cccs105",
+    "DB_POOL_SIZE": "5",
+    "DB_GROUP_COMMIT_MS": "0",       # > 0 queues GUI transaction writes and commits them in batches
+    "DB_GROUP_COMMIT_WRITES": "50",  # ...or as soon as this many are queued
+    "DB_CACHE_MB": "32",             # read cache for account lists and transaction pages; 0 turns it off
+    "DB_CACHE_VERIFY_SECONDS": "",   # set to re-check cached data against other writers this often
+    "DB_CHANGE_POLL_MS": "1000",     # how often open windows pick up other clients' changes; 0 turns it off
+    "DB_REPLICA_PATH": "",           # set (e.g. replica.sqlite3) to work on a local copy synced in the background
+    "DB_SYNC_SECONDS": "5",          # how often the local copy syncs with the server
+    "DB_SNAPSHOT_PATH": "",          # set (e.g. accounts-snapshot.json) to show the last account list at startup
+    "DB_STATS_SAMPLE": "0.1",        # share of queries and UI updates timed for diagnostics; 0 turns it off
+    "DB_SLOW_QUERY_MS": "200",       # statements slower than this are always logged
+}
+
+def local_path(path):
+    """A file named in config.env, relative to this directory rather than the working directory."""
+    return os.path.join(HERE, path)
+
+def load_config(path=CONFIG_FILE):
+    """Read DB_* settings from config.env; environment variables take precedence."""
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#") and "=" in line:
+                    key, value = line.split("=", 1)
+                    config[key.strip()] = value.strip()
+    for key in config:
+        if key in os.environ:
+            config[key] = os.environ[key]
+    return config
+
+# === Connection Pool ===
+# mysql.connector is imported on first use rather than here: it is about
+# half of the app's import time, and the GUI paints its window before it
+# makes the first query (on a worker thread). Error codes are therefore
+# spelled out instead of taken from mysql.connector.errorcode.
+def connector():
+    """The mysql.connector module, with its pooling submodule loaded."""
+    import mysql.connector.pooling
+    return mysql.connector
+
+# Errors meaning the socket is gone; the operation can be retried on a fresh connection
+LOST_CONNECTION_ERRORS = {
+    2006,   # CR_SERVER_GONE_ERROR
+    2013,   # CR_SERVER_LOST
+    2055,   # CR_SERVER_LOST_EXTENDED
+}
+
+# Errors meaning the transaction lost a lock conflict; it was (or must be) rolled
+# back and can be replayed from the start
+LOCK_CONFLICT_ERRORS = {
+    1213,   # ER_LOCK_DEADLOCK
+    1205,   # ER_LOCK_WAIT_TIMEOUT
+}
+
+def is_lost_connection(e):
+    return isinstance(e, connector().InterfaceError) or getattr(e, "errno", None) in LOST_CONNECTION_ERRORS
+
+def is_lock_conflict(e):
+    return getattr(e, "errno", None) in LOCK_CONFLICT_ERRORS
+
+class ConnectionManager:
+    """Hands out pooled MySQL connections, one per operation.
+
+    The pool is created on first use, so constructing a manager never
+    touches the network. Checked-out connections are health-checked by the
+    pool (and reconnected if the server dropped them); an operation that
+    loses its connection half way is retried on a fresh one. Callers wait
+    for a free connection instead of failing when the pool is exhausted.
+    A write that loses a deadlock or lock wait is rolled back and replayed
+    up to `conflict_retries` times, with a short random backoff. Cursors
+    are timed into `stats` (instrument.py).
+    """
+    def __init__(self, config=None, retries=2, conflict_retries=5):
+        self.config = config or load_config()
+        self.size = int(self.config["DB_POOL_SIZE"])
+        self.retries = retries
+        self.conflict_retries = conflict_retries
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.lock = threading.Lock()
+        self._pool = None
+        self.stats = Stats.from_config(self.config)
+
+    @property
+    def pool(self):
+        with self.lock:
+            if self._pool is None:
+                self._pool = connector().pooling.MySQLConnectionPool(
+                    pool_name="ledger",
+                    pool_size=self.size,
+                    pool_reset_session=False,
+                    host=self.config["DB_HOST"],
+                    user=self.config["DB_USER"],
+                    password=self.config["DB_PASS"],
+                    database=self.config["DB_NAME"],
+                    autocommit=True,   # reads need no transaction; writes start one explicitly
+                )
+            return self._pool
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection, blocking while all of them are in use."""
+        with self.slots:
+            conn = self.pool.get_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()  # returns it to the pool
+
+    def run(self, fn, *args, write=False):
+        """Call fn(cursor, *args) on its own pooled connection and cursor.
+
+        With write=True the call runs inside a transaction that is committed
+        on success and rolled back on error, so fn may be called again after
+        a lost connection or a deadlock and must not have other side effects.
+        """
+        lost = conflicts = 0
+        while True:
+            with self.connection() as conn:
+                cursor = self.stats.cursor(conn.cursor(buffered=True))
+                committing = False
+                try:
+                    if write:
+                        conn.start_transaction()
+                    result = fn(cursor, *args)
+                    if write:
+                        committing = True
+                        conn.commit()
+                    return result
+                except connector().Error as e:
+                    if is_lost_connection(e) and lost < self.retries and not committing:
+                        # The server rolled back the dead session, so the whole operation can be
+                        # replayed; the pool reconnects the connection on its next checkout.
+                        # A lost COMMIT may or may not have applied, so that is never retried.
+                        lost += 1
+                        continue
+                    if write and not is_lost_connection(e):
+                        conn.rollback()
+                    if not (write and is_lock_conflict(e) and conflicts < self.conflict_retries and not committing):
+                        raise
+                    # Lost a deadlock or lock wait: replay the transaction after a short random
+                    # backoff so the competing writers do not collide again in lockstep
+                    conflicts += 1
+                    backoff = random.uniform(0, 0.005 * 2 ** conflicts)
+                except Exception:
+                    if write:
+                        conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            # Back off outside the with block so the connection is free meanwhile
+            time.sleep(backoff)
+
+    def stream(self, sql, params=(), size=1000):
+        """Yield rows of a query in lists of up to `size` from an unbuffered cursor.
+
+        Rows are pulled from the server as they are consumed, so memory stays
+        flat however large the result. The connection is held until the
+        generator is exhausted or closed.
+        """
+        with self.connection() as conn:
+            cursor = self.stats.cursor(conn.cursor(buffered=False))
+            finished = False
+            try:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(size)
+                    if not rows:
+                        break
+                    yield rows
+                finished = True
+            finally:
+                if finished:
+                    cursor.close()
+                else:
+                    # Dropping the socket is cheaper than reading the rest of the
+                    # result; the pool reconnects it on the next checkout
+                    conn.disconnect()
+
+    def read(self, fn, *args):
+        return self.run(fn, *args)
+
+    def write(self, fn, *args):
+        return self.run(fn, *args, write=True)
@@ -0,0 +1,107 @@
+import csv
+import os
+from datetime import datetime
+
+# === Ledger Export ===
+# Transactions are streamed from an unbuffered cursor in chunks of
+# CHUNK_SIZE and written straight to the output file, so memory use does
+# not depend on the size of the table. Output goes to a temporary file that
+# is renamed into place at the end, so readers never see a half-written export.
+CHUNK_SIZE = 5000
+COLUMNS = ("id", "account_id", "type", "amount", "date", "note")
+
+def export_query(account_id=None, start=None, end=None):
+    sql = f"SELECT {', '.join(COLUMNS)} FROM transactions"
+    where, params = [], []
+    if account_id is not None:
+        where.append("account_id=%s")
+        params.append(account_id)
+    if start is not None:
+        where.append("date >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("date <= %s")
+        params.append(end)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY account_id, date, id", params
+
+def write_csv(chunks, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield len(rows)
+
+def write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+    schema = pa.schema([
+        ("id", pa.int32()),
+        ("account_id", pa.int32()),
+        ("type", pa.string()),
+        ("amount", pa.decimal128(10, 2)),
+        ("date", pa.date32()),
+        ("note", pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            # one row group per chunk keeps only CHUNK_SIZE rows in memory
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema))
+            yield len(rows)
+
+def export_transactions(db, path, fmt="csv", account_id=None, start=None, end=None,
+                        chunk_size=CHUNK_SIZE, progress=None):
+    """Stream matching transactions to a CSV or Parquet file; returns the row count."""
+    sql, params = export_query(account_id, start, end)
+    chunks = db.stream(sql, params, chunk_size)
+    tmp_path = path + ".part"
+    total = 0
+    try:
+        if fmt == "parquet":
+            written = write_parquet(chunks, tmp_path)
+            for n in written:
+                total += n
+                if progress:
+                    progress(total)
+        elif fmt == "csv":
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                for n in write_csv(chunks, f):
+                    total += n
+                    if progress:
+                        progress(total)
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+        os.replace(tmp_path, path)
+    finally:
+        chunks.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return total
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Export ledger transactions to CSV or Parquet.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "parquet"),
+                        help="output format (default: from the file extension, else csv)")
+    parser.add_argument("--account", type=int, help="only this account id")
+    parser.add_argument("--from", dest="start", type=parse_date, help="first date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", type=parse_date, help="last date, YYYY-MM-DD")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    fmt = args.format or ("parquet" if args.path.lower().endswith(".parquet") else "csv")
+    count = export_transactions(
+        ConnectionManager(), args.path, fmt, args.account, args.start, args.end, args.chunk_size,
+        progress=lambda n: print(f"\r{n} rows exported", end="", flush=True))
+    print(f"\rExported {count} rows to {args.path}")
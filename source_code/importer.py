@@ -0,0 +1,173 @@
+import csv
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+import checkpoints
+from money import check_amount, parse_amount
+
+# === Bulk Statement Import ===
+# Statements are streamed through generators: the file is read record by
+# record, validated in chunks of BATCH_SIZE and each chunk is written in one
+# transaction with a single multi-row INSERT and one balance UPDATE per
+# account, so memory stays flat and round trips scale with batches, not rows.
+BATCH_SIZE = 1000
+
+class StatementError(Exception):
+    pass
+
+# --- Readers: yield (line number, record dict) ---
+def read_csv(path):
+    """Yield records from a CSV with a header row.
+
+    Required columns: date, amount. Optional: type (Deposit/Withdrawal; if
+    missing the sign of amount decides), note (or description/memo) and
+    account_id.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames:
+            return
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for record in reader:
+            yield reader.line_num, record
+
+OFX_TAG = re.compile(r"<(/?)([A-Z0-9.]+)>([^<]*)", re.IGNORECASE)
+
+def read_ofx(path):
+    """Yield records from the <STMTTRN> blocks of an OFX/QFX file.
+
+    Handles both SGML (unclosed tags) and XML flavours; the file is scanned
+    line by line so large statements are never held in memory.
+    """
+    record = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line_no, line in enumerate(f, 1):
+            for closing, tag, value in OFX_TAG.findall(line):
+                tag = tag.upper()
+                if tag == "STMTTRN":
+                    if closing and record is not None:
+                        yield start_line, record
+                        record = None
+                    elif not closing:
+                        record, start_line = {}, line_no
+                elif record is not None and not closing and value.strip():
+                    record[tag] = value.strip()
+    if record:
+        yield start_line, record
+
+def ofx_to_record(ofx):
+    """Map OFX fields onto the CSV-style record used by parse_record."""
+    posted = ofx.get("DTPOSTED", "")[:8]
+    date = f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) == 8 else posted
+    note = ofx.get("MEMO") or ofx.get("NAME") or ""
+    return {"date": date, "amount": ofx.get("TRNAMT", ""), "note": note}
+
+def read_statement(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".ofx", ".qfx"):
+        return ((line, ofx_to_record(rec)) for line, rec in read_ofx(path))
+    if ext == ".csv":
+        return read_csv(path)
+    raise StatementError(f"Unsupported statement format: {ext or path}")
+
+# --- Validation ---
+def parse_record(record, default_account):
+    """Turn a raw record into an (account_id, type, amount, date, note) row."""
+    account_id = record.get("account_id") or default_account
+    if not account_id:
+        raise ValueError("no account_id column and no account selected")
+    try:
+        amount = parse_amount(record.get("amount") or "")
+    except ValueError:
+        raise ValueError(f"invalid amount {record.get('amount')!r}")
+    tx_type = (record.get("type") or "").strip().capitalize()
+    if not tx_type:
+        tx_type = "Withdrawal" if amount < 0 else "Deposit"
+        amount = abs(amount)
+    if tx_type not in ("Deposit", "Withdrawal"):
+        raise ValueError(f"type must be Deposit or Withdrawal, not {tx_type!r}")
+    amount = check_amount(amount)
+    try:
+        date_obj = datetime.strptime((record.get("date") or "").strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"date must be YYYY-MM-DD, not {record.get('date')!r}")
+    note = (record.get("note") or record.get("description") or record.get("memo") or "").strip()[:255]
+    return (int(account_id), tx_type, amount, date_obj, note)
+
+def validated_batches(records, default_account, batch_size=BATCH_SIZE):
+    """Yield (rows, errors) per chunk of `batch_size` records."""
+    rows, errors = [], []
+    for line_no, record in records:
+        try:
+            rows.append(parse_record(record, default_account))
+        except ValueError as e:
+            errors.append(f"line {line_no}: {e}")
+        if len(rows) + len(errors) >= batch_size:
+            yield rows, errors
+            rows, errors = [], []
+    if rows or errors:
+        yield rows, errors
+
+# --- Writing ---
+def write_batch(cursor, rows):
+    """Insert a batch and apply its net effect with one UPDATE per account
+    (plus one checkpoint update per account and month).
+
+    The accounts are updated, and so locked, before the rows are inserted:
+    account rows first, in id order, as in every other write path.
+    """
+    deltas = defaultdict(Decimal)
+    for account_id, tx_type, amount, _, _ in rows:
+        deltas[account_id] += amount if tx_type == "Deposit" else -amount
+    for account_id, delta in sorted(deltas.items()):
+        # A zero delta still bumps the version, so the row changes and is locked
+        cursor.execute(
+            "UPDATE accounts SET balance = balance + %s, version = version + 1 "
+            "WHERE id=%s AND (%s >= 0 OR balance + %s >= 0)",
+            (delta, account_id, delta, delta)
+        )
+        if cursor.rowcount != 1:
+            raise StatementError(f"Batch would overdraw account {account_id} (or the account does not exist).")
+    cursor.executemany(
+        "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
+        rows
+    )
+    checkpoints.apply_deltas(cursor, rows)
+
+def import_statement(db, path, account_id=None, batch_size=BATCH_SIZE, progress=None):
+    """Stream a CSV/OFX statement into the ledger.
+
+    Each batch is committed on its own through db.write; a failing batch is
+    rolled back and stops the import. progress(imported, rejected) is called
+    after every batch. Returns (imported, errors).
+    """
+    imported, errors = 0, []
+    for rows, batch_errors in validated_batches(read_statement(path), account_id, batch_size):
+        errors.extend(batch_errors)
+        if rows:
+            try:
+                db.write(write_batch, rows)
+            except Exception as e:
+                raise StatementError(f"Import stopped after {imported} rows: {e}") from e
+            imported += len(rows)
+        if progress:
+            progress(imported, len(errors))
+    return imported, errors
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Import a CSV/OFX bank statement into the ledger.")
+    parser.add_argument("path")
+    parser.add_argument("--account", type=int, help="account id for rows without an account_id column")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    count, problems = import_statement(
+        ConnectionManager(), args.path, args.account, args.batch_size,
+        progress=lambda n, bad: print(f"\r{n} rows imported, {bad} rejected", end="", flush=True))
+    print()
+    for problem in problems:
+        print("Skipped", problem)
@@ -0,0 +1,199 @@
+import json
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# === Instrumentation ===
+# Where does a slow screen spend its time: in MySQL, in turning the result
+# into Python rows, or in the Treeview? Cursors handed out by db.py (and
+# replica.py) are wrapped in an InstrumentedCursor that times execute() and
+# the fetch calls separately; the GUI times its bulk Treeview updates with
+# Stats.timer. Timings go into fixed-bucket latency histograms keyed by
+# (kind, name): kind is "query", "fetch" or "ui", name the SQL text or the
+# view. Only a random sample of calls is recorded (DB_STATS_SAMPLE in
+# config.env, 0.1 by default; random rather than every Nth, because a write
+# runs the same statements in the same order every time), but every
+# statement is timed against DB_SLOW_QUERY_MS, so the slow query log misses
+# nothing. The diagnostics window (F12 in the app) shows the numbers live;
+# Stats.dump writes them to a JSON file.
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)  # upper bounds, seconds
+SLOW_QUERIES_KEPT = 200
+NAME_LENGTH = 300
+
+def statement_name(sql):
+    """The SQL text with its whitespace collapsed, as the histogram key."""
+    return " ".join(sql.split())[:NAME_LENGTH]
+
+class Histogram:
+    """Call count, total and max time, rows, and a count per BUCKETS latency bucket."""
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # the last one counts calls above BUCKETS[-1]
+
+    def add(self, seconds, rows=None):
+        self.calls += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        if rows is not None and rows > 0:
+            self.rows += rows
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls (max for the last one)."""
+        wanted = fraction * self.calls
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            seen += count
+            if seen >= wanted:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "calls": self.calls, "seconds": self.seconds, "max": self.max, "rows": self.rows,
+            "mean": self.seconds / self.calls if self.calls else 0.0,
+            "p50": self.percentile(0.5), "p95": self.percentile(0.95), "p99": self.percentile(0.99),
+            "buckets": {f"<={bound}": n for bound, n in zip(BUCKETS, self.buckets)} | {"more": self.buckets[-1]},
+        }
+
+class Stats:
+    """Sampled timings and the slow query log of one process.
+
+    `sample` is the fraction of calls recorded (0 turns instrumentation
+    off); statements taking `slow_seconds` or more are always logged.
+    """
+    def __init__(self, sample=0.1, slow_seconds=0.2):
+        self.sample = min(max(sample, 0.0), 1.0)
+        self.slow_seconds = slow_seconds
+        self.histograms = {}   # (kind, name) -> Histogram
+        self.slow = deque(maxlen=SLOW_QUERIES_KEPT)
+        self.since = datetime.now()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(float(config.get("DB_STATS_SAMPLE", "0.1")),
+                   float(config.get("DB_SLOW_QUERY_MS", "200")) / 1000)
+
+    @property
+    def enabled(self):
+        return self.sample > 0
+
+    def sampled(self):
+        """Whether to record this call."""
+        return random.random() < self.sample
+
+    def record(self, kind, name, seconds, rows=None):
+        with self.lock:
+            histogram = self.histograms.get((kind, name))
+            if histogram is None:
+                histogram = self.histograms[kind, name] = Histogram()
+            histogram.add(seconds, rows)
+
+    def log_slow(self, sql, seconds, rows):
+        with self.lock:
+            self.slow.append((datetime.now(), seconds, rows, statement_name(sql)))
+
+    def cursor(self, cursor):
+        """`cursor`, wrapped to be timed if instrumentation is on."""
+        return InstrumentedCursor(cursor, self) if self.enabled else cursor
+
+    @contextmanager
+    def timer(self, kind, name, rows=None):
+        """Time the block (when sampled) under (kind, name)."""
+        if not (self.enabled and self.sampled()):
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - started, rows)
+
+    # --- Reading ---
+    def snapshot(self):
+        """{"timings": [...], "slow_queries": [...]}, slowest total time first."""
+        with self.lock:
+            timings = [{"kind": kind, "name": name, **histogram.as_dict()}
+                       for (kind, name), histogram in self.histograms.items()]
+            slow = [{"at": at.isoformat(timespec="seconds"), "seconds": seconds, "rows": rows, "sql": sql}
+                    for at, seconds, rows, sql in self.slow]
+        timings.sort(key=lambda t: t["seconds"], reverse=True)
+        return {"since": self.since.isoformat(timespec="seconds"),
+                "sample": self.sample,
+                "slow_query_seconds": self.slow_seconds,
+                "timings": timings, "slow_queries": slow}
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.slow.clear()
+            self.since = datetime.now()
+
+class InstrumentedCursor:
+    """A DB-API cursor whose execute and fetch calls are timed into a Stats.
+
+    Everything else (lastrowid, rowcount, close...) is passed through.
+    """
+    def __init__(self, cursor, stats):
+        self.cursor = cursor
+        self.stats = stats
+        self.statement = None   # name of the last statement, if its fetches are sampled
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.executed(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, rows):
+        started = time.perf_counter()
+        try:
+            return self.cursor.executemany(sql, rows)
+        finally:
+            self.executed(sql, time.perf_counter() - started)
+
+    def executed(self, sql, seconds):
+        rows = getattr(self.cursor, "rowcount", None)
+        if seconds >= self.stats.slow_seconds:
+            self.stats.log_slow(sql, seconds, rows)
+        self.statement = statement_name(sql) if self.stats.sampled() else None
+        if self.statement is not None:
+            self.stats.record("query", self.statement, seconds, rows)
+
+    def fetched(self, started, count):
+        if self.statement is not None:
+            self.stats.record("fetch", self.statement, time.perf_counter() - started, count)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self.cursor.fetchone()
+        self.fetched(started, 0 if row is None else 1)
+        return row
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self.cursor.fetchall()
+        self.fetched(started, len(rows))
+        return rows
+
+    def fetchmany(self, size=1):
+        started = time.perf_counter()
+        rows = self.cursor.fetchmany(size)
+        self.fetched(started, len(rows))
+        return rows
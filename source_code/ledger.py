@@ -0,0 +1,351 @@
+from decimal import Decimal
+import archive
+import changes
+import checkpoints
+import reports
+import search
+from cache import ACCOUNTS, LedgerCache
+from importer import import_statement
+from migrations import MIGRATIONS_DIR, migrate
+from money import check_amount
+
+# === Ledger Service ===
+# The ledger's business logic, free of any GUI code. Both the Tk app
+# (app.py) and the HTTP server (server.py) are clients of LedgerService.
+# Creating a service opens nothing: connections come from the pool in
+# db.py on first use.
+PAGE_SIZE = 200
+TRANSACTION_TYPES = ("Deposit", "Withdrawal")
+
+class OverdraftError(Exception):
+    pass
+
+class NotFoundError(Exception):
+    pass
+
+# === Database Operations ===
+# Each takes a cursor supplied by db.read/db.write as its first argument.
+def load_accounts(cursor):
+    cursor.execute("SELECT id, name, balance FROM accounts ORDER BY id")
+    return cursor.fetchall()
+
+def load_account(cursor, acct_id):
+    cursor.execute("SELECT id, name, balance FROM accounts WHERE id=%s", (acct_id,))
+    return cursor.fetchone()
+
+def accounts_version(cursor):
+    """Change token for the account list: any add, delete or accounts.version bump changes it."""
+    cursor.execute("SELECT COUNT(*), MAX(id), SUM(version) FROM accounts")
+    return tuple(cursor.fetchone())
+
+def account_version(cursor, acct_id):
+    cursor.execute("SELECT version FROM accounts WHERE id=%s", (acct_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def insert_account(cursor, name):
+    cursor.execute("INSERT INTO accounts (name, balance) VALUES (%s, %s)", (name, Decimal("0.00")))
+    return load_account(cursor, cursor.lastrowid)
+
+def rename_account(cursor, acct_id, name):
+    cursor.execute("UPDATE accounts SET name=%s, version = version + 1 WHERE id=%s", (name, acct_id))
+    return load_account(cursor, acct_id)
+
+def remove_account(cursor, acct_id):
+    # Account, then transactions, then checkpoints: the lock order of every write path
+    cursor.execute("SELECT id FROM accounts WHERE id=%s FOR UPDATE", (acct_id,))
+    cursor.fetchall()
+    cursor.execute("DELETE FROM transactions WHERE account_id=%s", (acct_id,))
+    cursor.execute("DELETE FROM balance_checkpoints WHERE account_id=%s", (acct_id,))
+    cursor.execute("DELETE FROM accounts WHERE id=%s", (acct_id,))
+    return cursor.rowcount
+
+def page_query(account_id, after=None, before=None, limit=PAGE_SIZE):
+    """SQL and parameters of fetch_transactions_page."""
+    sql = "SELECT id, type, amount, date, note FROM transactions WHERE account_id=%s"
+    params = [account_id]
+    if after is not None:
+        sql += " AND (date > %s OR (date = %s AND id > %s)) ORDER BY date, id"
+        params += [after[0], after[0], after[1]]
+    elif before is not None:
+        sql += " AND (date < %s OR (date = %s AND id < %s)) ORDER BY date DESC, id DESC"
+        params += [before[0], before[0], before[1]]
+    else:
+        sql += " ORDER BY date, id"
+    sql += " LIMIT %s"
+    params.append(limit)
+    return sql, params
+
+def fetch_transactions_page(cursor, account_id, after=None, before=None, limit=PAGE_SIZE):
+    """Fetch one page of an account's transactions ordered by (date, id).
+
+    `after` / `before` are (date, id) keys; the page starts right after
+    `after` or ends right before `before`. Rows are always returned in
+    ascending order.
+    """
+    cursor.execute(*page_query(account_id, after, before, limit))
+    rows = cursor.fetchall()
+    if before is not None:
+        rows.reverse()
+    return rows
+
+def load_transaction(cursor, tx_id):
+    cursor.execute("SELECT type, amount, date, note FROM transactions WHERE id=%s", (tx_id,))
+    return cursor.fetchone()
+
+def load_transaction_row(cursor, tx_id):
+    """The stored (id, type, amount, date, note) row, as the list view shows it."""
+    cursor.execute("SELECT id, type, amount, date, note FROM transactions WHERE id=%s", (tx_id,))
+    return cursor.fetchone()
+
+def apply_to_balance(cursor, account_id, delta, error):
+    """Add `delta` to an account's balance unless that would make it negative.
+
+    The check and the write are one conditional UPDATE, which also holds the
+    account row's lock until commit, so concurrent writers cannot both pass
+    the check; nothing is read first and then written back. Increases are
+    always allowed, even while the balance is still negative. Every call
+    bumps accounts.version.
+    """
+    if not delta:
+        cursor.execute("UPDATE accounts SET version = version + 1 WHERE id=%s", (account_id,))
+        if cursor.rowcount != 1:
+            raise NotFoundError(f"Account {account_id} does not exist.")
+        return
+    cursor.execute(
+        "UPDATE accounts SET balance = balance + %s, version = version + 1 "
+        "WHERE id=%s AND (%s >= 0 OR balance + %s >= 0)",
+        (delta, account_id, delta, delta)
+    )
+    if cursor.rowcount != 1:
+        cursor.execute("SELECT 1 FROM accounts WHERE id=%s", (account_id,))
+        if cursor.fetchone() is None:
+            raise NotFoundError(f"Account {account_id} does not exist.")
+        raise OverdraftError(error)
+
+def lock_account(cursor, account_id):
+    """Lock an account's row until commit, before any of its other rows."""
+    cursor.execute("SELECT id FROM accounts WHERE id=%s FOR UPDATE", (account_id,))
+    if not cursor.fetchall():
+        raise NotFoundError(f"Account {account_id} does not exist.")
+
+def lock_transaction(cursor, account_id, tx_id):
+    """Read (type, amount, date) of a transaction and lock it until commit,
+    so concurrent edits or deletes of the same row apply one after another."""
+    cursor.execute(
+        "SELECT type, amount, date FROM transactions WHERE id=%s AND account_id=%s FOR UPDATE",
+        (tx_id, account_id)
+    )
+    row = cursor.fetchone()
+    if row is None:
+        raise NotFoundError(f"Transaction {tx_id} does not exist in account {account_id}.")
+    return row
+
+# Write paths lock rows in one order (the account row, then its transaction
+# rows, then its checkpoints) so concurrent writers queue instead of
+# deadlocking; db.write replays the rare deadlock that remains. Holding the
+# account row first also means writers of one account never meet on its
+# other rows. A batch locks its accounts in id order.
+def insert_transaction(cursor, account_id, tx_type, amount, date_obj, note):
+    """Add a transaction and apply it to the balance; returns (tx row, account row)."""
+    delta = checkpoints.signed(tx_type, amount)
+    # The conditional UPDATE takes the account's lock before the row is inserted
+    apply_to_balance(cursor, account_id, delta, "Withdrawal exceeds current balance.")
+    cursor.execute(
+        "INSERT INTO transactions (account_id, type, amount, date, note) VALUES (%s, %s, %s, %s, %s)",
+        (account_id, tx_type, amount, date_obj, note)
+    )
+    tx_id = cursor.lastrowid
+    checkpoints.apply_delta(cursor, account_id, date_obj, delta)
+    return load_transaction_row(cursor, tx_id), load_account(cursor, account_id)
+
+def update_transaction(cursor, account_id, tx_id, tx_type, amount, date_obj, note):
+    """Rewrite a transaction and re-apply it to the balance; returns (tx row, account row)."""
+    lock_account(cursor, account_id)
+    original_type, original_amount, original_date = lock_transaction(cursor, account_id, tx_id)
+    old_delta = checkpoints.signed(original_type, original_amount)
+    new_delta = checkpoints.signed(tx_type, amount)
+    apply_to_balance(cursor, account_id, new_delta - old_delta, "Change would make balance negative.")
+    cursor.execute(
+        "UPDATE transactions SET type=%s, amount=%s, date=%s, note=%s WHERE id=%s",
+        (tx_type, amount, date_obj, note, tx_id)
+    )
+    checkpoints.apply_delta(cursor, account_id, original_date, -old_delta)
+    checkpoints.apply_delta(cursor, account_id, date_obj, new_delta)
+    return load_transaction_row(cursor, tx_id), load_account(cursor, account_id)
+
+def remove_transaction(cursor, account_id, tx_id):
+    """Delete a transaction and reverse its effect on the balance; returns the account row."""
+    lock_account(cursor, account_id)
+    tx_type, amount, date = lock_transaction(cursor, account_id, tx_id)
+    delta = -checkpoints.signed(tx_type, amount)
+    # Deleting a deposit may leave the balance negative, as it always could
+    cursor.execute("UPDATE accounts SET balance = balance + %s, version = version + 1 WHERE id=%s",
+                   (delta, account_id))
+    cursor.execute("DELETE FROM transactions WHERE id=%s", (tx_id,))
+    checkpoints.apply_delta(cursor, account_id, date, delta)
+    return load_account(cursor, account_id)
+
+# === Service ===
+class LedgerService:
+    """Ledger operations on top of a ConnectionManager.
+
+    Every method is a blocking call that is safe to run from any thread;
+    GUI clients run them on a worker (see worker.py), the HTTP server on
+    its request threads. Rows are returned as the tuples the queries
+    produce: accounts as (id, name, balance), transactions as
+    (id, type, amount, date, note).
+
+    Account lists and transaction pages are read through a LedgerCache
+    (cache.py), which the write methods below invalidate. Writes made
+    elsewhere must call the cache's *_changed methods too.
+    """
+    def __init__(self, db, cache=None):
+        self.db = db
+        self.cache = cache if cache is not None else LedgerCache.from_config(db.config)
+
+    def migrate(self, log=None):
+        return self.db.read(migrate, MIGRATIONS_DIR, log)
+
+    # --- Accounts ---
+    def accounts(self):
+        return self.cache.read(ACCOUNTS, "accounts", lambda: self.db.read(load_accounts),
+                               lambda: self.db.read(accounts_version))
+
+    def account(self, acct_id):
+        acct = self.db.read(load_account, acct_id)
+        if acct is None:
+            raise NotFoundError(f"Account {acct_id} does not exist.")
+        return acct
+
+    def add_account(self, name):
+        acct = self.db.write(insert_account, self.check_name(name))
+        self.cache.accounts_changed()
+        return acct
+
+    def rename_account(self, acct_id, name):
+        acct = self.db.write(rename_account, acct_id, self.check_name(name))
+        if acct is None:
+            raise NotFoundError(f"Account {acct_id} does not exist.")
+        self.cache.accounts_changed()
+        return acct
+
+    def delete_account(self, acct_id, progress=None, chunk_size=archive.CHUNK_SIZE):
+        """Delete an account and its history, one chunk of transactions per
+        commit (see archive.py); progress(deleted, total) follows the chunks."""
+        try:
+            archive.delete_history(self.db, acct_id, chunk_size, progress)
+            removed = self.db.write(remove_account, acct_id)
+        finally:
+            self.cache.account_removed(acct_id)
+        if not removed:
+            raise NotFoundError(f"Account {acct_id} does not exist.")
+
+    def balance_at(self, acct_id, as_of):
+        return self.db.read(checkpoints.balance_at, acct_id, as_of)
+
+    def balance_before(self, acct_id, key):
+        return self.db.read(checkpoints.balance_before, acct_id, key)
+
+    # --- Transactions ---
+    def transactions(self, account_id, after=None, before=None, limit=PAGE_SIZE):
+        return self.cache.read(
+            ("page", account_id, after, before, limit), account_id,
+            lambda: self.db.read(fetch_transactions_page, account_id, after, before, limit),
+            lambda: self.db.read(account_version, account_id))
+
+    def transaction(self, tx_id):
+        tx = self.db.read(load_transaction_row, tx_id)
+        if tx is None:
+            raise NotFoundError(f"Transaction {tx_id} does not exist.")
+        return tx
+
+    def add_transaction(self, account_id, tx_type, amount, date_obj, note=""):
+        """Returns (tx row, account row)."""
+        amount = self.check_transaction(tx_type, amount)
+        tx, acct = self.db.write(insert_transaction, account_id, tx_type, amount, date_obj, note)
+        self.cache.transactions_changed(account_id, keys=[(tx[3], tx[0])])
+        return tx, acct
+
+    def update_transaction(self, account_id, tx_id, tx_type, amount, date_obj, note=""):
+        """Returns (tx row, account row)."""
+        amount = self.check_transaction(tx_type, amount)
+        tx, acct = self.db.write(update_transaction, account_id, tx_id, tx_type, amount, date_obj, note)
+        self.cache.transactions_changed(account_id, keys=[(tx[3], tx[0])], tx_ids=[tx_id])
+        return tx, acct
+
+    def delete_transaction(self, account_id, tx_id):
+        """Returns the account row."""
+        acct = self.db.write(remove_transaction, account_id, tx_id)
+        self.cache.transactions_changed(account_id, tx_ids=[tx_id])
+        return acct
+
+    def import_statement(self, path, account_id=None, progress=None):
+        try:
+            return import_statement(self.db, path, account_id, progress=progress)
+        finally:
+            # Rows may go to any account named in the file, and batches
+            # committed before a failure stay in
+            self.cache.clear()
+
+    def archive(self, cutoff, account_id=None, progress=None, chunk_size=archive.CHUNK_SIZE):
+        """Move transactions dated before `cutoff` to transactions_archive,
+        leaving a summary transaction per account; see archive.py."""
+        try:
+            return archive.archive_before(self.db, cutoff, account_id, chunk_size, progress)
+        finally:
+            self.cache.clear()
+
+    # --- Search ---
+    def search(self, text="", account_id=None, min_amount=None, max_amount=None, start=None, end=None,
+               before=None, limit=PAGE_SIZE):
+        """One page of transactions whose note has all words of `text`; see search.py.
+
+        Rows are (id, account id, type, amount, date, note), newest first;
+        pass the (date, id) of the last row as `before` for the next page.
+        """
+        if not search.WORD.search(text or "") and all(
+                v is None for v in (account_id, min_amount, max_amount, start, end)):
+            raise ValueError("Enter words to search for, or an amount or date filter.")
+        return self.db.read(search.search_transactions, text, account_id, min_amount, max_amount,
+                            start, end, before, limit)
+
+    # --- Reports ---
+    def report(self, group="month", account_id=None, year=None, limit=None):
+        """Deposit/withdrawal totals per month, year or note keyword; see reports.py."""
+        if group not in reports.GROUPS:
+            raise ValueError(f"Unknown report grouping: {group!r}")
+        return reports.report(self.db, group, account_id, year, limit=limit)
+
+    # --- Change feed ---
+    def poll_changes(self, feed):
+        """Read what changed since the last poll of `feed` (a changes.ChangeFeed).
+
+        Returns ({account id: row or None}, {tx id: (account id, row or None)})
+        and drops the cache entries those changes made stale, which keeps
+        the cache current with writes made by other clients.
+        """
+        accounts, transactions = self.db.read(changes.poll_changes, feed)
+        for acct_id, acct in accounts.items():
+            if acct is None:
+                self.cache.account_removed(acct_id)
+        if accounts:
+            self.cache.accounts_changed()
+        for tx_id, (acct_id, tx) in transactions.items():
+            self.cache.transactions_changed(acct_id, keys=[(tx[3], tx[0])] if tx else (), tx_ids=[tx_id])
+        return accounts, transactions
+
+    # --- Validation ---
+    @staticmethod
+    def check_name(name):
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("Account name is required.")
+        return name
+
+    @staticmethod
+    def check_transaction(tx_type, amount):
+        """Validate a transaction; returns the amount as a Decimal of whole cents."""
+        if tx_type not in TRANSACTION_TYPES:
+            raise ValueError(f"Type must be Deposit or Withdrawal, not {tx_type!r}.")
+        return check_amount(amount)
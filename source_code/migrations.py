@@ -0,0 +1,158 @@
+import os
+import re
+from datetime import date
+
+# === Schema Migrations ===
+# database/schema.sql creates the baseline tables; every later schema change
+# is a numbered file in database/migrations (NNN_description.sql). Applied
+# versions are recorded in schema_migrations, and app.py applies pending
+# migrations at startup. A MySQL advisory lock keeps two app instances from
+# migrating at the same time.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "database", "migrations")
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+LOCK_NAME = "ledger_schema_migrations"
+LOCK_TIMEOUT = 60
+
+def discover(path=MIGRATIONS_DIR):
+    """Return [(version, name, file path)] sorted by version."""
+    found = []
+    for filename in os.listdir(path):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(path, filename)))
+    return sorted(found)
+
+def split_statements(text):
+    """Split a migration file into statements, dropping `--` comment lines."""
+    lines = [line for line in text.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+def applied_versions(cursor):
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version INT PRIMARY KEY,"
+        " name VARCHAR(255) NOT NULL,"
+        " applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def pending_migrations(cursor, path=MIGRATIONS_DIR):
+    done = applied_versions(cursor)
+    return [m for m in discover(path) if m[0] not in done]
+
+def migrate(cursor, path=MIGRATIONS_DIR, log=None):
+    """Apply pending migrations in order; returns the names applied.
+
+    Run this on an autocommit connection (db.run / db.read): MySQL commits
+    DDL implicitly, so each statement is durable as soon as it runs.
+    """
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        raise RuntimeError("Another instance is upgrading the database schema; try again shortly.")
+    try:
+        applied = []
+        # Re-read under the lock in case another instance just finished
+        for version, name, file_path in pending_migrations(cursor, path):
+            if log:
+                log(f"Applying migration {version:03d} {name}")
+            with open(file_path, encoding="utf-8") as f:
+                for statement in split_statements(f.read()):
+                    cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            applied.append(name)
+        return applied
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+
+# === EXPLAIN Checks ===
+# The hot queries the app issues, with the index each one is expected to
+# use. The SQL comes from the modules that run it, so the check follows
+# any change to it. Run `python migrations.py explain` against a database
+# holding a realistic amount of data; on a near-empty table the optimizer
+# may rightly prefer a table scan.
+SAMPLE_DATE = date(2025, 1, 1)
+SAMPLE_KEY = (SAMPLE_DATE, 1)
+
+def hot_queries():
+    """[(description, sql, params, index, covering, ordered)]: the index the
+    query should use, whether it should be answered from that index alone,
+    and whether the index should give its ORDER BY (aggregates sort only
+    their summary rows)."""
+    import checkpoints
+    import ledger
+    import reconcile
+    import reports
+    import search
+    year = (date(2025, 1, 1), date(2025, 12, 31))
+    return [
+        ("transaction list, first page", *ledger.page_query(1),
+         "idx_transactions_account_date", False, True),
+        ("transaction list, next page", *ledger.page_query(1, after=SAMPLE_KEY),
+         "idx_transactions_account_date", False, True),
+        ("transaction list, previous page", *ledger.page_query(1, before=SAMPLE_KEY),
+         "idx_transactions_account_date", False, True),
+        ("balance on a date, checkpoint", checkpoints.CHECKPOINT_BEFORE, (1, SAMPLE_DATE),
+         "PRIMARY", False, True),
+        ("balance on a date, rest of the month", checkpoints.NET_BETWEEN, (1, SAMPLE_DATE, SAMPLE_DATE),
+         "idx_transactions_balance", True, False),
+        ("balance before a transaction, same day", checkpoints.NET_SAME_DAY_BEFORE, (1, SAMPLE_DATE, 1),
+         "idx_transactions_balance", True, False),
+        ("monthly report of an account", *reports.grouped_totals_query("month", 1, *year),
+         "idx_transactions_balance", True, False),
+        ("reconciliation shard", reconcile.MONTHLY_NET, (1, 100),
+         "idx_transactions_balance", True, False),
+        ("note search", *search.search_query("groceries"),
+         "ft_transactions_note", False, False),
+        ("note search in an account, next page", *search.search_query("groceries", 1, before=SAMPLE_KEY),
+         "ft_transactions_note", False, False),
+    ]
+
+def explain(cursor, sql, params):
+    cursor.execute("EXPLAIN " + sql, params)
+    names = [d[0].lower() for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+def check_hot_queries(cursor):
+    """EXPLAIN every hot query; returns [(description, plan row, problems)]."""
+    results = []
+    for description, sql, params, index, covering, ordered in hot_queries():
+        plan = explain(cursor, sql, params)[0]
+        extra = [part.strip() for part in (plan.get("extra") or "").split(";")]
+        problems = []
+        if plan.get("key") != index:
+            problems.append(f"uses {plan.get('key') or 'no index'} instead of {index}")
+        if ordered and "Using filesort" in extra:
+            problems.append("needs a filesort")
+        if covering and "Using index" not in extra:
+            problems.append("is not answered from the index alone")
+        results.append((description, plan, problems))
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Manage the ledger database schema.")
+    parser.add_argument("command", nargs="?", default="migrate", choices=("migrate", "status", "explain"))
+    args = parser.parse_args()
+    db = ConnectionManager()
+    if args.command == "migrate":
+        applied = db.read(migrate, MIGRATIONS_DIR, print)
+        print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
+    elif args.command == "status":
+        pending = db.read(pending_migrations)
+        for version, name, _ in pending:
+            print(f"pending {version:03d} {name}")
+        print(f"{len(pending)} pending migration(s).")
+    else:
+        failed = False
+        for description, plan, problems in db.read(check_hot_queries):
+            print(f"{'FAIL' if problems else 'ok  '} {description}: key={plan.get('key')} "
+                  f"rows={plan.get('rows')} extra={plan.get('extra')}")
+            for problem in problems:
+                print(f"       {problem}")
+            failed = failed or bool(problems)
+        sys.exit(1 if failed else 0)
@@ -0,0 +1,62 @@
+from decimal import Decimal, InvalidOperation
+
+# === Money ===
+# Amounts are exact from end to end. At the edges (MySQL DECIMAL(10,2)
+# columns, entry fields, CSV/OFX statements, JSON bodies) they are
+# Decimals parsed straight from their text, never through float; server.py
+# reads JSON numbers as Decimal for that reason. Where amounts are kept as
+# whole cents (the NumPy report columns, the replica's SQLite columns,
+# the transactions window's rows in rowstore.py) they are int, or an
+# integral float below 2**53, until they are shown. Balances are
+# maintained in SQL with exact Decimal deltas (ledger.py, checkpoints.py).
+# Python's decimal module is C code, so adding Decimals is already cheaper
+# than converting each one to cents first; cents are only used where the
+# values come that way or where their size or exact comparison matters.
+CENT = Decimal("0.01")
+MAX_AMOUNT = Decimal("99999999.99")   # the largest DECIMAL(10,2) value
+
+def parse_amount(value):
+    """An amount given as text, int or Decimal, as an exact Decimal.
+
+    Thousands separators are allowed; floats are refused, since their
+    value is usually not the decimal number that was meant.
+    """
+    if isinstance(value, float):
+        raise ValueError(f"Invalid amount {value!r}: give amounts as text or Decimal, not float.")
+    if isinstance(value, str):
+        value = value.replace(",", "").strip()
+    try:
+        amount = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError(f"Invalid amount {value!r}.")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount {value!r}.")
+    return amount
+
+def check_amount(value):
+    """parse_amount, then require a positive amount of whole cents that
+    fits the DECIMAL(10,2) columns."""
+    amount = parse_amount(value)
+    if amount <= 0:
+        raise ValueError("Amount must be positive.")
+    if amount > MAX_AMOUNT:
+        raise ValueError(f"Amount {amount} is larger than {MAX_AMOUNT}.")
+    if amount != amount.quantize(CENT):   # cannot overflow once the range is checked
+        raise ValueError(f"Amount {amount} has more than two decimals.")
+    return amount
+
+def to_cents(amount):
+    """Whole cents of a Decimal amount of at most two decimals, as an int."""
+    cents = amount.scaleb(2)
+    if cents != cents.to_integral_value():
+        raise ValueError(f"Amount {amount} has more than two decimals.")
+    return int(cents)
+
+def from_cents(cents):
+    """A Decimal amount with two decimals from whole cents."""
+    return Decimal(int(cents)).scaleb(-2)
+
+def format_cents(cents):
+    """Whole cents as text with two decimals, like f"{amount:.2f}" of the amount."""
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+import checkpoints
+
+# === Reconciliation ===
+# Checks that every account's stored balance equals the sum of its
+# transactions and that its monthly checkpoints match a rebuild, over the
+# whole ledger. Accounts are split into shards of consecutive ids, and the
+# shards run on a thread pool with one pooled connection each: the work is
+# a GROUP BY in MySQL over the (account_id, date, type, amount) index of
+# migration 002, so each shard reads its transactions exactly once, only
+# one row per account and month crosses the network, and threads spend
+# their time waiting on the server rather than holding the GIL.
+#
+# A shard reads balances, checkpoints and monthly sums from one consistent
+# snapshot, so writes made meanwhile never show up as drift. Repair
+# re-reads an account under its row lock before rewriting it.
+SHARDS_PER_WORKER = 8   # small shards even out accounts with very long histories
+MONTHLY_NET = (
+    "SELECT account_id, YEAR(date), MONTH(date), "
+    "SUM(CASE WHEN type = 'Deposit' THEN amount ELSE -amount END), COUNT(*) "
+    "FROM transactions WHERE account_id BETWEEN %s AND %s "
+    "GROUP BY account_id, YEAR(date), MONTH(date) ORDER BY account_id, YEAR(date), MONTH(date)"
+)
+
+class ShardResult:
+    """What one shard found: counts, problem descriptions and the accounts they concern."""
+    def __init__(self, first, last):
+        self.first = first
+        self.last = last
+        self.accounts = 0
+        self.transactions = 0
+        self.problems = []
+        self.broken = set()
+        self.repaired = []   # (account id, old balance, new balance)
+
+def shard_ranges(cursor, shards):
+    """Split the account ids into at most `shards` [first, last] ranges of
+    about as many accounts each."""
+    cursor.execute("SELECT id FROM accounts ORDER BY id")
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return []
+    size = -(-len(ids) // shards)
+    return [(ids[i], ids[min(i + size, len(ids)) - 1]) for i in range(0, len(ids), size)]
+
+def check_shard(cursor, first, last):
+    """Compare balances and checkpoints of accounts `first`..`last` with
+    their transactions; returns a ShardResult."""
+    result = ShardResult(first, last)
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    try:
+        cursor.execute("SELECT id, balance FROM accounts WHERE id BETWEEN %s AND %s", (first, last))
+        balances = dict(cursor.fetchall())
+        cursor.execute("SELECT account_id, month, balance FROM balance_checkpoints "
+                       "WHERE account_id BETWEEN %s AND %s", (first, last))
+        stored = checkpoints.stored_checkpoints(cursor.fetchall())
+        cursor.execute(MONTHLY_NET, (first, last))
+        monthly = cursor.fetchall()
+    finally:
+        cursor.execute("COMMIT")
+    expected = checkpoints.running_balances(monthly)
+    result.accounts = len(balances)
+    result.transactions = sum(row[4] for row in monthly)
+    for acct_id, balance in sorted(balances.items()):
+        months = expected.get(acct_id)
+        total = months[-1][1] if months else Decimal("0.00")
+        if balance != total:
+            result.problems.append(f"account {acct_id}: balance {balance} but transactions sum to {total}")
+            result.broken.add(acct_id)
+    # Checkpoints of accounts deleted since the snapshot's account list was read are not ours to judge
+    problems, broken = checkpoints.compare({a: m for a, m in expected.items() if a in balances},
+                                           {a: m for a, m in stored.items() if a in balances})
+    result.problems += problems
+    result.broken |= broken
+    return result
+
+def repair_account(cursor, acct_id):
+    """Rewrite an account's balance and checkpoints from its transactions;
+    returns (old balance, new balance), or None if the account is gone.
+
+    Every write path takes the account's row lock before it changes the
+    account's transactions, so once this holds the lock the sums below
+    (the transaction's first consistent read) include every such write.
+    """
+    cursor.execute("SELECT balance FROM accounts WHERE id=%s FOR UPDATE", (acct_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    cursor.execute(MONTHLY_NET, (acct_id, acct_id))
+    months = checkpoints.running_balances(cursor.fetchall()).get(acct_id, [])
+    balance = months[-1][1] if months else Decimal("0.00")
+    cursor.execute("UPDATE accounts SET balance=%s, version = version + 1 WHERE id=%s", (balance, acct_id))
+    checkpoints.replace_checkpoints(cursor, acct_id, months)
+    return row[0], balance
+
+def reconcile(db, workers=4, repair=False, shards=None, progress=None):
+    """Check (and with repair=True fix) every account on `workers` threads.
+
+    Returns (results, seconds); progress(shards done, shards, transactions
+    read) is called as shards finish. `db` needs at least `workers`
+    pooled connections to keep them all busy.
+    """
+    started = time.perf_counter()
+    ranges = db.read(shard_ranges, shards or workers * SHARDS_PER_WORKER)
+
+    def run_shard(first, last):
+        result = db.read(check_shard, first, last)
+        if repair:
+            for acct_id in sorted(result.broken):
+                repaired = db.write(repair_account, acct_id)
+                if repaired is not None:
+                    result.repaired.append((acct_id, *repaired))
+        return result
+
+    results, read = [], 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile") as pool:
+        for future in as_completed([pool.submit(run_shard, first, last) for first, last in ranges]):
+            results.append(future.result())
+            read += results[-1].transactions
+            if progress:
+                progress(len(results), len(ranges), read)
+    results.sort(key=lambda r: r.first)
+    return results, time.perf_counter() - started
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from db import ConnectionManager, load_config
+
+    parser = argparse.ArgumentParser(description="Check every balance and checkpoint against the transactions.")
+    parser.add_argument("--workers", type=int, default=4, help="shards checked at the same time")
+    parser.add_argument("--shards", type=int, help=f"number of shards (default {SHARDS_PER_WORKER} per worker)")
+    parser.add_argument("--repair", action="store_true", help="rewrite wrong balances and checkpoints")
+    args = parser.parse_args()
+    config = load_config()
+    config["DB_POOL_SIZE"] = str(max(args.workers, int(config["DB_POOL_SIZE"])))
+    results, seconds = reconcile(
+        ConnectionManager(config), args.workers, args.repair, args.shards,
+        progress=lambda done, total, read: print(f"\r{done}/{total} shards, {read} transactions", end="", flush=True))
+    print()
+    for result in results:
+        for problem in result.problems:
+            print(problem)
+        for acct_id, old, new in result.repaired:
+            print(f"account {acct_id}: repaired, balance {old} -> {new}")
+    accounts = sum(r.accounts for r in results)
+    transactions = sum(r.transactions for r in results)
+    found = sum(len(r.problems) for r in results)
+    print(f"{accounts} accounts and {transactions} transactions in {seconds:.1f}s "
+          f"({transactions / seconds if seconds else 0:.0f} transactions/s, {args.workers} workers); "
+          f"{found} problem(s) found" + (", repaired." if args.repair and found else "."))
+    sys.exit(1 if found and not args.repair else 0)
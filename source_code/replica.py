@@ -0,0 +1,720 @@
+import json
+import sqlite3
+import threading
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+import changes
+import checkpoints
+from cache import LedgerCache
+from db import local_path
+from instrument import Stats
+from ledger import (LedgerService, NotFoundError, OverdraftError, insert_account, insert_transaction,
+                    load_account, load_accounts, remove_account, remove_transaction, rename_account,
+                    update_transaction)
+from money import from_cents, to_cents
+
+# === Local Replica ===
+# With DB_REPLICA_PATH set in config.env, the app reads and writes a SQLite
+# copy of the ledger instead of MySQL, so it starts and stays usable while
+# the server is slow or down. Every local write also appends to an outbox
+# table in the same SQLite transaction. A background SyncWorker sends the
+# outbox to MySQL in order, then pulls the server's changes by tailing its
+# change_log (changes.py), much like an open window follows other clients.
+#
+# Rows created locally get ids from LOCAL_ID_BASE up, a range MySQL's INT
+# ids never reach. Once the server has accepted such a row it is swapped
+# for the server's row and id. The server is the source of truth: a queued
+# write it rejects (overdraft, row deleted meanwhile) is dropped, recorded
+# in sync_conflicts and the replica is reset to the server's rows. Server
+# changes to rows that still have queued local writes are skipped until
+# those writes are sent; the echo of the write brings them back in line.
+#
+# A write whose server COMMIT was sent but whose reply was lost is sent
+# again on the next sync, so in that rare case it can be applied twice.
+LOCAL_ID_BASE = 2 ** 31        # above any MySQL INT id
+SNAPSHOT_CHUNK = 5000
+CHANGE_LOG_KEEP = 10000        # local change_log entries kept for the GUI's feed
+MAX_SYNC_DELAY = 60.0          # seconds between attempts while the server is unreachable
+
+SCHEMA_VERSION = 1             # PRAGMA user_version; 1: amounts in whole cents
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    balance CENTS REAL NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    amount CENTS REAL NOT NULL,
+    date DATE NOT NULL,
+    note TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions (account_id, date, id);
+CREATE TABLE IF NOT EXISTS balance_checkpoints (
+    account_id INTEGER NOT NULL,
+    month DATE NOT NULL,
+    balance CENTS REAL NOT NULL,
+    PRIMARY KEY (account_id, month)
+);
+CREATE TABLE IF NOT EXISTS transactions_archive (
+    id INTEGER NOT NULL,
+    account_id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    amount CENTS REAL NOT NULL,
+    date DATE NOT NULL,
+    note TEXT,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, date)
+);
+CREATE TABLE IF NOT EXISTS change_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL,
+    tx_id INTEGER,
+    action TEXT NOT NULL,
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TRIGGER IF NOT EXISTS transactions_log_insert AFTER INSERT ON transactions BEGIN
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (NEW.account_id, NEW.id, 'insert'); END;
+CREATE TRIGGER IF NOT EXISTS transactions_log_update AFTER UPDATE ON transactions BEGIN
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (NEW.account_id, NEW.id, 'update'); END;
+CREATE TRIGGER IF NOT EXISTS transactions_log_delete AFTER DELETE ON transactions BEGIN
+    INSERT INTO change_log (account_id, tx_id, action) VALUES (OLD.account_id, OLD.id, 'delete'); END;
+CREATE TRIGGER IF NOT EXISTS accounts_log_insert AFTER INSERT ON accounts BEGIN
+    INSERT INTO change_log (account_id, action) VALUES (NEW.id, 'insert'); END;
+CREATE TRIGGER IF NOT EXISTS accounts_log_update AFTER UPDATE ON accounts WHEN NEW.name <> OLD.name BEGIN
+    INSERT INTO change_log (account_id, action) VALUES (NEW.id, 'update'); END;
+CREATE TRIGGER IF NOT EXISTS accounts_log_delete AFTER DELETE ON accounts BEGIN
+    INSERT INTO change_log (account_id, action) VALUES (OLD.id, 'delete'); END;
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    account_id INTEGER NOT NULL,
+    tx_id INTEGER,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sync_conflicts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    happened_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    description TEXT NOT NULL
+);
+INSERT INTO sqlite_sequence (name, seq)
+    SELECT name, 0 FROM (SELECT 'accounts' AS name UNION ALL SELECT 'transactions')
+    WHERE name NOT IN (SELECT name FROM sqlite_sequence);
+UPDATE sqlite_sequence SET seq = {LOCAL_ID_BASE - 1}
+    WHERE name IN ('accounts', 'transactions') AND seq < {LOCAL_ID_BASE - 1};
+"""
+
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("CENTS", lambda value: from_cents(round(float(value))))
+
+MONEY_COLUMNS = {
+    "accounts": "balance",
+    "transactions": "amount",
+    "balance_checkpoints": "balance",
+    "transactions_archive": "amount",
+}
+
+def statements(script):
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ""
+
+def create_schema(conn):
+    """Create the replica's tables, or bring a file from before SCHEMA_VERSION
+    up to date: amounts were stored in units then, and become whole cents.
+
+    The money tables are rebuilt in one transaction. Their triggers are only
+    created after the copy, so the copied rows do not reach the change log.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        conn.executescript(SCHEMA)
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        old = [table for table in MONEY_COLUMNS if table in tables]
+        sequences = dict(conn.execute("SELECT name, seq FROM sqlite_sequence")) if "sqlite_sequence" in tables else {}
+        for kind, name in conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE type IN ('trigger', 'index') AND sql IS NOT NULL "
+                f"AND tbl_name IN ({', '.join('?' * len(old))})", old).fetchall():
+            conn.execute(f"DROP {kind} {name}")
+        for table in old:
+            conn.execute(f"ALTER TABLE {table} RENAME TO old_{table}")
+        triggers = []
+        for statement in statements(SCHEMA):
+            if statement.lstrip().startswith("CREATE TRIGGER"):
+                triggers.append(statement)
+            else:
+                conn.execute(statement)
+        for table in old:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info(old_{table})")]
+            values = [f"ROUND({c} * 100)" if c == MONEY_COLUMNS[table] else c for c in columns]
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) "
+                         f"SELECT {', '.join(values)} FROM old_{table}")
+            conn.execute(f"DROP TABLE old_{table}")
+        for name, seq in sequences.items():
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq, name))
+        for statement in triggers:
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+@lru_cache(maxsize=256)
+def translate(sql):
+    """The MySQL dialect of ledger.py's queries, as SQLite understands it."""
+    return sql.replace("%s", "?").replace(" FOR UPDATE", "").replace("INSERT IGNORE", "INSERT OR IGNORE")
+
+def to_sqlite(value):
+    if isinstance(value, Decimal):
+        return float(to_cents(value))
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def from_sqlite(row):
+    return tuple(from_cents(round(v)) if isinstance(v, float) else v for v in row)
+
+class LocalCursor:
+    """A sqlite3 cursor that runs the queries of ledger.py and checkpoints.py unchanged.
+
+    SQLite has no exact decimal type, so amounts are stored as whole cents
+    in REAL columns: Decimal parameters go in as cents, and every float
+    read back (a money column, or a SUM or expression over one) is cents.
+    Integers below 2**53 are exact in a float, so sums and comparisons
+    such as the overdraft check are exact integer arithmetic. The columns
+    are REAL rather than INTEGER so that money can be told apart from
+    counts and ids when it comes back.
+    """
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params=()):
+        self.cursor.execute(translate(sql), [to_sqlite(v) for v in params])
+
+    def executemany(self, sql, rows):
+        self.cursor.executemany(translate(sql), ([to_sqlite(v) for v in row] for row in rows))
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return None if row is None else from_sqlite(row)
+
+    def fetchall(self):
+        return [from_sqlite(row) for row in self.cursor.fetchall()]
+
+    def fetchmany(self, size):
+        return [from_sqlite(row) for row in self.cursor.fetchmany(size)]
+
+    def close(self):
+        self.cursor.close()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+class LocalDatabase:
+    """The replica file, with the read/write interface of db.ConnectionManager.
+
+    Each thread gets its own connection; WAL mode lets readers run while a
+    write is in progress. The schema is created on first use. Cursors are
+    timed into `stats`, which open_service shares with the server's manager.
+    """
+    def __init__(self, path, config=None, stats=None):
+        self.path = local_path(path)
+        self.config = config or {}
+        self.stats = stats or Stats.from_config(self.config)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.ready = False
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None,
+                                   timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            with self.lock:
+                if not self.ready:
+                    create_schema(conn)
+                    self.ready = True
+            self.local.conn = conn
+        return conn
+
+    def run(self, fn, *args, write=False):
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            result = fn(self.stats.cursor(LocalCursor(conn.cursor())), *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    def stream(self, sql, params=(), size=1000):
+        """Yield rows of a query in lists of up to `size`, like ConnectionManager.stream."""
+        cursor = self.stats.cursor(LocalCursor(self.connection().cursor()))
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def read(self, fn, *args):
+        return self.run(fn, *args)
+
+    def write(self, fn, *args):
+        return self.run(fn, *args, write=True)
+
+# === Local Writes ===
+# The ledger.py write paths, run on the replica, plus their outbox entry.
+def enqueue(cursor, kind, account_id, tx_id=None, **fields):
+    cursor.execute("INSERT INTO outbox (kind, account_id, tx_id, fields) VALUES (%s, %s, %s, %s)",
+                   (kind, account_id, tx_id, json.dumps(fields, default=str)))
+
+def is_local(row_id):
+    return row_id is not None and row_id >= LOCAL_ID_BASE
+
+def local_insert_account(cursor, name):
+    acct = insert_account(cursor, name)
+    enqueue(cursor, "add_account", acct[0], name=name)
+    return acct
+
+def local_rename_account(cursor, acct_id, name):
+    acct = rename_account(cursor, acct_id, name)
+    if acct is not None:
+        enqueue(cursor, "rename_account", acct_id, name=name)
+    return acct
+
+def local_remove_account(cursor, acct_id):
+    removed = remove_account(cursor, acct_id)
+    if removed:
+        # Queued writes to the account no longer matter; one never sent needs no delete either
+        cursor.execute("DELETE FROM outbox WHERE account_id=%s", (acct_id,))
+        if not is_local(acct_id):
+            enqueue(cursor, "delete_account", acct_id)
+    return removed
+
+def local_insert_transaction(cursor, account_id, tx_type, amount, date_obj, note):
+    tx, acct = insert_transaction(cursor, account_id, tx_type, amount, date_obj, note)
+    enqueue(cursor, "add_transaction", account_id, tx[0], type=tx_type, amount=amount, date=date_obj, note=note)
+    return tx, acct
+
+def local_update_transaction(cursor, account_id, tx_id, tx_type, amount, date_obj, note):
+    tx, acct = update_transaction(cursor, account_id, tx_id, tx_type, amount, date_obj, note)
+    enqueue(cursor, "update_transaction", account_id, tx_id, type=tx_type, amount=amount, date=date_obj, note=note)
+    return tx, acct
+
+def local_remove_transaction(cursor, account_id, tx_id):
+    acct = remove_transaction(cursor, account_id, tx_id)
+    if is_local(tx_id):
+        cursor.execute("DELETE FROM outbox WHERE tx_id=%s", (tx_id,))
+    else:
+        enqueue(cursor, "delete_transaction", account_id, tx_id)
+    return acct
+
+# === Sync Steps ===
+def next_entry(cursor):
+    cursor.execute("SELECT id, kind, account_id, tx_id, fields FROM outbox ORDER BY id LIMIT 1")
+    return cursor.fetchone()
+
+def sync_counts(cursor):
+    """(queued writes, recorded conflicts)"""
+    cursor.execute("SELECT (SELECT COUNT(*) FROM outbox), (SELECT COUNT(*) FROM sync_conflicts)")
+    return cursor.fetchone()
+
+def load_position(cursor):
+    cursor.execute("SELECT value FROM sync_state WHERE key = 'change_log_position'")
+    row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+def save_position(cursor, position):
+    cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('change_log_position', %s)",
+                   (str(position),))
+
+def move_account(cursor, local_id, server_id):
+    """Give a locally created account the id the server assigned."""
+    cursor.execute("INSERT INTO accounts (id, name, balance, version) "
+                   "SELECT %s, name, balance, version FROM accounts WHERE id=%s", (server_id, local_id))
+    cursor.execute("DELETE FROM accounts WHERE id=%s", (local_id,))
+    for table in ("transactions", "balance_checkpoints", "outbox"):
+        cursor.execute(f"UPDATE {table} SET account_id=%s WHERE account_id=%s", (server_id, local_id))
+
+def move_transaction(cursor, local_id, server_id):
+    """Give a locally created transaction the id the server assigned.
+
+    The local row is kept as it is: edits made after the add are still queued.
+    """
+    cursor.execute("INSERT INTO transactions (id, account_id, type, amount, date, note) "
+                   "SELECT %s, account_id, type, amount, date, note FROM transactions WHERE id=%s",
+                   (server_id, local_id))
+    cursor.execute("DELETE FROM transactions WHERE id=%s", (local_id,))
+    cursor.execute("UPDATE outbox SET tx_id=%s WHERE tx_id=%s", (server_id, local_id))
+
+def accept(cursor, entry_id, kind, account_id, tx_id, result):
+    """The server applied an outbox entry: drop it and adopt the ids it assigned."""
+    cursor.execute("DELETE FROM outbox WHERE id=%s", (entry_id,))
+    withdrawn = cursor.rowcount == 0   # the row was deleted locally while the write was on its way
+    if kind == "add_account":
+        if withdrawn:
+            enqueue(cursor, "delete_account", result[0])
+        else:
+            move_account(cursor, account_id, result[0])
+    elif kind == "add_transaction":
+        tx = result[0]
+        if not withdrawn:
+            move_transaction(cursor, tx_id, tx[0])
+        elif load_account(cursor, account_id) is not None:
+            enqueue(cursor, "delete_transaction", account_id, tx[0])
+
+def reject(cursor, entry_id, description, server_rows):
+    """The server refused an outbox entry: drop it, record why and restore the server's rows."""
+    cursor.execute("DELETE FROM outbox WHERE id=%s", (entry_id,))
+    cursor.execute("INSERT INTO sync_conflicts (description) VALUES (%s)", (description,))
+    apply_remote(cursor, *server_rows)
+
+def shift(cursor, account_id, day, delta):
+    if delta:
+        cursor.execute("UPDATE accounts SET balance = balance + %s WHERE id=%s", (delta, account_id))
+    checkpoints.apply_delta(cursor, account_id, day, delta)
+
+def apply_remote(cursor, accounts, transactions, position=None):
+    """Make the replica match server rows given in changes.poll_changes' format.
+
+    Transaction changes move the local balance and checkpoints by the same
+    amount they moved on the server. Rows with queued local writes are
+    skipped, and so is the balance of an account with any queued write.
+    """
+    cursor.execute("SELECT kind, account_id, tx_id FROM outbox")
+    queued = cursor.fetchall()
+    busy_accounts = {account_id for _, account_id, _ in queued}
+    renamed = {account_id for kind, account_id, _ in queued if kind == "rename_account"}
+    busy_transactions = {tx_id for _, _, tx_id in queued if tx_id is not None}
+    for tx_id, (account_id, row) in transactions.items():
+        if tx_id in busy_transactions:
+            continue
+        cursor.execute("SELECT account_id, type, amount, date, note FROM transactions WHERE id=%s", (tx_id,))
+        old = cursor.fetchone()
+        if old is not None and row is not None and old == (account_id, *row[1:]):
+            continue   # already applied, usually the echo of a write sent from here
+        if old is not None:
+            cursor.execute("DELETE FROM transactions WHERE id=%s", (tx_id,))
+            shift(cursor, old[0], old[3], -checkpoints.signed(old[1], old[2]))
+        if row is not None:
+            cursor.execute("INSERT INTO transactions (id, account_id, type, amount, date, note) "
+                           "VALUES (%s, %s, %s, %s, %s, %s)", (tx_id, account_id, *row[1:]))
+            shift(cursor, account_id, row[3], checkpoints.signed(row[1], row[2]))
+    for account_id, row in accounts.items():
+        if account_id in busy_accounts and row is None:
+            continue
+        cursor.execute("SELECT name, balance FROM accounts WHERE id=%s", (account_id,))
+        local = cursor.fetchone()
+        if row is None:
+            if local is not None:
+                remove_account(cursor, account_id)
+        elif local is None:
+            if account_id not in busy_accounts:   # else deleted here, with the delete still queued
+                cursor.execute("INSERT INTO accounts (id, name, balance) VALUES (%s, %s, %s)", row)
+        else:
+            name = local[0] if account_id in renamed else row[1]
+            balance = local[1] if account_id in busy_accounts else row[2]
+            if (name, balance) != local:
+                cursor.execute("UPDATE accounts SET name=%s, balance=%s WHERE id=%s", (name, balance, account_id))
+    if position is not None:
+        save_position(cursor, position)
+    cursor.execute("DELETE FROM change_log WHERE id <= (SELECT MAX(id) FROM change_log) - %s", (CHANGE_LOG_KEEP,))
+
+# --- First sync ---
+SNAPSHOT_TABLES = {
+    "accounts": "id, name, balance",
+    "balance_checkpoints": "account_id, month, balance",
+    "transactions": "id, account_id, type, amount, date, note",
+}
+
+def read_snapshot(cursor, sink, chunk_size=SNAPSHOT_CHUNK):
+    """Read the server's accounts, checkpoints and transactions from one consistent
+    snapshot, handing them to sink(table, rows) in chunks."""
+    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    try:
+        sink("accounts", load_accounts(cursor))
+        cursor.execute(f"SELECT {SNAPSHOT_TABLES['balance_checkpoints']} FROM balance_checkpoints")
+        sink("balance_checkpoints", cursor.fetchall())
+        last = 0
+        while True:
+            cursor.execute(f"SELECT {SNAPSHOT_TABLES['transactions']} FROM transactions "
+                           "WHERE id > %s ORDER BY id LIMIT %s", (last, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            sink("transactions", rows)
+            last = rows[-1][0]
+    finally:
+        cursor.execute("COMMIT")
+
+def store_snapshot(cursor, table, rows):
+    columns = SNAPSHOT_TABLES[table]
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM change_log")
+    mark = cursor.fetchone()[0]
+    marks = ", ".join(["%s"] * len(columns.split(",")))
+    cursor.executemany(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({marks})", rows)
+    if table == "transactions":
+        # Open views only need the account list; logging every copied row would flood their feed
+        cursor.execute("DELETE FROM change_log WHERE id > %s", (mark,))
+
+# === Replica Service ===
+class ReplicaService(LedgerService):
+    """LedgerService on the local replica, with writes queued for the server.
+
+    Reads and writes touch only the SQLite file, so they never wait on the
+    network. sync() sends the queued writes to `remote` (a LedgerService on
+    MySQL) and pulls the server's changes; start_sync() runs it on a
+    background thread. Statement imports, reports and note search need the
+    full database and go to the server directly.
+    """
+    def __init__(self, local, remote):
+        super().__init__(local, LedgerCache(max_bytes=0))   # the replica is as fast as a cache would be
+        self.remote = remote
+        self.remote_feed = changes.ChangeFeed()
+        self.sync_lock = threading.Lock()
+        self.worker = None
+        self.migrated = False
+        self.last_error = None
+        self.queued = self.conflicts = 0
+
+    def migrate(self, log=None):
+        # The replica's schema is created when it is opened; sync() migrates the server
+        return []
+
+    # --- Local writes ---
+    def add_account(self, name):
+        return self.queued_write(local_insert_account, self.check_name(name))
+
+    def rename_account(self, acct_id, name):
+        acct = self.queued_write(local_rename_account, acct_id, self.check_name(name))
+        if acct is None:
+            raise NotFoundError(f"Account {acct_id} does not exist.")
+        return acct
+
+    def delete_account(self, acct_id, progress=None):
+        # The replica's copy is deleted in one go; the server chunks the sync
+        if not self.queued_write(local_remove_account, acct_id):
+            raise NotFoundError(f"Account {acct_id} does not exist.")
+
+    def add_transaction(self, account_id, tx_type, amount, date_obj, note=""):
+        amount = self.check_transaction(tx_type, amount)
+        return self.queued_write(local_insert_transaction, account_id, tx_type, amount, date_obj, note)
+
+    def update_transaction(self, account_id, tx_id, tx_type, amount, date_obj, note=""):
+        amount = self.check_transaction(tx_type, amount)
+        return self.queued_write(local_update_transaction, account_id, tx_id, tx_type, amount, date_obj, note)
+
+    def delete_transaction(self, account_id, tx_id):
+        return self.queued_write(local_remove_transaction, account_id, tx_id)
+
+    def queued_write(self, fn, *args):
+        result = self.db.write(fn, *args)
+        self.queued += 1
+        if self.worker is not None:
+            self.worker.wake()
+        return result
+
+    # --- Server only ---
+    def import_statement(self, path, account_id=None, progress=None):
+        return self.remote.import_statement(path, account_id, progress)
+
+    def search(self, *args, **kwargs):
+        return self.remote.search(*args, **kwargs)
+
+    def report(self, *args, **kwargs):
+        return self.remote.report(*args, **kwargs)
+
+    # --- Sync ---
+    def sync(self):
+        """Send the queued writes to the server, then pull its changes."""
+        with self.sync_lock:
+            try:
+                if not self.migrated:
+                    self.remote.migrate()
+                    self.migrated = True
+                if self.remote_feed.high is None:
+                    self.remote_feed.high = self.db.read(load_position)
+                if self.remote_feed.high is None:
+                    self.snapshot()
+                self.push()
+                self.pull()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                raise
+            finally:
+                self.queued, self.conflicts = self.db.read(sync_counts)
+
+    def snapshot(self):
+        """First sync: copy the whole ledger from the server."""
+        feed = changes.ChangeFeed()
+        self.remote.db.read(feed.poll)   # follow changes from before the copy, so none are missed
+        self.remote.db.read(read_snapshot, lambda table, rows: self.db.write(store_snapshot, table, rows))
+        self.db.write(save_position, feed.high)
+        self.remote_feed = feed
+
+    def push(self):
+        while True:
+            entry = self.db.read(next_entry)
+            if entry is None:
+                return
+            entry_id, kind, account_id, tx_id, fields = entry
+            try:
+                result = self.send(kind, account_id, tx_id, json.loads(fields))
+            except (NotFoundError, OverdraftError, ValueError) as e:
+                target = f"account {account_id}" + (f", transaction {tx_id}" if tx_id is not None else "")
+                self.db.write(reject, entry_id, f"{kind.replace('_', ' ')} ({target}): {e}",
+                              self.server_rows(account_id, tx_id))
+                continue
+            self.db.write(accept, entry_id, kind, account_id, tx_id, result)
+
+    def send(self, kind, account_id, tx_id, fields):
+        """Apply one outbox entry on the server; returns what the LedgerService method returned."""
+        remote = self.remote
+        if kind == "add_account":
+            return remote.add_account(fields["name"])
+        if is_local(account_id) or (kind != "add_transaction" and is_local(tx_id)):
+            # Its own creation was rejected earlier
+            raise NotFoundError("It was never saved on the server.")
+        if kind == "rename_account":
+            return remote.rename_account(account_id, fields["name"])
+        if kind == "delete_account":
+            return remote.delete_account(account_id)
+        if kind == "delete_transaction":
+            return remote.delete_transaction(account_id, tx_id)
+        args = (fields["type"], Decimal(fields["amount"]), date.fromisoformat(fields["date"]), fields["note"])
+        if kind == "add_transaction":
+            return remote.add_transaction(account_id, *args)
+        return remote.update_transaction(account_id, tx_id, *args)
+
+    def server_rows(self, account_id, tx_id):
+        """The server's current rows for an account and transaction, None where missing."""
+        tx_accounts = {tx_id: account_id} if tx_id is not None and not is_local(tx_id) else {}
+        accounts, transactions = self.remote.db.read(
+            changes.load_rows, [] if is_local(account_id) else [account_id], tx_accounts)
+        accounts.setdefault(account_id, None)
+        if tx_id is not None:
+            transactions.setdefault(tx_id, (account_id, None))
+        return accounts, transactions
+
+    def pull(self):
+        while True:
+            high, missing = self.remote_feed.high, dict(self.remote_feed.missing)
+            try:
+                accounts, transactions = self.remote.db.read(changes.poll_changes, self.remote_feed)
+                if not accounts and not transactions:
+                    return
+                self.db.write(apply_remote, accounts, transactions, self.remote_feed.high)
+            except Exception:
+                self.remote_feed.high, self.remote_feed.missing = high, missing
+                raise
+
+    def start_sync(self, interval):
+        self.worker = SyncWorker(self, interval)
+        self.worker.start()
+
+    def stop_sync(self):
+        if self.worker is not None:
+            self.worker.stop()
+
+    def sync_status(self):
+        """One line for the GUI: whether the server answers and what is waiting."""
+        parts = []
+        if self.last_error is not None:
+            parts.append("Offline")
+        if self.queued:
+            parts.append(f"{self.queued} change(s) waiting to sync")
+        if self.conflicts:
+            parts.append(f"{self.conflicts} change(s) rejected by the server (python replica.py conflicts)")
+        return "; ".join(parts)
+
+class SyncWorker:
+    """Runs service.sync() every `interval` seconds on a background thread, and
+    right after local writes; backs off while the server is unreachable."""
+    def __init__(self, service, interval):
+        self.service = service
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = threading.Thread(target=self.run, name="replica-sync", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self):
+        # Queued writes are safe in the outbox; they go out with the next start
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join(timeout=5)
+
+    def run(self):
+        delay = 0
+        while True:
+            self.wakeup.wait(delay)
+            self.wakeup.clear()
+            if self.stopping:
+                return
+            try:
+                self.service.sync()
+                delay = self.interval
+            except Exception:
+                delay = min(max(delay, self.interval) * 2, MAX_SYNC_DELAY)
+
+def open_service(db):
+    """ReplicaService on the replica named by DB_REPLICA_PATH, syncing with `db`."""
+    return ReplicaService(LocalDatabase(db.config["DB_REPLICA_PATH"], db.config, db.stats), LedgerService(db))
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Sync or inspect the local replica (DB_REPLICA_PATH).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("sync", help="send queued writes and pull the server's changes now")
+    sub.add_parser("status", help="count queued writes and conflicts")
+    shown = sub.add_parser("conflicts", help="list writes the server rejected")
+    shown.add_argument("--clear", action="store_true", help="forget them after listing")
+    args = parser.parse_args()
+    db = ConnectionManager()
+    if not db.config["DB_REPLICA_PATH"]:
+        parser.error("DB_REPLICA_PATH is not set in config.env.")
+    service = open_service(db)
+    if args.command == "sync":
+        service.sync()
+    elif args.command == "conflicts":
+        def conflicts(cursor):
+            cursor.execute("SELECT happened_at, description FROM sync_conflicts ORDER BY id")
+            rows = cursor.fetchall()
+            if args.clear:
+                cursor.execute("DELETE FROM sync_conflicts")
+            return rows
+        for happened_at, description in service.db.write(conflicts):
+            print(happened_at, description)
+    queued, conflicts = service.db.read(sync_counts)
+    print(f"{queued} write(s) waiting to sync, {conflicts} conflict(s) recorded.")
@@ -0,0 +1,221 @@
+import re
+from datetime import date
+from decimal import Decimal
+from money import from_cents
+
+# === Reports ===
+# Deposit and withdrawal totals per account and month (or year), and per
+# note keyword. Month and year totals are a GROUP BY in MySQL, answered
+# from the (account_id, date, type, amount) index of migration 002, so only
+# the summary rows cross the network. Keyword totals cannot be grouped in
+# SQL, so the matching transactions are loaded once into NumPy column
+# arrays (TransactionColumns) and aggregated there; the same arrays also
+# answer month and year reports without another round trip.
+#
+# Report rows are (group, account id, deposits, withdrawals, count), where
+# group is the first day of the month, the year, or the keyword, and the
+# account id is None for keyword rows. Totals are Decimals.
+GROUPS = ("month", "year", "keyword")
+CHUNK_SIZE = 50000
+KEYWORD_MIN_LENGTH = 3
+WORD = re.compile(r"[^\W_]+")
+EPOCH = date(1970, 1, 1)
+ACCOUNT_SPAN = 2 ** 32   # (period, account id) pairs are packed into one int64 sort key
+
+def date_range(year=None, start=None, end=None):
+    """(start, end) dates of a report: a whole year, or the given bounds."""
+    if year is not None:
+        return date(year, 1, 1), date(year, 12, 31)
+    return start, end
+
+def filters(account_id=None, start=None, end=None):
+    where, params = [], []
+    if account_id is not None:
+        where.append("account_id=%s")
+        params.append(account_id)
+    if start is not None:
+        where.append("date >= %s")
+        params.append(start)
+    if end is not None:
+        where.append("date <= %s")
+        params.append(end)
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def keywords(note):
+    """The distinct lower-case words of a note that count as keywords."""
+    return {w for w in WORD.findall((note or "").lower()) if len(w) >= KEYWORD_MIN_LENGTH}
+
+# --- In MySQL ---
+def grouped_totals_query(group="month", account_id=None, start=None, end=None):
+    """SQL and parameters of grouped_totals."""
+    if group not in ("month", "year"):
+        raise ValueError(f"The database can only group by month or year, not {group!r}.")
+    period = "YEAR(date)" if group == "year" else "YEAR(date), MONTH(date)"
+    where, params = filters(account_id, start, end)
+    sql = (f"SELECT account_id, {period}, "
+           "SUM(CASE WHEN type = 'Deposit' THEN amount ELSE 0 END), "
+           "SUM(CASE WHEN type = 'Withdrawal' THEN amount ELSE 0 END), COUNT(*) "
+           f"FROM transactions{where} GROUP BY account_id, {period} ORDER BY {period}, account_id")
+    return sql, params
+
+def grouped_totals(cursor, group="month", account_id=None, start=None, end=None):
+    """Month or year report computed by the database."""
+    cursor.execute(*grouped_totals_query(group, account_id, start, end))
+    if group == "year":
+        return [(year, acct_id, Decimal(dep), Decimal(wd), n) for acct_id, year, dep, wd, n in cursor.fetchall()]
+    return [(date(year, month, 1), acct_id, Decimal(dep), Decimal(wd), n)
+            for acct_id, year, month, dep, wd, n in cursor.fetchall()]
+
+# --- In NumPy ---
+def require_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("This report needs numpy (pip install numpy).")
+    return numpy
+
+class TransactionColumns:
+    """Transactions held as NumPy arrays, one per column, for fast repeated reports.
+
+    account_ids, amounts (whole cents), days (since 1970-01-01) and
+    deposits (bool) have one entry per transaction. Keywords are kept as
+    (row, word) pairs: word_rows[i] holds a keyword_ids[i] word of
+    vocabulary. Load with TransactionColumns.load(db, ...).
+    """
+    def __init__(self, account_ids, amounts, days, deposits, word_rows, keyword_ids, vocabulary):
+        np = require_numpy()
+        self.np = np
+        self.account_ids = account_ids
+        self.amounts = amounts
+        self.days = days
+        self.deposits = deposits
+        self.months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)  # since 1970-01
+        self.word_rows = word_rows
+        self.keyword_ids = keyword_ids
+        self.vocabulary = vocabulary
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def load(cls, db, account_id=None, start=None, end=None, chunk_size=CHUNK_SIZE):
+        """Stream the matching transactions from the database into columns."""
+        np = require_numpy()
+        where, params = filters(account_id, start, end)
+        sql = ("SELECT account_id, CAST(amount * 100 AS SIGNED), type = 'Deposit', "
+               f"DATEDIFF(date, '1970-01-01'), note FROM transactions{where}")
+        columns = ([], [], [], [])
+        word_rows, keyword_ids, index = [], [], {}
+        row = 0
+        chunks = db.stream(sql, params, chunk_size)
+        try:
+            for rows in chunks:
+                acct, amount, deposit, day, notes = zip(*rows)
+                for column, values in zip(columns, (acct, amount, deposit, day)):
+                    column.append(values)
+                for note in notes:
+                    for word in keywords(note):
+                        word_rows.append(row)
+                        keyword_ids.append(index.setdefault(word, len(index)))
+                    row += 1
+        finally:
+            chunks.close()
+
+        def array(parts, dtype):
+            return np.fromiter((v for part in parts for v in part), dtype=dtype, count=row)
+        return cls(array(columns[0], np.int32), array(columns[1], np.int64), array(columns[3], np.int32),
+                   array(columns[2], bool), np.array(word_rows, dtype=np.int64),
+                   np.array(keyword_ids, dtype=np.int32), list(index))
+
+    def selection(self, account_id=None, start=None, end=None):
+        """Boolean mask of the rows matching the filters."""
+        mask = self.np.ones(len(self), dtype=bool)
+        if account_id is not None:
+            mask &= self.account_ids == account_id
+        if start is not None:
+            mask &= self.days >= (start - EPOCH).days
+        if end is not None:
+            mask &= self.days <= (end - EPOCH).days
+        return mask
+
+    def sums(self, groups, amounts, deposits):
+        """Per distinct value of `groups`: (values, deposits, withdrawals, counts) in whole cents."""
+        np = self.np
+        order = np.argsort(groups, kind="stable")
+        groups = groups[order]
+        if not len(groups):
+            return groups, amounts, amounts, amounts
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        deposited = np.where(deposits, amounts, 0)[order]
+        withdrawn = np.where(deposits, 0, amounts)[order]
+        counts = np.diff(np.r_[starts, len(groups)])
+        return (groups[starts], np.add.reduceat(deposited, starts),
+                np.add.reduceat(withdrawn, starts), counts)
+
+    def totals(self, group="month", account_id=None, start=None, end=None, limit=None):
+        """The same report as grouped_totals (or by keyword), computed from the columns.
+
+        Keyword rows are sorted by the number of transactions, most first,
+        and cut to `limit`.
+        """
+        np = self.np
+        mask = self.selection(account_id, start, end)
+        if group == "keyword":
+            pairs = mask[self.word_rows]
+            tx_rows = self.word_rows[pairs]
+            ids, dep, wd, n = self.sums(self.keyword_ids[pairs], self.amounts[tx_rows], self.deposits[tx_rows])
+            top = np.argsort(-n, kind="stable")[:limit]
+            return [(self.vocabulary[ids[i]], None, from_cents(dep[i]), from_cents(wd[i]), int(n[i])) for i in top]
+        if group not in GROUPS:
+            raise ValueError(f"Unknown report grouping: {group!r}")
+        periods = self.months if group == "month" else self.months // 12
+        keys = periods[mask].astype(np.int64) * ACCOUNT_SPAN + self.account_ids[mask]
+        keys, dep, wd, n = self.sums(keys, self.amounts[mask], self.deposits[mask])
+        rows = []
+        for key, d, w, c in zip(keys.tolist(), dep, wd, n):
+            period, acct_id = divmod(key, ACCOUNT_SPAN)
+            label = date(1970 + period // 12, period % 12 + 1, 1) if group == "month" else 1970 + period
+            rows.append((label, acct_id, from_cents(d), from_cents(w), int(c)))
+        return rows
+
+def report(db, group="month", account_id=None, year=None, start=None, end=None, limit=None):
+    """Run a report the cheapest way: month and year in SQL, keywords in NumPy."""
+    start, end = date_range(year, start, end)
+    if group == "keyword":
+        columns = TransactionColumns.load(db, account_id, start, end)
+        return columns.totals(group, limit=limit)
+    return db.read(grouped_totals, group, account_id, start, end)
+
+def format_row(row):
+    group, acct_id, deposits, withdrawals, count = row
+    return (str(group), "" if acct_id is None else acct_id,
+            f"{deposits:.2f}", f"{withdrawals:.2f}", f"{deposits - withdrawals:.2f}", count)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Print deposit and withdrawal totals.")
+    parser.add_argument("group", choices=GROUPS, help="group by month, year or note keyword")
+    parser.add_argument("--account", type=int, help="only this account id")
+    parser.add_argument("--year", type=int, help="only this year")
+    parser.add_argument("--top", type=int, default=30, help="keywords to show (default 30)")
+    parser.add_argument("--numpy", action="store_true",
+                        help="load the transactions and aggregate in NumPy, also for month and year")
+    args = parser.parse_args()
+    db = ConnectionManager()
+    started = time.perf_counter()
+    if args.numpy or args.group == "keyword":
+        columns = TransactionColumns.load(db, args.account, *date_range(args.year))
+        loaded = time.perf_counter()
+        rows = columns.totals(args.group, limit=args.top)
+        timing = (f"loaded {len(columns)} transactions in {loaded - started:.2f}s, "
+                  f"aggregated in {time.perf_counter() - loaded:.3f}s")
+    else:
+        rows = report(db, args.group, args.account, args.year)
+        timing = f"in {time.perf_counter() - started:.2f}s"
+    print(f"{args.group:<12} {'account':>7} {'deposits':>14} {'withdrawals':>14} {'net':>14} {'count':>8}")
+    for group, acct_id, deposits, withdrawals, net, count in map(format_row, rows):
+        print(f"{group:<12} {acct_id:>7} {deposits:>14} {withdrawals:>14} {net:>14} {count:>8}")
+    print(f"{len(rows)} rows {timing}")
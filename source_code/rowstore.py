@@ -0,0 +1,127 @@
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+import checkpoints
+from money import format_cents, from_cents, to_cents
+
+# === Transaction Row Store ===
+# The rows a transactions window has loaded, one compact array per column
+# instead of a tuple of Python objects per row: ids, amounts and running
+# balances as 64-bit ints (amounts and balances in cents), dates as day
+# ordinals, the type as one byte, and notes as interned strings, so rows
+# with the same note share one string. A row costs under 50 bytes instead
+# of the ~500 of a tuple of Decimals, a date and a (date, id) key.
+#
+# Rows are kept in (date, id) order, the order the ledger pages them in.
+# `keys` packs each (date, id) pair into one int, so positions are found by
+# bisect. Treeview values are formatted from the columns when a row is
+# shown, and orders by other columns are computed from them, so re-sorting
+# the loaded rows never goes back to the database. The standard array
+# module is enough for a window of rows and keeps NumPy optional.
+ID_OFFSET = 2 ** 33   # ids from -2**33 (queued rows) to 2**33 (replica-local ids) pack into a key
+DAY_SHIFT = 34
+SORT_COLUMNS = ("Type", "Amount", "Date", "Note", "Balance")
+
+def pack(key):
+    """One int that sorts like the (date, id) key."""
+    day, tx_id = key
+    return (day.toordinal() << DAY_SHIFT) + tx_id + ID_OFFSET
+
+class TransactionStore:
+    """Loaded (id, type, amount, date, note) rows and their running balances, in (date, id) order."""
+    def __init__(self):
+        self.keys = array("q")
+        self.ids = array("q")
+        self.cents = array("q")       # amounts, always positive
+        self.days = array("i")        # date.toordinal()
+        self.deposits = bytearray()   # 1 for a deposit, 0 for a withdrawal
+        self.notes = []
+        self.balances = array("q")    # running balance after the row, in cents
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, tx_id):
+        """Index of a transaction, or None if it is not loaded."""
+        try:
+            return self.ids.index(tx_id)
+        except ValueError:
+            return None
+
+    def position(self, key, after=False):
+        """Index where the (date, id) `key` is or would go (after it, with after=True)."""
+        return (bisect_right if after else bisect_left)(self.keys, pack(key))
+
+    def key(self, i):
+        return date.fromordinal(self.days[i]), self.ids[i]
+
+    def signed(self, i):
+        return self.cents[i] if self.deposits[i] else -self.cents[i]
+
+    def row(self, i):
+        """The row as the ledger returns it: (id, type, amount, date, note)."""
+        return (self.ids[i], "Deposit" if self.deposits[i] else "Withdrawal",
+                from_cents(self.cents[i]), date.fromordinal(self.days[i]), self.notes[i])
+
+    def format(self, i):
+        """Treeview values: type, amount, date, note, balance, id."""
+        return ("Deposit" if self.deposits[i] else "Withdrawal", format_cents(self.cents[i]),
+                date.fromordinal(self.days[i]), self.notes[i], format_cents(self.balances[i]), self.ids[i])
+
+    # --- Changing rows ---
+    def insert(self, i, rows, opening):
+        """Insert (id, type, amount, date, note) rows at index i, with running
+        balances starting from `opening` cents; returns the last balance."""
+        balances = array("q")
+        for _, tx_type, amount, _, _ in rows:
+            opening += checkpoints.signed(tx_type, to_cents(amount))
+            balances.append(opening)
+        self.keys[i:i] = array("q", [pack((row[3], row[0])) for row in rows])
+        self.ids[i:i] = array("q", [row[0] for row in rows])
+        self.cents[i:i] = array("q", [to_cents(row[2]) for row in rows])
+        self.days[i:i] = array("i", [row[3].toordinal() for row in rows])
+        self.deposits[i:i] = bytes(row[1] == "Deposit" for row in rows)
+        self.notes[i:i] = [sys.intern(row[4]) if row[4] else row[4] for row in rows]
+        self.balances[i:i] = balances
+        return opening
+
+    def update(self, i, row, balance):
+        """Replace row i by a row with the same (date, id) key."""
+        _, tx_type, amount, _, note = row
+        self.cents[i] = to_cents(amount)
+        self.deposits[i] = tx_type == "Deposit"
+        self.notes[i] = sys.intern(note) if note else note
+        self.balances[i] = balance
+
+    def delete(self, start, stop):
+        for column in (self.keys, self.ids, self.cents, self.days, self.deposits, self.notes, self.balances):
+            del column[start:stop]
+
+    def rebalance(self, start, balance):
+        """Recompute running balances from row `start` on, `balance` being the
+        one before it; returns the indices that changed.
+
+        Stops at the first row whose balance is already right, since every
+        row after it is too.
+        """
+        changed = []
+        for i in range(start, len(self)):
+            balance += self.signed(i)
+            if balance == self.balances[i]:
+                break
+            self.balances[i] = balance
+            changed.append(i)
+        return changed
+
+    # --- Sorting ---
+    def order(self, column, reverse=False):
+        """Row indices sorted by a display column; ties keep (date, id) order."""
+        values = {
+            "Type": [not deposit for deposit in self.deposits],   # Deposit first, as the text sorts
+            "Amount": self.cents,
+            "Date": self.keys,
+            "Note": [(note or "").casefold() for note in self.notes],
+            "Balance": self.balances,
+        }[column]
+        return sorted(range(len(self)), key=values.__getitem__, reverse=reverse)
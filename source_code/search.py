@@ -0,0 +1,53 @@
+import re
+
+# === Note Search ===
+# Finds transactions by the words of their note through the FULLTEXT index
+# of migration 006, optionally narrowed by account, amount range and date
+# range. Every word of the query must appear, as a word or the start of one,
+# so "groc super" finds "Groceries at SuperMart". InnoDB only indexes words
+# of at least innodb_ft_min_token_size (3) characters; shorter words are
+# checked with LIKE on the rows the other conditions found. Results come
+# newest first in keyset pages on (date, id), so a further page is another
+# bounded query rather than an ever-growing OFFSET.
+PAGE_SIZE = 200
+MIN_TOKEN_SIZE = 3
+WORD = re.compile(r"[^\W_]+")   # also strips boolean-mode operators and LIKE wildcards
+
+def parse_query(text):
+    """Split search text into a boolean-mode FULLTEXT query and LIKE patterns for short words."""
+    words = WORD.findall((text or "").lower())
+    match = " ".join(f"+{w}*" for w in words if len(w) >= MIN_TOKEN_SIZE)
+    return match, [f"%{w}%" for w in words if len(w) < MIN_TOKEN_SIZE]
+
+def search_query(text="", account_id=None, min_amount=None, max_amount=None,
+                 start=None, end=None, before=None, limit=PAGE_SIZE):
+    """SQL and parameters of search_transactions."""
+    match, patterns = parse_query(text)
+    where, params = [], []
+    if match:
+        where.append("MATCH(note) AGAINST (%s IN BOOLEAN MODE)")
+        params.append(match)
+    for pattern in patterns:
+        where.append("note LIKE %s")
+        params.append(pattern)
+    for condition, value in (("account_id = %s", account_id), ("amount >= %s", min_amount),
+                             ("amount <= %s", max_amount), ("date >= %s", start), ("date <= %s", end)):
+        if value is not None:
+            where.append(condition)
+            params.append(value)
+    if before is not None:
+        where.append("(date < %s OR (date = %s AND id < %s))")
+        params += [before[0], before[0], before[1]]
+    sql = "SELECT id, account_id, type, amount, date, note FROM transactions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + " ORDER BY date DESC, id DESC LIMIT %s", params + [limit]
+
+def search_transactions(cursor, text="", account_id=None, min_amount=None, max_amount=None,
+                        start=None, end=None, before=None, limit=PAGE_SIZE):
+    """One page of matching (id, account id, type, amount, date, note) rows, newest first.
+
+    `before` is the (date, id) key of the last row of the previous page.
+    """
+    cursor.execute(*search_query(text, account_id, min_amount, max_amount, start, end, before, limit))
+    return cursor.fetchall()
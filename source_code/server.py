@@ -0,0 +1,212 @@
+import json
+import re
+from datetime import datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import money
+from ledger import PAGE_SIZE, LedgerService, NotFoundError, OverdraftError
+
+# === Ledger HTTP API ===
+# A local JSON API over LedgerService, for scripts and load tests that
+# should not need the Tk GUI. Each request runs on its own thread and takes
+# a pooled connection for the duration of one service call.
+#
+#   GET    /accounts                              list accounts
+#   POST   /accounts                {"name"}      add an account
+#   GET    /accounts/ID                           one account
+#   PUT    /accounts/ID             {"name"}      rename
+#   DELETE /accounts/ID                           delete with its transactions
+#   GET    /accounts/ID/balance?date=YYYY-MM-DD   balance at the end of a date
+#   GET    /accounts/ID/transactions?after=DATE,ID&before=DATE,ID&limit=N
+#   POST   /accounts/ID/transactions            {"type", "amount", "date", "note"}
+#   PUT    /accounts/ID/transactions/TX         same body as POST
+#   DELETE /accounts/ID/transactions/TX
+#   GET    /transactions/search?q=WORDS&account=ID&min=AMOUNT&max=AMOUNT&from=DATE&to=DATE&before=DATE,ID&limit=N
+#
+# Amounts are sent and returned as decimal strings ("12.50") so no cents are
+# lost to floating point.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_PAGE_SIZE = 1000
+
+def account_json(acct):
+    acct_id, name, balance = acct
+    return {"id": acct_id, "name": name, "balance": f"{balance:.2f}"}
+
+def transaction_json(tx):
+    tx_id, tx_type, amount, date_obj, note = tx
+    return {"id": tx_id, "type": tx_type, "amount": f"{amount:.2f}", "date": date_obj.isoformat(), "note": note}
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"date must be YYYY-MM-DD, not {value!r}")
+
+def parse_amount(value):
+    try:
+        return money.parse_amount(value)
+    except ValueError:
+        raise ValueError(f"invalid amount {value!r}")
+
+def parse_key(value):
+    """A keyset cursor "YYYY-MM-DD,ID" as a (date, id) tuple."""
+    date_str, _, tx_id = (value or "").partition(",")
+    if not tx_id.isdigit():
+        raise ValueError(f"cursor must be YYYY-MM-DD,ID, not {value!r}")
+    return parse_date(date_str), int(tx_id)
+
+def parse_limit(query):
+    """The page size asked for with ?limit=N, capped at MAX_PAGE_SIZE."""
+    value = query.get("limit", [PAGE_SIZE])[0]
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"limit must be a whole number, not {value!r}")
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, not {limit}")
+    return min(limit, MAX_PAGE_SIZE)
+
+def transaction_fields(body):
+    return (body.get("type"), parse_amount(body.get("amount")), parse_date(body.get("date")),
+            str(body.get("note") or "")[:255])
+
+# --- Routes: (method, path pattern, handler(service, match, query, body)) ---
+def list_transactions(service, account_id, query):
+    after = parse_key(query["after"][0]) if "after" in query else None
+    before = parse_key(query["before"][0]) if "before" in query else None
+    limit = parse_limit(query)
+    service.account(account_id)  # 404 rather than an empty list for a missing account
+    return [transaction_json(tx) for tx in service.transactions(account_id, after, before, limit)]
+
+def search_transactions(service, query):
+    def arg(name, parse):
+        return parse(query[name][0]) if name in query else None
+    limit = parse_limit(query)
+    rows = service.search(query.get("q", [""])[0], arg("account", int), arg("min", parse_amount),
+                          arg("max", parse_amount), arg("from", parse_date), arg("to", parse_date),
+                          arg("before", parse_key), limit)
+    return [dict(transaction_json((tx_id, *rest)), account_id=acct_id) for tx_id, acct_id, *rest in rows]
+
+def account_balance(service, account_id, query):
+    as_of = parse_date(query.get("date", [""])[0])
+    service.account(account_id)
+    return {"date": as_of.isoformat(), "balance": f"{service.balance_at(account_id, as_of):.2f}"}
+
+def saved_json(result):
+    tx, acct = result
+    return {"transaction": transaction_json(tx), "account": account_json(acct)}
+
+ROUTES = [
+    ("GET", r"/accounts", lambda s, m, q, b: [account_json(a) for a in s.accounts()]),
+    ("POST", r"/accounts", lambda s, m, q, b: account_json(s.add_account(b.get("name")))),
+    ("GET", r"/accounts/(\d+)", lambda s, m, q, b: account_json(s.account(int(m[1])))),
+    ("PUT", r"/accounts/(\d+)", lambda s, m, q, b: account_json(s.rename_account(int(m[1]), b.get("name")))),
+    ("DELETE", r"/accounts/(\d+)", lambda s, m, q, b: s.delete_account(int(m[1]))),
+    ("GET", r"/accounts/(\d+)/balance", lambda s, m, q, b: account_balance(s, int(m[1]), q)),
+    ("GET", r"/accounts/(\d+)/transactions", lambda s, m, q, b: list_transactions(s, int(m[1]), q)),
+    ("POST", r"/accounts/(\d+)/transactions",
+     lambda s, m, q, b: saved_json(s.add_transaction(int(m[1]), *transaction_fields(b)))),
+    ("PUT", r"/accounts/(\d+)/transactions/(\d+)",
+     lambda s, m, q, b: saved_json(s.update_transaction(int(m[1]), int(m[2]), *transaction_fields(b)))),
+    ("DELETE", r"/accounts/(\d+)/transactions/(\d+)",
+     lambda s, m, q, b: {"account": account_json(s.delete_transaction(int(m[1]), int(m[2])))}),
+    ("GET", r"/transactions/search", lambda s, m, q, b: search_transactions(s, q)),
+]
+ROUTES = [(method, re.compile(pattern + r"/?$"), handler) for method, pattern, handler in ROUTES]
+
+class LedgerRequestHandler(BaseHTTPRequestHandler):
+    service = None  # set by make_server
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        allowed = False
+        for route_method, pattern, handler in ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            allowed = True
+            if route_method == method:
+                break
+        else:
+            if allowed:
+                return self.send_json(405, {"error": f"{method} not allowed on {url.path}"})
+            return self.send_json(404, {"error": f"no route for {url.path}"})
+        try:
+            body = self.read_body()
+            result = handler(self.service, match, parse_qs(url.query), body)
+        except NotFoundError as e:
+            return self.send_json(404, {"error": str(e)})
+        except OverdraftError as e:
+            return self.send_json(409, {"error": str(e)})
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.log_error("%s %s failed: %r", method, url.path, e)
+            return self.send_json(500, {"error": str(e)})
+        if result is None:
+            return self.send_json(204, None)
+        self.send_json(201 if method == "POST" else 200, result)
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length), parse_float=Decimal)   # exact amounts, no float
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON body: {e}")
+        if not isinstance(body, dict):
+            raise ValueError("JSON body must be an object")
+        return body
+
+    def send_json(self, code, payload):
+        data = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    handler = type("Handler", (LedgerRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    import argparse
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Serve the ledger as a local JSON API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--skip-migrations", action="store_true", help="do not apply pending schema migrations")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    args = parser.parse_args()
+    service = LedgerService(ConnectionManager())
+    if not args.skip_migrations:
+        service.migrate(print)
+    server = make_server(service, args.host, args.port)
+    if args.quiet:
+        server.RequestHandlerClass.log_message = lambda self, *a: None
+    print(f"Serving the ledger on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+import checkpoints
+from ledger import LedgerService, NotFoundError, OverdraftError
+
+# === Concurrency Stress Check ===
+# Hammers a few scratch accounts from many threads with random deposits,
+# withdrawals, edits and deletes through LedgerService, then checks that
+# every balance equals the sum of its transactions and that the monthly
+# checkpoints match a rebuild. Point it at a scratch database; the accounts it creates are
+# deleted afterwards unless --keep is given.
+START_DATE = date(2024, 1, 1)
+
+def balance_drift(cursor, account_ids):
+    """Return [(account id, stored balance, sum of transactions)] for accounts that disagree."""
+    marks = ", ".join(["%s"] * len(account_ids))
+    cursor.execute(
+        "SELECT a.id, a.balance, COALESCE(SUM(CASE WHEN t.type = 'Deposit' THEN t.amount ELSE -t.amount END), 0) "
+        f"FROM accounts a LEFT JOIN transactions t ON t.account_id = a.id WHERE a.id IN ({marks}) "
+        "GROUP BY a.id, a.balance",
+        list(account_ids)
+    )
+    return [(acct_id, balance, Decimal(total)) for acct_id, balance, total in cursor.fetchall()
+            if balance != Decimal(total)]
+
+class Stress:
+    """Shared state of one run: the accounts, the transaction ids written so far and counters."""
+    def __init__(self, service, account_ids, seed=None):
+        self.service = service
+        self.account_ids = account_ids
+        self.seed = seed
+        self.lock = threading.Lock()
+        self.tx_ids = {acct_id: [] for acct_id in account_ids}
+        self.counts = {"insert": 0, "update": 0, "delete": 0, "overdraft": 0, "gone": 0, "error": 0}
+        self.errors = []
+
+    def count(self, key, error=None):
+        with self.lock:
+            self.counts[key] += 1
+            if error is not None and len(self.errors) < 10:
+                self.errors.append(repr(error))
+
+    def pick(self, rng, acct_id, remove=False):
+        with self.lock:
+            ids = self.tx_ids[acct_id]
+            if not ids:
+                return None
+            pos = rng.randrange(len(ids))
+            return ids.pop(pos) if remove else ids[pos]
+
+    def one_op(self, rng):
+        acct_id = rng.choice(self.account_ids)
+        tx_type = rng.choice(("Deposit", "Deposit", "Withdrawal", "Withdrawal"))
+        amount = Decimal(rng.randint(1, 5000)) / 100
+        day = START_DATE + timedelta(days=rng.randint(0, 730))
+        r = rng.random()
+        if r < 0.6:
+            tx, _ = self.service.add_transaction(acct_id, tx_type, amount, day, "stress")
+            with self.lock:
+                self.tx_ids[acct_id].append(tx[0])
+            return "insert"
+        if r < 0.85:
+            tx_id = self.pick(rng, acct_id)
+            if tx_id is not None:
+                self.service.update_transaction(acct_id, tx_id, tx_type, amount, day, "stress edit")
+                return "update"
+        else:
+            tx_id = self.pick(rng, acct_id, remove=True)
+            if tx_id is not None:
+                self.service.delete_transaction(acct_id, tx_id)
+                return "delete"
+        return None
+
+    def worker(self, n, ops):
+        rng = random.Random(None if self.seed is None else self.seed + n)
+        for _ in range(ops):
+            try:
+                done = self.one_op(rng)
+                if done:
+                    self.count(done)
+            except OverdraftError:
+                self.count("overdraft")
+            except NotFoundError:
+                self.count("gone")  # edited a row another thread just deleted
+            except Exception as e:
+                self.count("error", e)
+
+    def run(self, threads, ops):
+        workers = [threading.Thread(target=self.worker, args=(n, ops)) for n in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        return time.perf_counter() - started
+
+    def problems(self):
+        found = [f"account {acct_id}: balance {balance} but transactions sum to {total}"
+                 for acct_id, balance, total in self.service.db.read(balance_drift, self.account_ids)]
+        prefixes = tuple(f"account {acct_id} " for acct_id in self.account_ids)
+        found += [p for p in self.service.db.read(checkpoints.verify) if p.startswith(prefixes)]
+        return found
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from db import ConnectionManager
+
+    parser = argparse.ArgumentParser(description="Check that balances stay consistent under concurrent writers.")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=200, help="operations per thread")
+    parser.add_argument("--accounts", type=int, default=2, help="scratch accounts to spread the writes over")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch accounts afterwards")
+    args = parser.parse_args()
+    db = ConnectionManager()
+    service = LedgerService(db)
+    service.migrate()
+    account_ids = [service.add_account(f"stress {n + 1}")[0] for n in range(args.accounts)]
+    stress = Stress(service, account_ids, args.seed)
+    try:
+        elapsed = stress.run(args.threads, args.ops)
+        total = sum(stress.counts.values())
+        print(f"{total} operations from {args.threads} threads in {elapsed:.2f}s ({total / elapsed:.0f}/s): "
+              + ", ".join(f"{k} {v}" for k, v in stress.counts.items()))
+        for error in stress.errors:
+            print("error:", error)
+        found = stress.problems()
+        for problem in found:
+            print("FAIL", problem)
+        print("Balances consistent." if not found else f"{len(found)} problem(s) found.")
+    finally:
+        if not args.keep:
+            for acct_id in account_ids:
+                service.delete_account(acct_id)
+    sys.exit(1 if found or stress.counts["error"] else 0)
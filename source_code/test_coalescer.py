@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from cache import LedgerCache
+from coalescer import WriteCoalescer
+from ledger import LedgerService, NotFoundError
+from replica import LocalDatabase
+
+# === Group Commit Tests ===
+# Run with `python -m unittest` from source_code. They use the replica's
+# SQLite database, which runs ledger.py's queries unchanged, so no MySQL
+# server is needed.
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        self.service = LedgerService(LocalDatabase(self.path), LedgerCache())
+        self.account = self.service.add_account("Cash")[0]
+        tx, _ = self.service.add_transaction(self.account, "Deposit", Decimal("10.00"), date(2025, 1, 1))
+        self.tx_id = tx[0]
+        self.coalescer = WriteCoalescer(self.service, max_writes=10, max_delay=60)
+
+    def tearDown(self):
+        self.coalescer.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_update_then_delete_in_one_batch(self):
+        updated = self.coalescer.update_transaction(self.account, self.tx_id, "Deposit", "20.00", date(2025, 1, 2))
+        deleted = self.coalescer.delete_transaction(self.account, self.tx_id)
+        added = self.coalescer.add_transaction(self.account, "Deposit", "5.00", date(2025, 1, 3))
+        self.coalescer.flush()
+        with self.assertRaises(NotFoundError):
+            updated.result(timeout=10)
+        self.assertEqual(deleted.result(timeout=10)[2], Decimal("5.00"))
+        tx, acct = added.result(timeout=10)
+        self.assertEqual(acct[2], Decimal("5.00"))
+        self.assertEqual(self.service.transactions(self.account, None, None, 10), [tx])
+        self.assertEqual(self.coalescer.batches, 1)
+
+        # The commit thread is still serving the queue
+        later = self.coalescer.add_transaction(self.account, "Withdrawal", "1.00", date(2025, 1, 4))
+        self.coalescer.flush()
+        self.assertEqual(later.result(timeout=10)[1][2], Decimal("4.00"))
+
+if __name__ == "__main__":
+    unittest.main()
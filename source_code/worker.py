@@ -0,0 +1,76 @@
+import queue
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# === Background Query Executor ===
+class QueryExecutor:
+    """Run database work off the Tk thread and hand the results back to it.
+
+    `submit` runs a plain callable on a worker thread and returns a
+    concurrent.futures.Future. Completion callbacks are queued by the worker
+    and called from the Tk mainloop through `root.after` polling, so they
+    are free to touch widgets.
+    """
+    def __init__(self, root, max_workers=1, poll_ms=15):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-worker")
+        self.results = queue.Queue()
+        self.pending = 0
+        self.polling = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        """Run fn(*args) in the background.
+
+        on_done(result) or on_error(exception) is later called on the Tk
+        thread. Errors without an on_error handler go to Tk's usual
+        callback error reporting.
+        """
+        return self.watch(self.pool.submit(fn, *args), on_done=on_done, on_error=on_error)
+
+    def watch(self, future, on_done=None, on_error=None):
+        """Like submit, for a Future whose work runs elsewhere (e.g. a queued
+        group-commit write). Call from the Tk thread."""
+        self.pending += 1
+        future.add_done_callback(lambda f: self.results.put((self.deliver, (f, on_done, on_error))))
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_ms, self.poll)
+        return future
+
+    def post(self, fn, *args):
+        """Call fn(*args) on the Tk thread; safe to use from inside a running job,
+        e.g. to report progress."""
+        self.results.put((fn, args))
+
+    def deliver(self, future, on_done, on_error):
+        self.pending -= 1
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            if on_done:
+                on_done(future.result())
+        elif on_error:
+            on_error(error)
+        else:
+            self.root.report_callback_exception(type(error), error, error.__traceback__)
+
+    def poll(self):
+        while True:
+            try:
+                fn, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                fn(*args)
+            except Exception:
+                # A failing callback must not stop delivery of the others
+                traceback.print_exc()
+        if self.pending:
+            self.root.after(self.poll_ms, self.poll)
+        else:
+            self.polling = False
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait, cancel_futures=True)